@@ -1,4 +1,3 @@
-import asyncio
 import http
 import json
 from collections.abc import Collection
@@ -7,6 +6,11 @@ from typing import Literal, overload
 import aiohttp
 import yarl
 from adapters.services.mobygames_types import MobyGame, MobyGameBrief, MobyOutputFormat
+from adapters.services.rate_limiter import rate_limiters
+from adapters.services.response_cache import (
+    mark_response_uncacheable,
+    provider_response_cache,
+)
 from aiohttp.client import ClientTimeout
 from config import MOBYGAMES_API_KEY
 from fastapi import HTTPException, status
@@ -33,8 +37,14 @@ class MobyGamesService:
         base_url: str | None = None,
     ) -> None:
         self.url = yarl.URL(base_url or "https://api.mobygames.com/v1")
+        self.rate_limiter = rate_limiters["mobygames"]
 
     async def _request(self, url: str, request_timeout: int = 120) -> dict:
+        return await provider_response_cache.get_or_fetch(
+            "mobygames", url, lambda: self._fetch(url, request_timeout)
+        )
+
+    async def _fetch(self, url: str, request_timeout: int = 120) -> dict:
         aiohttp_session = ctx_aiohttp_session.get()
         log.debug(
             "API request: URL=%s, Timeout=%s",
@@ -43,11 +53,13 @@ class MobyGamesService:
         )
 
         try:
-            res = await aiohttp_session.get(
-                url,
-                middlewares=(auth_middleware,),
-                timeout=ClientTimeout(total=request_timeout),
-            )
+            async with self.rate_limiter.acquire():
+                res = await aiohttp_session.get(
+                    url,
+                    middlewares=(auth_middleware,),
+                    timeout=ClientTimeout(total=request_timeout),
+                )
+            self.rate_limiter.record_response(res.status, res.headers)
             res.raise_for_status()
             return await res.json()
         except aiohttp.ServerTimeoutError:
@@ -63,16 +75,20 @@ class MobyGamesService:
             if exc.status == http.HTTPStatus.UNAUTHORIZED:
                 # Sometimes MobyGames returns 401 even with a valid API key
                 log.error(exc)
+                mark_response_uncacheable()
                 return {}
             elif exc.status == http.HTTPStatus.TOO_MANY_REQUESTS:
-                # Retry after 2 seconds if rate limit hit
-                await asyncio.sleep(2)
+                # Retry once, after the wait requested by the provider
+                pass
             else:
                 # Log the error and return an empty dict if the request fails with a different code
                 log.error(exc)
+                if exc.status != http.HTTPStatus.NOT_FOUND:
+                    mark_response_uncacheable()
                 return {}
         except json.JSONDecodeError as exc:
             log.error("Error decoding JSON response from ScreenScraper: %s", exc)
+            mark_response_uncacheable()
             return {}
 
         # Retry the request once if it times out
@@ -82,14 +98,22 @@ class MobyGamesService:
                 url,
                 request_timeout,
             )
-            res = await aiohttp_session.get(
-                url,
-                middlewares=(auth_middleware,),
-                timeout=ClientTimeout(total=request_timeout),
-            )
+            async with self.rate_limiter.acquire():
+                res = await aiohttp_session.get(
+                    url,
+                    middlewares=(auth_middleware,),
+                    timeout=ClientTimeout(total=request_timeout),
+                )
+            self.rate_limiter.record_response(res.status, res.headers)
             res.raise_for_status()
             return await res.json()
         except (aiohttp.ClientResponseError, aiohttp.ServerTimeoutError) as exc:
+            if not (
+                isinstance(exc, aiohttp.ClientResponseError)
+                and exc.status == http.HTTPStatus.NOT_FOUND
+            ):
+                mark_response_uncacheable()
+
             if (
                 isinstance(exc, aiohttp.ClientResponseError)
                 and exc.status == http.HTTPStatus.UNAUTHORIZED
@@ -100,6 +124,7 @@ class MobyGamesService:
             return {}
         except json.JSONDecodeError as exc:
             log.error("Error decoding JSON response from ScreenScraper: %s", exc)
+            mark_response_uncacheable()
             return {}
 
     @overload
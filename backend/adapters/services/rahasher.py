@@ -1,6 +1,7 @@
 import asyncio
 import re
 
+from config import RAHASHER_MAX_PROCESSES
 from logger.formatter import LIGHTMAGENTA
 from logger.formatter import highlight as hl
 from logger.logger import log
@@ -95,7 +96,24 @@ class RAHasherError(Exception): ...
 class RAHasherService:
     """Service to calculate RetroAchievements hashes using RAHasher."""
 
+    # Limits the number of RAHasher processes running at the same time, shared by all
+    # instances of the service and created lazily for the running event loop
+    _semaphore: asyncio.Semaphore | None = None
+    _semaphore_loop: asyncio.AbstractEventLoop | None = None
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if cls._semaphore is None or cls._semaphore_loop is not loop:
+            cls._semaphore = asyncio.Semaphore(max(RAHASHER_MAX_PROCESSES, 1))
+            cls._semaphore_loop = loop
+        return cls._semaphore
+
     async def calculate_hash(self, platform_id: int, file_path: str) -> str:
+        async with self._get_semaphore():
+            return await self._calculate_hash(platform_id, file_path)
+
+    async def _calculate_hash(self, platform_id: int, file_path: str) -> str:
         from handler.metadata.ra_handler import RA_ID_TO_SLUG
 
         log.debug(
@@ -114,20 +132,16 @@ class RAHasherService:
             log.error("RAHasher executable not found in PATH")
             return ""
 
-        return_code = await proc.wait()
+        # Read the output while waiting, so the process can't block on a full pipe
+        stdout, stderr = await proc.communicate()
+        return_code = proc.returncode
         if return_code != 1:
-            if proc.stderr is not None:
-                stderr = (await proc.stderr.read()).decode("utf-8")
-            else:
-                stderr = None
-            log.error(f"RAHasher failed with code {return_code}. {stderr=}")
-            return ""
-
-        if proc.stdout is None:
-            log.error("RAHasher did not return a hash.")
+            log.error(
+                f"RAHasher failed with code {return_code}. stderr={stderr.decode('utf-8')!r}"
+            )
             return ""
 
-        file_hash = (await proc.stdout.read()).decode("utf-8").strip()
+        file_hash = stdout.decode("utf-8").strip()
         if not file_hash:
             log.error(
                 f"RAHasher returned an empty hash for file {file_path} (platform ID: {platform_id})"
@@ -0,0 +1,220 @@
+import asyncio
+import email.utils
+import http
+import time
+from collections.abc import AsyncIterator, Mapping
+from contextlib import asynccontextmanager
+from typing import Final, TypedDict
+
+from adapters.services.response_cache import Provider
+from logger.logger import log
+
+# Wait applied after a 429 response without a Retry-After header, in seconds
+DEFAULT_RETRY_AFTER: Final = 2.0
+# Longest wait accepted from a Retry-After or quota header, in seconds
+MAX_RETRY_AFTER: Final = 5 * 60.0
+# Values of rate limit reset headers above this are timestamps, not delays
+RESET_TIMESTAMP_THRESHOLD: Final = 1_000_000_000
+
+
+class RateLimiterStatus(TypedDict):
+    provider: str
+    # Requests per second currently allowed, and the configured maximum
+    rate: float
+    max_rate: float
+    # Requests that can be sent right away, without waiting for the bucket to refill
+    budget: float
+    in_flight: int
+    max_in_flight: int
+    # Seconds until the next request can be sent, and total seconds spent waiting
+    wait_time: float
+    total_wait_time: float
+    rate_limited_responses: int
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> float | None:
+    """Return the delay requested by a Retry-After or rate limit reset header."""
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), MAX_RETRY_AFTER)
+        except ValueError:
+            pass
+
+        try:
+            retry_at = email.utils.parsedate_to_datetime(retry_after).timestamp()
+            return min(max(retry_at - time.time(), 0.0), MAX_RETRY_AFTER)
+        except (TypeError, ValueError):
+            return None
+
+    reset = headers.get("X-RateLimit-Reset") or headers.get("RateLimit-Reset")
+    if reset:
+        try:
+            reset_after = float(reset)
+        except ValueError:
+            return None
+        if reset_after > RESET_TIMESTAMP_THRESHOLD:
+            reset_after -= time.time()
+        return min(max(reset_after, 0.0), MAX_RETRY_AFTER)
+
+    return None
+
+
+def parse_remaining_quota(headers: Mapping[str, str]) -> int | None:
+    remaining = headers.get("X-RateLimit-Remaining") or headers.get(
+        "RateLimit-Remaining"
+    )
+    try:
+        return int(remaining) if remaining is not None else None
+    except ValueError:
+        return None
+
+
+class AdaptiveRateLimiter:
+    """Token bucket rate limiter for the requests sent to a metadata provider.
+
+    The rate follows an AIMD policy: it's halved every time the provider answers with
+    429 Too Many Requests, and slowly grows back to its maximum with each successful
+    response. Requests are also held back when the provider asks for it through the
+    Retry-After or quota headers, and the number of concurrent requests is capped.
+    """
+
+    def __init__(
+        self,
+        provider: Provider,
+        *,
+        rate: float,
+        max_in_flight: int,
+        burst: int | None = None,
+    ) -> None:
+        self.provider = provider
+        self.max_rate = rate
+        self.min_rate = rate / 16
+        self.rate = rate
+        self.burst = max(burst or max_in_flight, 1)
+        self.max_in_flight = max(max_in_flight, 1)
+
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._in_flight = 0
+        self._total_wait_time = 0.0
+        self._rate_limited_responses = 0
+
+        self._semaphore: asyncio.Semaphore | None = None
+        self._lock: asyncio.Lock | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _get_primitives(self) -> tuple[asyncio.Semaphore, asyncio.Lock]:
+        # Asyncio primitives are bound to the event loop they're first used in
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._lock is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._semaphore, self._lock
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._refilled_at
+        self._tokens = min(self._tokens + elapsed * self.rate, float(self.burst))
+        self._refilled_at = now
+
+    def _get_wait_time(self, now: float) -> float:
+        blocked_for = self._blocked_until - now
+        if blocked_for > 0:
+            return blocked_for
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def _take_token(self, lock: asyncio.Lock) -> None:
+        # Waiters are served in order, as they queue up on the lock
+        async with lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait_time = self._get_wait_time(now)
+                if wait_time <= 0:
+                    self._tokens -= 1
+                    return
+
+                self._total_wait_time += wait_time
+                await asyncio.sleep(wait_time)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        """Wait until a request can be sent to the provider, and hold its slot."""
+        semaphore, lock = self._get_primitives()
+        async with semaphore:
+            await self._take_token(lock)
+            self._in_flight += 1
+            try:
+                yield
+            finally:
+                self._in_flight -= 1
+
+    def record_response(self, status: int, headers: Mapping[str, str]) -> None:
+        """Adapt the rate to a response received from the provider."""
+        now = time.monotonic()
+
+        if status == http.HTTPStatus.TOO_MANY_REQUESTS:
+            self._rate_limited_responses += 1
+            self.rate = max(self.rate / 2, self.min_rate)
+            retry_after = parse_retry_after(headers)
+            if retry_after is None:
+                retry_after = DEFAULT_RETRY_AFTER
+            self._block(now, retry_after)
+            log.debug(
+                "%s rate limit hit, slowing down to %.2f requests per second",
+                self.provider,
+                self.rate,
+            )
+            return
+
+        if parse_remaining_quota(headers) == 0:
+            retry_after = parse_retry_after(headers)
+            if retry_after:
+                self._block(now, retry_after)
+
+        if status < 400:
+            self.rate = min(self.rate + self.max_rate / 10, self.max_rate)
+
+    def _block(self, now: float, delay: float) -> None:
+        self._blocked_until = max(self._blocked_until, now + delay)
+        self._refill(now)
+        self._tokens = min(self._tokens, 0.0)
+
+    def status(self) -> RateLimiterStatus:
+        now = time.monotonic()
+        self._refill(now)
+        return RateLimiterStatus(
+            provider=self.provider,
+            rate=self.rate,
+            max_rate=self.max_rate,
+            budget=max(self._tokens, 0.0),
+            in_flight=self._in_flight,
+            max_in_flight=self.max_in_flight,
+            wait_time=self._get_wait_time(now),
+            total_wait_time=self._total_wait_time,
+            rate_limited_responses=self._rate_limited_responses,
+        )
+
+
+# Defaults follow the documented limits of each provider, or conservative values
+# for providers that don't document them
+rate_limiters: Final[dict[Provider, AdaptiveRateLimiter]] = {
+    # https://api-docs.igdb.com/#rate-limits
+    "igdb": AdaptiveRateLimiter("igdb", rate=4, max_in_flight=8),
+    "screenscraper": AdaptiveRateLimiter("screenscraper", rate=2, max_in_flight=1),
+    "mobygames": AdaptiveRateLimiter("mobygames", rate=1, max_in_flight=1),
+    "retroachievements": AdaptiveRateLimiter(
+        "retroachievements", rate=5, max_in_flight=4
+    ),
+    "steamgriddb": AdaptiveRateLimiter("steamgriddb", rate=5, max_in_flight=4),
+    "hasheous": AdaptiveRateLimiter("hasheous", rate=5, max_in_flight=4),
+    "playmatch": AdaptiveRateLimiter("playmatch", rate=5, max_in_flight=4),
+}
+
+
+def get_rate_limiters_status() -> list[RateLimiterStatus]:
+    return [rate_limiter.status() for rate_limiter in rate_limiters.values()]
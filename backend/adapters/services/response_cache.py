@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Final, Literal, TypedDict, TypeVar
+
+from config import PROVIDER_RESPONSE_CACHE_ENABLED, PROVIDER_RESPONSE_CACHE_MAX_ENTRIES
+from handler.redis_handler import async_cache
+from logger.logger import log
+
+PROVIDER_RESPONSE_CACHE_KEY: Final = "romm:provider_response"
+PROVIDER_RESPONSE_CACHE_INDEX_KEY: Final = "romm:provider_response_index"
+
+ONE_DAY: Final = 24 * 60 * 60
+
+T = TypeVar("T")
+
+Provider = Literal[
+    "hasheous",
+    "igdb",
+    "mobygames",
+    "playmatch",
+    "retroachievements",
+    "screenscraper",
+    "steamgriddb",
+]
+
+
+class ProviderCachePolicy(TypedDict):
+    # Seconds a response is served without contacting the provider
+    ttl: int
+    # Seconds an empty ("not found") response is served without contacting the provider
+    negative_ttl: int
+    # Seconds an expired response is still served while it's refreshed in the background
+    stale_ttl: int
+
+
+class ProviderCacheEntry(TypedDict):
+    stored_at: float
+    negative: bool
+    value: Any
+
+
+PROVIDER_CACHE_POLICIES: Final[dict[Provider, ProviderCachePolicy]] = {
+    "hasheous": ProviderCachePolicy(
+        ttl=7 * ONE_DAY, negative_ttl=ONE_DAY, stale_ttl=7 * ONE_DAY
+    ),
+    "igdb": ProviderCachePolicy(
+        ttl=7 * ONE_DAY, negative_ttl=ONE_DAY, stale_ttl=7 * ONE_DAY
+    ),
+    "mobygames": ProviderCachePolicy(
+        ttl=7 * ONE_DAY, negative_ttl=ONE_DAY, stale_ttl=7 * ONE_DAY
+    ),
+    "playmatch": ProviderCachePolicy(
+        ttl=7 * ONE_DAY, negative_ttl=ONE_DAY, stale_ttl=7 * ONE_DAY
+    ),
+    "retroachievements": ProviderCachePolicy(
+        ttl=ONE_DAY, negative_ttl=ONE_DAY, stale_ttl=7 * ONE_DAY
+    ),
+    "screenscraper": ProviderCachePolicy(
+        ttl=7 * ONE_DAY, negative_ttl=ONE_DAY, stale_ttl=7 * ONE_DAY
+    ),
+    "steamgriddb": ProviderCachePolicy(
+        ttl=ONE_DAY, negative_ttl=ONE_DAY, stale_ttl=7 * ONE_DAY
+    ),
+}
+MAX_ENTRY_LIFETIME: Final = max(
+    max(policy["ttl"], policy["negative_ttl"]) + policy["stale_ttl"]
+    for policy in PROVIDER_CACHE_POLICIES.values()
+)
+
+# Set by the provider adapters while fetching a response, when the request failed in a
+# way that says nothing about the requested resource (timeouts, rate limits, etc.)
+_ctx_response_cacheable: ContextVar[bool] = ContextVar(
+    "response_cacheable", default=True
+)
+
+
+def mark_response_uncacheable() -> None:
+    """Prevent the response currently being fetched from being cached."""
+    _ctx_response_cacheable.set(False)
+
+
+@dataclass
+class ResponseCacheability:
+    cacheable: bool = True
+
+
+@contextmanager
+def track_response_cacheability() -> Iterator[ResponseCacheability]:
+    """Track whether the responses fetched within the block are definitive.
+
+    Once the block exits, `cacheable` is False if any of them was marked uncacheable,
+    meaning the result built from them only reflects a failed request.
+    """
+    cacheability = ResponseCacheability()
+    token = _ctx_response_cacheable.set(True)
+    try:
+        yield cacheability
+    finally:
+        cacheability.cacheable = _ctx_response_cacheable.get()
+        _ctx_response_cacheable.reset(token)
+
+
+class ProviderResponseCache:
+    """Cache for metadata provider API responses, stored in Redis.
+
+    Responses are served from the cache while fresh, as defined by the policy of each
+    provider. Once expired, they are still served for a while as the request is sent
+    again in the background. Empty responses are cached for a shorter time, so games
+    that can't be found aren't looked up again on every scan.
+
+    The number of cached responses is bounded, evicting the least recently used ones.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = PROVIDER_RESPONSE_CACHE_ENABLED,
+        max_entries: int = PROVIDER_RESPONSE_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._refresh_tasks: dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def build_key(provider: Provider, request: Any) -> str:
+        request_hash = hashlib.sha1(
+            json.dumps(request, sort_keys=True, default=str).encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        return f"{PROVIDER_RESPONSE_CACHE_KEY}:{provider}:{request_hash}"
+
+    async def get_or_fetch(
+        self,
+        provider: Provider,
+        request: Any,
+        fetch: Callable[[], Awaitable[T]],
+    ) -> T:
+        """Return the cached response for a request, fetching it when missing.
+
+        :param provider: Provider the request is sent to, used to select the policy.
+        :param request: JSON-serializable description of the request, used as cache key.
+            It must not include any credentials.
+        :param fetch: Callable that sends the request to the provider.
+        """
+        if not self.enabled:
+            return await fetch()
+
+        policy = PROVIDER_CACHE_POLICIES[provider]
+        key = self.build_key(provider, request)
+
+        entry = await self._get_entry(key)
+        if entry is None:
+            return await self._fetch_and_store(key, policy, fetch)
+
+        age = time.time() - entry["stored_at"]
+        ttl = policy["negative_ttl"] if entry["negative"] else policy["ttl"]
+        if age >= ttl:
+            self._schedule_refresh(key, policy, fetch)
+
+        return entry["value"]
+
+    async def _get_entry(self, key: str) -> ProviderCacheEntry | None:
+        async with async_cache.pipeline() as pipe:
+            await pipe.get(key)
+            await pipe.zadd(
+                PROVIDER_RESPONSE_CACHE_INDEX_KEY, {key: time.time()}, xx=True
+            )
+            cached_entry, _ = await pipe.execute()
+
+        if not cached_entry:
+            return None
+
+        try:
+            return json.loads(cached_entry)
+        except json.JSONDecodeError:
+            return None
+
+    async def _fetch_and_store(
+        self,
+        key: str,
+        policy: ProviderCachePolicy,
+        fetch: Callable[[], Awaitable[T]],
+    ) -> T:
+        token = _ctx_response_cacheable.set(True)
+        try:
+            value = await fetch()
+            cacheable = _ctx_response_cacheable.get()
+        finally:
+            _ctx_response_cacheable.reset(token)
+
+        if cacheable:
+            await self._store(key, policy, value)
+        else:
+            # Responses built from this one aren't definitive either
+            mark_response_uncacheable()
+
+        return value
+
+    async def _store(self, key: str, policy: ProviderCachePolicy, value: Any) -> None:
+        now = time.time()
+        negative = not value
+        expiration = (
+            policy["negative_ttl"] if negative else policy["ttl"]
+        ) + policy["stale_ttl"]
+
+        async with async_cache.pipeline() as pipe:
+            await pipe.set(
+                key,
+                json.dumps(
+                    ProviderCacheEntry(stored_at=now, negative=negative, value=value)
+                ),
+                ex=expiration,
+            )
+            await pipe.zadd(PROVIDER_RESPONSE_CACHE_INDEX_KEY, {key: now})
+            # Entries expired by Redis itself are no longer worth keeping in the index
+            await pipe.zremrangebyscore(
+                PROVIDER_RESPONSE_CACHE_INDEX_KEY,
+                "-inf",
+                now - MAX_ENTRY_LIFETIME,
+            )
+            await pipe.zcard(PROVIDER_RESPONSE_CACHE_INDEX_KEY)
+            *_, cached_entries = await pipe.execute()
+
+        if cached_entries > self.max_entries:
+            await self._evict(cached_entries - self.max_entries)
+
+    async def _evict(self, count: int) -> None:
+        evicted = await async_cache.zpopmin(PROVIDER_RESPONSE_CACHE_INDEX_KEY, count)
+        if evicted:
+            await async_cache.delete(*(key for key, _ in evicted))
+
+    def _schedule_refresh(
+        self,
+        key: str,
+        policy: ProviderCachePolicy,
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> None:
+        if key in self._refresh_tasks:
+            return
+
+        task = asyncio.create_task(self._refresh(key, policy, fetch))
+        self._refresh_tasks[key] = task
+        task.add_done_callback(lambda _: self._refresh_tasks.pop(key, None))
+
+    async def _refresh(
+        self,
+        key: str,
+        policy: ProviderCachePolicy,
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> None:
+        try:
+            await self._fetch_and_store(key, policy, fetch)
+        except Exception as exc:
+            # The stale response was already served, it will be refreshed next time
+            log.debug("Failed to refresh cached provider response %s: %s", key, exc)
+
+    async def clear(self) -> None:
+        keys = await async_cache.zrange(PROVIDER_RESPONSE_CACHE_INDEX_KEY, 0, -1)
+        if keys:
+            await async_cache.delete(*keys)
+        await async_cache.delete(PROVIDER_RESPONSE_CACHE_INDEX_KEY)
+
+
+provider_response_cache = ProviderResponseCache()
@@ -1,4 +1,3 @@
-import asyncio
 import http
 import json
 from collections.abc import AsyncIterator
@@ -6,6 +5,11 @@ from typing import cast
 
 import aiohttp
 import yarl
+from adapters.services.rate_limiter import rate_limiters
+from adapters.services.response_cache import (
+    mark_response_uncacheable,
+    provider_response_cache,
+)
 from adapters.services.retroachievements_types import (
     RAGameExtendedDetails,
     RAGameInfoAndUserProgress,
@@ -42,8 +46,14 @@ class RetroAchievementsService:
         base_url: str | None = None,
     ) -> None:
         self.url = yarl.URL(base_url or "https://retroachievements.org/API")
+        self.rate_limiter = rate_limiters["retroachievements"]
 
     async def _request(self, url: str, request_timeout: int = 120) -> dict:
+        return await provider_response_cache.get_or_fetch(
+            "retroachievements", url, lambda: self._fetch(url, request_timeout)
+        )
+
+    async def _fetch(self, url: str, request_timeout: int = 120) -> dict:
         aiohttp_session = ctx_aiohttp_session.get()
         log.debug(
             "API request: URL=%s, Timeout=%s",
@@ -51,13 +61,16 @@ class RetroAchievementsService:
             request_timeout,
         )
         try:
-            res = await aiohttp_session.get(
-                url,
-                middlewares=(auth_middleware,),
-                timeout=ClientTimeout(total=request_timeout),
-            )
-            res.raise_for_status()
-            return await res.json()
+            # The request slot is held until the body of the response is read
+            async with self.rate_limiter.acquire():
+                res = await aiohttp_session.get(
+                    url,
+                    middlewares=(auth_middleware,),
+                    timeout=ClientTimeout(total=request_timeout),
+                )
+                self.rate_limiter.record_response(res.status, res.headers)
+                res.raise_for_status()
+                return await res.json()
         except aiohttp.ServerTimeoutError:
             # Retry the request once if it times out
             pass
@@ -71,14 +84,17 @@ class RetroAchievementsService:
             ) from exc
         except aiohttp.ClientResponseError as err:
             if err.status == http.HTTPStatus.TOO_MANY_REQUESTS:
-                # Retry after 2 seconds if rate limit hit
-                await asyncio.sleep(2)
+                # Retry once, after the wait requested by the provider
+                pass
             else:
                 # Log the error and return an empty dict if the request fails with a different code
                 log.error(err)
+                if err.status != http.HTTPStatus.NOT_FOUND:
+                    mark_response_uncacheable()
                 return {}
         except json.JSONDecodeError as exc:
             log.error("Error decoding JSON response from ScreenScraper: %s", exc)
+            mark_response_uncacheable()
             return {}
 
         try:
@@ -87,14 +103,22 @@ class RetroAchievementsService:
                 url,
                 request_timeout,
             )
-            res = await aiohttp_session.get(
-                url,
-                middlewares=(auth_middleware,),
-                timeout=ClientTimeout(total=request_timeout),
-            )
-            res.raise_for_status()
-            return await res.json()
+            async with self.rate_limiter.acquire():
+                res = await aiohttp_session.get(
+                    url,
+                    middlewares=(auth_middleware,),
+                    timeout=ClientTimeout(total=request_timeout),
+                )
+                self.rate_limiter.record_response(res.status, res.headers)
+                res.raise_for_status()
+                return await res.json()
         except (aiohttp.ClientResponseError, aiohttp.ServerTimeoutError) as err:
+            if not (
+                isinstance(err, aiohttp.ClientResponseError)
+                and err.status == http.HTTPStatus.NOT_FOUND
+            ):
+                mark_response_uncacheable()
+
             if (
                 isinstance(err, aiohttp.ClientResponseError)
                 and err.status == http.HTTPStatus.UNAUTHORIZED
@@ -105,6 +129,7 @@ class RetroAchievementsService:
             return {}
         except json.JSONDecodeError as exc:
             log.error("Error decoding JSON response from ScreenScraper: %s", exc)
+            mark_response_uncacheable()
             return {}
 
     async def get_game_extended_details(self, game_id: int) -> RAGameExtendedDetails:
@@ -165,7 +190,8 @@ class RetroAchievementsService:
         url = self.url.joinpath("API_GetUserCompletionProgress.php").with_query(
             **params
         )
-        response = await self._request(str(url))
+        # User progress changes all the time, so it's never served from the cache
+        response = await self._fetch(str(url))
         return cast(RAUserCompletionProgress, response)
 
     async def iter_user_completion_progress(
@@ -214,5 +240,6 @@ class RetroAchievementsService:
         url = self.url.joinpath("API_GetGameInfoAndUserProgress.php").with_query(
             **params
         )
-        response = await self._request(str(url))
+        # User progress changes all the time, so it's never served from the cache
+        response = await self._fetch(str(url))
         return cast(RAGameInfoAndUserProgress, response)
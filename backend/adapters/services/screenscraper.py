@@ -1,4 +1,3 @@
-import asyncio
 import base64
 import http
 import json
@@ -6,6 +5,11 @@ from typing import Final, cast
 
 import aiohttp
 import yarl
+from adapters.services.rate_limiter import rate_limiters
+from adapters.services.response_cache import (
+    mark_response_uncacheable,
+    provider_response_cache,
+)
 from adapters.services.screenscraper_types import SSGame
 from aiohttp.client import ClientTimeout
 from config import SCREENSCRAPER_PASSWORD, SCREENSCRAPER_USER
@@ -46,8 +50,14 @@ class ScreenScraperService:
         base_url: str | None = None,
     ) -> None:
         self.url = yarl.URL(base_url or "https://api.screenscraper.fr/api2")
+        self.rate_limiter = rate_limiters["screenscraper"]
 
     async def _request(self, url: str, request_timeout: int = 120) -> dict:
+        return await provider_response_cache.get_or_fetch(
+            "screenscraper", url, lambda: self._fetch(url, request_timeout)
+        )
+
+    async def _fetch(self, url: str, request_timeout: int = 120) -> dict:
         aiohttp_session = ctx_aiohttp_session.get()
         log.debug(
             "API request: URL=%s, Timeout=%s",
@@ -55,11 +65,13 @@ class ScreenScraperService:
             request_timeout,
         )
         try:
-            res = await aiohttp_session.get(
-                url,
-                middlewares=(auth_middleware,),
-                timeout=ClientTimeout(total=request_timeout),
-            )
+            async with self.rate_limiter.acquire():
+                res = await aiohttp_session.get(
+                    url,
+                    middlewares=(auth_middleware,),
+                    timeout=ClientTimeout(total=request_timeout),
+                )
+            self.rate_limiter.record_response(res.status, res.headers)
             res.raise_for_status()
             res_text = await res.text()
             if LOGIN_ERROR_CHECK in res_text:
@@ -82,14 +94,17 @@ class ScreenScraperService:
             ) from exc
         except aiohttp.ClientResponseError as err:
             if err.status == http.HTTPStatus.TOO_MANY_REQUESTS:
-                # Retry after 2 seconds if rate limit hit
-                await asyncio.sleep(2)
+                # Retry once, after the wait requested by the provider
+                pass
             else:
                 # Log the error and return an empty dict if the request fails with a different code
                 log.error(err)
+                if err.status != http.HTTPStatus.NOT_FOUND:
+                    mark_response_uncacheable()
                 return {}
         except json.JSONDecodeError as exc:
             log.error("Error decoding JSON response from ScreenScraper: %s", exc)
+            mark_response_uncacheable()
             return {}
 
         try:
@@ -98,11 +113,13 @@ class ScreenScraperService:
                 url,
                 request_timeout,
             )
-            res = await aiohttp_session.get(
-                url,
-                middlewares=(auth_middleware,),
-                timeout=ClientTimeout(total=request_timeout),
-            )
+            async with self.rate_limiter.acquire():
+                res = await aiohttp_session.get(
+                    url,
+                    middlewares=(auth_middleware,),
+                    timeout=ClientTimeout(total=request_timeout),
+                )
+            self.rate_limiter.record_response(res.status, res.headers)
             res.raise_for_status()
             res_text = await res.text()
             if LOGIN_ERROR_CHECK in res_text:
@@ -113,6 +130,12 @@ class ScreenScraperService:
                 )
             return await res.json()
         except (aiohttp.ClientResponseError, aiohttp.ServerTimeoutError) as err:
+            if not (
+                isinstance(err, aiohttp.ClientResponseError)
+                and err.status == http.HTTPStatus.NOT_FOUND
+            ):
+                mark_response_uncacheable()
+
             if (
                 isinstance(err, aiohttp.ClientResponseError)
                 and err.status == http.HTTPStatus.UNAUTHORIZED
@@ -123,6 +146,7 @@ class ScreenScraperService:
             return {}
         except json.JSONDecodeError as exc:
             log.error("Error decoding JSON response from ScreenScraper: %s", exc)
+            mark_response_uncacheable()
             return {}
 
     async def get_game_info(
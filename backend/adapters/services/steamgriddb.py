@@ -6,6 +6,11 @@ from typing import Literal, cast
 
 import aiohttp
 import yarl
+from adapters.services.rate_limiter import rate_limiters
+from adapters.services.response_cache import (
+    mark_response_uncacheable,
+    provider_response_cache,
+)
 from adapters.services.steamgriddb_types import (
     SGDBDimension,
     SGDBGame,
@@ -42,8 +47,14 @@ class SteamGridDBService:
         base_url: str | None = None,
     ) -> None:
         self.url = yarl.URL(base_url or "https://steamgriddb.com/api/v2")
+        self.rate_limiter = rate_limiters["steamgriddb"]
 
     async def _request(self, url: str, request_timeout: int = 120) -> dict:
+        return await provider_response_cache.get_or_fetch(
+            "steamgriddb", url, lambda: self._fetch(url, request_timeout)
+        )
+
+    async def _fetch(self, url: str, request_timeout: int = 120) -> dict:
         aiohttp_session = ctx_aiohttp_session.get()
         log.debug(
             "API request: URL=%s, Timeout=%s",
@@ -51,11 +62,13 @@ class SteamGridDBService:
             request_timeout,
         )
         try:
-            res = await aiohttp_session.get(
-                url,
-                middlewares=(auth_middleware,),
-                timeout=ClientTimeout(total=request_timeout),
-            )
+            async with self.rate_limiter.acquire():
+                res = await aiohttp_session.get(
+                    url,
+                    middlewares=(auth_middleware,),
+                    timeout=ClientTimeout(total=request_timeout),
+                )
+            self.rate_limiter.record_response(res.status, res.headers)
             res.raise_for_status()
             return await res.json()
         except aiohttp.ClientResponseError as exc:
@@ -63,12 +76,15 @@ class SteamGridDBService:
                 raise SGDBInvalidAPIKeyException from exc
             # Log the error and return an empty dict if the request fails with a different code
             log.error(exc)
+            if exc.status != http.HTTPStatus.NOT_FOUND:
+                mark_response_uncacheable()
             return {}
         except json.decoder.JSONDecodeError as exc:
             log.error(
                 "Failed to decode JSON response from SteamGridDB: %s",
                 str(exc),
             )
+            mark_response_uncacheable()
             return {}
 
     async def get_grids_for_game(
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from adapters.services.rate_limiter import AdaptiveRateLimiter, parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({"Retry-After": "3"}) == 3
+    assert parse_retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0
+    assert parse_retry_after({"X-RateLimit-Reset": "10"}) == 10
+    assert parse_retry_after({"Retry-After": "soon"}) is None
+    assert parse_retry_after({}) is None
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_budget():
+    rate_limiter = AdaptiveRateLimiter("igdb", rate=10, max_in_flight=2)
+    assert rate_limiter.status()["budget"] == 2
+
+    async with rate_limiter.acquire():
+        status = rate_limiter.status()
+        assert status["in_flight"] == 1
+        assert status["budget"] < 2
+
+    assert rate_limiter.status()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_backs_off_when_rate_limited():
+    rate_limiter = AdaptiveRateLimiter("screenscraper", rate=8, max_in_flight=1)
+
+    rate_limiter.record_response(429, {"Retry-After": "1"})
+    status = rate_limiter.status()
+    assert status["rate"] == 4
+    assert status["rate_limited_responses"] == 1
+    assert 0 < status["wait_time"] <= 1
+
+    # Successful responses increase the rate back to its maximum
+    for _ in range(10):
+        rate_limiter.record_response(200, {})
+    assert rate_limiter.status()["rate"] == 8
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_caps_in_flight_requests():
+    rate_limiter = AdaptiveRateLimiter("hasheous", rate=1000, max_in_flight=2)
+    in_flight: list[int] = []
+
+    async def request():
+        async with rate_limiter.acquire():
+            in_flight.append(rate_limiter.status()["in_flight"])
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(request() for _ in range(6)))
+
+    assert max(in_flight) == 2
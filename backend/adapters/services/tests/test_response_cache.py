@@ -0,0 +1,78 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+from adapters.services.response_cache import (
+    PROVIDER_RESPONSE_CACHE_INDEX_KEY,
+    ProviderResponseCache,
+    mark_response_uncacheable,
+)
+from handler.redis_handler import async_cache
+
+
+@pytest.fixture
+async def cache():
+    cache = ProviderResponseCache(enabled=True, max_entries=3)
+    await cache.clear()
+    yield cache
+    await cache.clear()
+
+
+async def test_response_served_from_cache(cache: ProviderResponseCache):
+    fetch = AsyncMock(return_value={"id": 1})
+
+    assert await cache.get_or_fetch("igdb", {"url": "games"}, fetch) == {"id": 1}
+    assert await cache.get_or_fetch("igdb", {"url": "games"}, fetch) == {"id": 1}
+    fetch.assert_awaited_once()
+
+    # Same request to a different provider
+    await cache.get_or_fetch("mobygames", {"url": "games"}, fetch)
+    assert fetch.await_count == 2
+
+
+async def test_not_found_response_cached(cache: ProviderResponseCache):
+    fetch = AsyncMock(return_value=[])
+
+    assert await cache.get_or_fetch("igdb", "missing", fetch) == []
+    assert await cache.get_or_fetch("igdb", "missing", fetch) == []
+    fetch.assert_awaited_once()
+
+    entry = json.loads(await async_cache.get(cache.build_key("igdb", "missing")))
+    assert entry["negative"] is True
+
+
+async def test_uncacheable_response_not_cached(cache: ProviderResponseCache):
+    async def fetch():
+        mark_response_uncacheable()
+        return {}
+
+    await cache.get_or_fetch("screenscraper", "timeout", fetch)
+    assert not await async_cache.exists(cache.build_key("screenscraper", "timeout"))
+
+
+async def test_stale_response_refreshed_in_background(cache: ProviderResponseCache):
+    key = cache.build_key("steamgriddb", "search")
+    await async_cache.set(
+        key, json.dumps({"stored_at": 0, "negative": False, "value": {"old": True}})
+    )
+    fetch = AsyncMock(return_value={"old": False})
+
+    assert await cache.get_or_fetch("steamgriddb", "search", fetch) == {"old": True}
+    await asyncio.gather(*cache._refresh_tasks.values())
+
+    fetch.assert_awaited_once()
+    assert await cache.get_or_fetch("steamgriddb", "search", fetch) == {"old": False}
+
+
+async def test_least_recently_used_responses_evicted(cache: ProviderResponseCache):
+    fetch = AsyncMock(return_value={"id": 1})
+
+    for request in ("a", "b", "c"):
+        await cache.get_or_fetch("igdb", request, fetch)
+    await cache.get_or_fetch("igdb", "a", fetch)
+    await cache.get_or_fetch("igdb", "d", fetch)
+
+    assert await async_cache.zcard(PROVIDER_RESPONSE_CACHE_INDEX_KEY) == 3
+    assert not await async_cache.exists(cache.build_key("igdb", "b"))
+    assert await async_cache.exists(cache.build_key("igdb", "a"))
@@ -8,6 +8,7 @@ from models.assets import Save, Screenshot, State  # noqa
 from models.base import BaseModel
 from models.collection import VirtualCollection
 from models.firmware import Firmware  # noqa
+from models.hash_identification import HashIdentification  # noqa
 from models.platform import Platform  # noqa
 from models.rom import Rom, RomMetadata, SiblingRom  # noqa
 from models.user import User  # noqa
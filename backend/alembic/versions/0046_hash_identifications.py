@@ -0,0 +1,76 @@
+"""empty message
+
+Revision ID: 0046_hash_identifications
+Revises: 0045_roms_metadata_update
+Create Date: 2025-07-01 00:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0046_hash_identifications"
+down_revision = "0045_roms_metadata_update"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "hash_identifications",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("provider", sa.String(length=50), nullable=False),
+        sa.Column("crc_hash", sa.String(length=100), nullable=False),
+        sa.Column("md5_hash", sa.String(length=100), nullable=False),
+        sa.Column("sha1_hash", sa.String(length=100), nullable=False),
+        sa.Column("matched", sa.Boolean(), nullable=False),
+        sa.Column("hasheous_id", sa.Integer(), nullable=True),
+        sa.Column("igdb_id", sa.Integer(), nullable=True),
+        sa.Column("ra_id", sa.Integer(), nullable=True),
+        sa.Column("tgdb_id", sa.Integer(), nullable=True),
+        sa.Column("name", sa.String(length=350), nullable=True),
+        sa.Column("url_cover", sa.Text(), nullable=True),
+        sa.Column(
+            "signatures",
+            sa.JSON().with_variant(
+                postgresql.JSONB(astext_type=sa.Text()), "postgresql"
+            ),
+            nullable=True,
+        ),
+        sa.Column("identified_at", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "provider",
+            "crc_hash",
+            "md5_hash",
+            "sha1_hash",
+            name="uq_hash_identifications_hashes",
+        ),
+    )
+    op.create_index(
+        "idx_hash_identifications_igdb_id",
+        "hash_identifications",
+        ["igdb_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "idx_hash_identifications_igdb_id", table_name="hash_identifications"
+    )
+    op.drop_table("hash_identifications")
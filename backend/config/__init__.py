@@ -75,6 +75,9 @@ RETROACHIEVEMENTS_API_KEY: Final = os.environ.get("RETROACHIEVEMENTS_API_KEY", "
 REFRESH_RETROACHIEVEMENTS_CACHE_DAYS: Final = int(
     os.environ.get("REFRESH_RETROACHIEVEMENTS_CACHE_DAYS", 30)
 )
+RAHASHER_MAX_PROCESSES: Final = int(
+    os.environ.get("RAHASHER_MAX_PROCESSES", min(os.cpu_count() or 1, 4))
+)
 
 # LAUNCHBOX
 LAUNCHBOX_API_ENABLED: Final = str_to_bool(
@@ -91,9 +94,25 @@ HASHEOUS_API_ENABLED: Final = str_to_bool(
     os.environ.get("HASHEOUS_API_ENABLED", "false")
 )
 
+# HASH IDENTIFICATIONS
+REFRESH_HASH_IDENTIFICATIONS_DAYS: Final = int(
+    os.environ.get("REFRESH_HASH_IDENTIFICATIONS_DAYS", 30)
+)
+REFRESH_UNMATCHED_HASH_IDENTIFICATIONS_DAYS: Final = int(
+    os.environ.get("REFRESH_UNMATCHED_HASH_IDENTIFICATIONS_DAYS", 3)
+)
+
 # THEGAMESDB
 TGDB_API_ENABLED: Final = str_to_bool(os.environ.get("TGDB_API_ENABLED", "false"))
 
+# PROVIDER RESPONSE CACHE
+PROVIDER_RESPONSE_CACHE_ENABLED: Final = str_to_bool(
+    os.environ.get("PROVIDER_RESPONSE_CACHE_ENABLED", "true")
+)
+PROVIDER_RESPONSE_CACHE_MAX_ENTRIES: Final = int(
+    os.environ.get("PROVIDER_RESPONSE_CACHE_MAX_ENTRIES", 100_000)
+)
+
 # AUTH
 ROMM_AUTH_SECRET_KEY: Final = os.environ.get(
     "ROMM_AUTH_SECRET_KEY", secrets.token_hex(32)
@@ -120,6 +139,23 @@ OIDC_TLS_CACERTFILE: Final = os.environ.get("OIDC_TLS_CACERTFILE", None)
 
 # SCANS
 SCAN_TIMEOUT: Final = int(os.environ.get("SCAN_TIMEOUT", 60 * 60 * 4))  # 4 hours
+SCAN_HASHING_WORKERS: Final = int(
+    os.environ.get("SCAN_HASHING_WORKERS", min(os.cpu_count() or 1, 4))
+)
+SCAN_METADATA_WORKERS: Final = int(os.environ.get("SCAN_METADATA_WORKERS", 4))
+SCAN_ARTWORK_WORKERS: Final = int(os.environ.get("SCAN_ARTWORK_WORKERS", 4))
+# Skip name searches on remote providers for roms matched in the offline metadata
+SCAN_LOCAL_METADATA_FIRST: Final = str_to_bool(
+    os.environ.get("SCAN_LOCAL_METADATA_FIRST", "false")
+)
+
+# IMAGE VARIANTS
+IMAGE_VARIANTS_WORKERS: Final = int(
+    os.environ.get("IMAGE_VARIANTS_WORKERS", min(os.cpu_count() or 1, 4))
+)
+IMAGE_VARIANTS_CACHE_MAX_SIZE_MB: Final = int(
+    os.environ.get("IMAGE_VARIANTS_CACHE_MAX_SIZE_MB", 512)
+)
 
 # TASKS
 ENABLE_RESCAN_ON_FILESYSTEM_CHANGE: Final = str_to_bool(
@@ -149,6 +185,13 @@ SCHEDULED_UPDATE_LAUNCHBOX_METADATA_CRON: Final = os.environ.get(
     "SCHEDULED_UPDATE_LAUNCHBOX_METADATA_CRON",
     "0 5 * * *",  # At 5:00 AM every day
 )
+ENABLE_SCHEDULED_CLEAN_MEDIA_STORE: Final = str_to_bool(
+    os.environ.get("ENABLE_SCHEDULED_CLEAN_MEDIA_STORE", "true")
+)
+SCHEDULED_CLEAN_MEDIA_STORE_CRON: Final = os.environ.get(
+    "SCHEDULED_CLEAN_MEDIA_STORE_CRON",
+    "0 6 * * *",  # At 6:00 AM every day
+)
 
 # EMULATION
 DISABLE_EMULATOR_JS = str_to_bool(os.environ.get("DISABLE_EMULATOR_JS", "false"))
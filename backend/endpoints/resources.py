@@ -0,0 +1,127 @@
+from pathlib import Path
+from typing import Annotated
+
+from decorators.auth import protected_route
+from fastapi import HTTPException, Query, Request, status
+from fastapi.responses import FileResponse
+from handler.auth.constants import Scope
+from handler.filesystem import fs_resource_handler
+from handler.filesystem.image_variants import (
+    IMAGE_VARIANTS_PATH,
+    MAX_VARIANT_WIDTH,
+    MEDIA_TYPES,
+    ImageFormat,
+    image_variant_cache,
+    is_format_supported,
+    round_variant_width,
+)
+from handler.filesystem.media_store import MEDIA_STORE_PATH
+from PIL import UnidentifiedImageError
+from PIL.Image import DecompressionBombError
+from utils.router import APIRouter
+
+router = APIRouter(
+    prefix="/resources",
+    tags=["resources"],
+)
+
+# Variants of a versioned image never change, others are checked again daily
+VERSIONED_CACHE_CONTROL = "private, max-age=31536000, immutable"
+UNVERSIONED_CACHE_CONTROL = "private, max-age=86400"
+# Generated variants and stored media blobs are not served as resource images
+EXCLUDED_RESOURCE_PATHS = (IMAGE_VARIANTS_PATH, MEDIA_STORE_PATH)
+
+
+@protected_route(router.get, "/{path:path}", [Scope.ROMS_READ])
+async def get_resource_image_variant(
+    request: Request,
+    path: str,
+    width: Annotated[
+        int,
+        Query(
+            description="Maximum width of the image, rounded up to a multiple of 32.",
+            ge=1,
+            le=MAX_VARIANT_WIDTH,
+        ),
+    ],
+    image_format: Annotated[
+        ImageFormat,
+        Query(alias="format", description="Format the image is encoded in."),
+    ] = "webp",
+    quality: Annotated[
+        int,
+        Query(description="Encoding quality of lossy formats.", ge=1, le=100),
+    ] = 80,
+    ts: Annotated[
+        str | None,
+        Query(description="Version of the image, e.g. the update time of its rom."),
+    ] = None,
+) -> FileResponse:
+    """Get a resized variant of a resource image, such as a cover or a screenshot
+
+    Variants are generated on first request, and cached until unused for long.
+
+    Args:
+        request (Request): Fastapi Request object
+        path (str): Relative path to the image in the resources
+        width (int): Maximum width of the image
+        image_format (ImageFormat): Format the image is encoded in
+        quality (int): Encoding quality of lossy formats
+        ts (str, optional): Version of the image, allowing clients to cache it forever
+
+    Returns:
+        FileResponse: Returns the image variant
+
+    Raises:
+        HTTPException: 404 if the image is not found, 400 if it can't be converted
+    """
+    try:
+        source = fs_resource_handler.validate_path(path)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Image not found"
+        ) from exc
+
+    if not source.is_file() or any(
+        source.is_relative_to(Path(excluded_path).resolve())
+        for excluded_path in EXCLUDED_RESOURCE_PATHS
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Image not found"
+        )
+
+    if not is_format_supported(image_format):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Image format '{image_format}' is not supported",
+        )
+
+    try:
+        variant_path = await image_variant_cache.get(
+            source,
+            width=round_variant_width(width),
+            image_format=image_format,
+            quality=quality,
+        )
+    except FileNotFoundError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Image not found"
+        ) from exc
+    except UnidentifiedImageError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="File is not an image"
+        ) from exc
+    except DecompressionBombError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Image is too large"
+        ) from exc
+
+    return FileResponse(
+        path=variant_path,
+        media_type=MEDIA_TYPES[image_format],
+        headers={
+            "Cache-Control": (
+                VERSIONED_CACHE_CONTROL if ts else UNVERSIONED_CACHE_CONTROL
+            ),
+        },
+    )
@@ -1,3 +1,4 @@
+import asyncio
 import binascii
 from base64 import b64encode
 from datetime import datetime, timezone
@@ -620,6 +621,9 @@ async def update_rom(
         "launchbox_id": data.get("launchbox_id", rom.launchbox_id),
     }
 
+    # Screenshots are downloaded once, for the last metadata source that changed
+    refresh_screenshots = False
+
     if (
         cleaned_data.get("moby_id", "")
         and int(cleaned_data.get("moby_id", "")) != rom.moby_id
@@ -628,11 +632,7 @@ async def update_rom(
             int(cleaned_data.get("moby_id", ""))
         )
         cleaned_data.update(moby_rom)
-        path_screenshots = await fs_resource_handler.get_rom_screenshots(
-            rom=rom,
-            url_screenshots=cleaned_data.get("url_screenshots", []),
-        )
-        cleaned_data.update({"path_screenshots": path_screenshots})
+        refresh_screenshots = True
 
     if (
         cleaned_data.get("ss_id", "")
@@ -640,11 +640,7 @@ async def update_rom(
     ):
         ss_rom = await meta_ss_handler.get_rom_by_id(cleaned_data["ss_id"])
         cleaned_data.update(ss_rom)
-        path_screenshots = await fs_resource_handler.get_rom_screenshots(
-            rom=rom,
-            url_screenshots=cleaned_data.get("url_screenshots", []),
-        )
-        cleaned_data.update({"path_screenshots": path_screenshots})
+        refresh_screenshots = True
 
     if (
         cleaned_data.get("igdb_id", "")
@@ -652,11 +648,7 @@ async def update_rom(
     ):
         igdb_rom = await meta_igdb_handler.get_rom_by_id(cleaned_data["igdb_id"])
         cleaned_data.update(igdb_rom)
-        path_screenshots = await fs_resource_handler.get_rom_screenshots(
-            rom=rom,
-            url_screenshots=cleaned_data.get("url_screenshots", []),
-        )
-        cleaned_data.update({"path_screenshots": path_screenshots})
+        refresh_screenshots = True
 
     if (
         cleaned_data.get("launchbox_id", "")
@@ -666,11 +658,7 @@ async def update_rom(
             cleaned_data["launchbox_id"]
         )
         cleaned_data.update(igdb_rom)
-        path_screenshots = await fs_resource_handler.get_rom_screenshots(
-            rom=rom,
-            url_screenshots=cleaned_data.get("url_screenshots", []),
-        )
-        cleaned_data.update({"path_screenshots": path_screenshots})
+        refresh_screenshots = True
 
     cleaned_data.update(
         {
@@ -690,11 +678,11 @@ async def update_rom(
         }
     )
 
-    if remove_cover:
-        cleaned_data.update(await fs_resource_handler.remove_cover(rom))
-        cleaned_data.update({"url_cover": ""})
-    else:
-        if artwork is not None and artwork.filename is not None:
+    async def update_cover() -> None:
+        if remove_cover:
+            cleaned_data.update(await fs_resource_handler.remove_cover(rom))
+            cleaned_data.update({"url_cover": ""})
+        elif artwork is not None and artwork.filename is not None:
             file_ext = artwork.filename.split(".")[-1]
             artwork_content = BytesIO(await artwork.read())
             (
@@ -709,39 +697,50 @@ async def update_rom(
                     "path_cover_l": path_cover_l,
                 }
             )
-        else:
-            if data.get(
-                "url_cover", ""
-            ) != rom.url_cover or not fs_resource_handler.cover_exists(
-                rom, CoverSize.BIG
-            ):
-                path_cover_s, path_cover_l = await fs_resource_handler.get_cover(
-                    entity=rom,
-                    overwrite=True,
-                    url_cover=str(data.get("url_cover") or ""),
-                )
-                cleaned_data.update(
-                    {
-                        "url_cover": data.get("url_cover", rom.url_cover),
-                        "path_cover_s": path_cover_s,
-                        "path_cover_l": path_cover_l,
-                    }
-                )
-
-    if data.get(
-        "url_manual", ""
-    ) != rom.url_manual or not fs_resource_handler.manual_exists(rom):
-        path_manual = await fs_resource_handler.get_manual(
-            rom=rom,
-            overwrite=True,
-            url_manual=str(data.get("url_manual") or ""),
-        )
-        cleaned_data.update(
-            {
-                "url_manual": data.get("url_manual", rom.url_manual),
-                "path_manual": path_manual,
-            }
-        )
+        elif data.get(
+            "url_cover", ""
+        ) != rom.url_cover or not fs_resource_handler.cover_exists(
+            rom, CoverSize.BIG
+        ):
+            path_cover_s, path_cover_l = await fs_resource_handler.get_cover(
+                entity=rom,
+                overwrite=True,
+                url_cover=str(data.get("url_cover") or ""),
+            )
+            cleaned_data.update(
+                {
+                    "url_cover": data.get("url_cover", rom.url_cover),
+                    "path_cover_s": path_cover_s,
+                    "path_cover_l": path_cover_l,
+                }
+            )
+
+    async def update_manual() -> None:
+        if data.get(
+            "url_manual", ""
+        ) != rom.url_manual or not fs_resource_handler.manual_exists(rom):
+            path_manual = await fs_resource_handler.get_manual(
+                rom=rom,
+                overwrite=True,
+                url_manual=str(data.get("url_manual") or ""),
+            )
+            cleaned_data.update(
+                {
+                    "url_manual": data.get("url_manual", rom.url_manual),
+                    "path_manual": path_manual,
+                }
+            )
+
+    async def update_screenshots() -> None:
+        if refresh_screenshots:
+            path_screenshots = await fs_resource_handler.get_rom_screenshots(
+                rom=rom,
+                url_screenshots=cleaned_data.get("url_screenshots", []),
+            )
+            cleaned_data.update({"path_screenshots": path_screenshots})
+
+    # Media is downloaded concurrently, through the shared media fetcher
+    await asyncio.gather(update_cover(), update_manual(), update_screenshots())
 
     log.debug(
         f"Updating {hl(cleaned_data.get('name', ''), color=BLUE)} [{hl(cleaned_data.get('fs_name', ''))}] with data {cleaned_data}"
@@ -1,12 +1,22 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
 from itertools import batched
 from typing import Any, Final
 
 import emoji
 import socketio  # type: ignore
-from config import DEV_MODE, REDIS_URL, SCAN_TIMEOUT
+from adapters.services.rate_limiter import get_rate_limiters_status
+from config import (
+    DEV_MODE,
+    REDIS_URL,
+    SCAN_ARTWORK_WORKERS,
+    SCAN_HASHING_WORKERS,
+    SCAN_METADATA_WORKERS,
+    SCAN_TIMEOUT,
+)
 from endpoints.responses.platform import PlatformSchema
 from endpoints.responses.rom import SimpleRomSchema
 from exceptions.fs_exceptions import (
@@ -23,9 +33,12 @@ from handler.filesystem import (
     fs_rom_handler,
 )
 from handler.filesystem.roms_handler import FSRom
-from handler.redis_handler import high_prio_queue, redis_client
+from handler.redis_handler import high_prio_queue, low_prio_queue, redis_client
 from handler.scan_handler import (
+    HashMatches,
+    MetadataSource,
     ScanType,
+    fetch_hash_matches,
     scan_firmware,
     scan_platform,
     scan_rom,
@@ -38,10 +51,24 @@ from models.platform import Platform
 from models.rom import Rom, RomFile
 from rq import Worker
 from rq.job import Job
-from sqlalchemy.inspection import inspect
 from utils.context import initialize_context
 
 STOP_SCAN_FLAG: Final = "scan:stop"
+# Scans that only read the CRC from the headers of archived roms, deferring the
+# calculation of the full hashes to a low priority job
+FAST_IDENTIFY_SCAN_TYPES: Final = frozenset({ScanType.NEW_PLATFORMS, ScanType.QUICK})
+# Sources identifying roms by their hashes, again once their full hashes are known
+HASH_IDENTIFICATION_SOURCES: Final = frozenset(
+    {MetadataSource.IGDB, MetadataSource.HASHEOUS, MetadataSource.RA}
+)
+# Maximum number of roms waiting between two stages of the scan pipeline
+SCAN_PIPELINE_QUEUE_SIZE: Final = 32
+# Number of roms identified by their hashes together
+SCAN_HASH_LOOKUP_BATCH_SIZE: Final = 50
+# Number of roms written to the database in a single transaction
+SCAN_PERSIST_BATCH_SIZE: Final = 50
+# How long to wait (in seconds) for a batch to fill up before processing it
+SCAN_BATCH_LINGER: Final = 2
 
 
 @dataclass
@@ -54,6 +81,8 @@ class ScanStats:
     metadata_roms: int = 0
     scanned_firmware: int = 0
     added_firmware: int = 0
+    hash_cache_hits: int = 0
+    hash_cache_misses: int = 0
 
     def __add__(self, other: Any) -> ScanStats:
         if not isinstance(other, ScanStats):
@@ -70,6 +99,8 @@ class ScanStats:
             metadata_roms=self.metadata_roms + other.metadata_roms,
             scanned_firmware=self.scanned_firmware + other.scanned_firmware,
             added_firmware=self.added_firmware + other.added_firmware,
+            hash_cache_hits=self.hash_cache_hits + other.hash_cache_hits,
+            hash_cache_misses=self.hash_cache_misses + other.hash_cache_misses,
         )
 
 
@@ -135,21 +166,18 @@ def _should_scan_rom(scan_type: ScanType, rom: Rom | None, roms_ids: list[str])
 # 3. Create a new ROM entry if it doesn't exist
 # 4. Build the ROM files and calculate the hashes
 # 4. Scan the ROM and update its metadata
-async def _identify_rom(
+def _prepare_rom(
     platform: Platform,
     fs_rom: FSRom,
     rom: Rom | None,
     scan_type: ScanType,
     roms_ids: list[str],
-    metadata_sources: list[str],
-    socket_manager: socketio.AsyncRedisManager,
-) -> ScanStats:
-    scan_stats = ScanStats()
-
-    # Break early if the flag is set
-    if redis_client.get(STOP_SCAN_FLAG):
-        return scan_stats
+) -> tuple[Rom | None, bool]:
+    """Create or update the rom entry before it enters the scan pipeline
 
+    Returns:
+        The rom to be scanned, or None if it should be skipped, and whether it was newly added
+    """
     if not _should_scan_rom(scan_type=scan_type, rom=rom, roms_ids=roms_ids):
         if rom:
             if rom.fs_name != fs_rom["fs_name"]:
@@ -160,7 +188,7 @@ async def _identify_rom(
             if rom.missing_from_fs:
                 db_rom_handler.update_rom(rom.id, {"missing_from_fs": False})
 
-        return scan_stats
+        return None, False
 
     # Update properties that don't require metadata
     fs_regions, fs_revisions, fs_languages, fs_other_tags = fs_rom_handler.parse_tags(
@@ -195,46 +223,149 @@ async def _identify_rom(
             )
         )
 
-    # Silly checks to make the type checker happy
-    if not rom:
-        return scan_stats
+    return rom, newly_added
+
+
+@dataclass
+class _RomScanItem:
+    """State of a rom as it moves through the stages of the scan pipeline"""
+
+    index: int
+    fs_rom: FSRom
+    rom: Rom
+    newly_added: bool
+    rom_files: list[RomFile] = field(default_factory=list)
+    hashes_deferred: bool = False
+    hash_matches: HashMatches | None = None
+    # Whether the metadata fetch changed the cover or manual url of the rom
+    media_urls_changed: bool = False
+    scan_stats: ScanStats = field(default_factory=ScanStats)
+
+
+class _OrderedRomEmitter:
+    """Collects the roms leaving the scan pipeline, and emits them in filesystem order"""
+
+    def __init__(
+        self, platform: Platform, socket_manager: socketio.AsyncRedisManager
+    ) -> None:
+        self.platform = platform
+        self.socket_manager = socket_manager
+        self.scan_stats = ScanStats()
+        self.deferred_hashes_rom_ids: list[int] = []
+        self._next_index = 0
+        self._pending: dict[int, Rom | None] = {}
+        self._lock = asyncio.Lock()
+
+    async def complete(self, item: _RomScanItem, scanned: bool = True) -> None:
+        self.scan_stats += item.scan_stats
+        self._pending[item.index] = item.rom if scanned else None
+        if scanned and item.hashes_deferred:
+            self.deferred_hashes_rom_ids.append(item.rom.id)
+
+        async with self._lock:
+            while self._next_index in self._pending:
+                rom = self._pending.pop(self._next_index)
+                self._next_index += 1
+                if rom:
+                    await self._emit(rom)
+
+    async def _emit(self, rom: Rom) -> None:
+        await self.socket_manager.emit(
+            "scan:scanning_rom",
+            {
+                "platform_name": self.platform.name,
+                "platform_slug": self.platform.slug,
+                "platform_fs_slug": self.platform.fs_slug,
+                **SimpleRomSchema.from_orm_with_factory(rom).model_dump(
+                    exclude={"created_at", "updated_at", "rom_user"}
+                ),
+            },
+        )
+        await self.socket_manager.emit("", None)
+
 
+async def _hash_rom(item: _RomScanItem, scan_type: ScanType) -> None:
     # Build rom files object before scanning
-    rom_files, rom_crc_c, rom_md5_h, rom_sha1_h, rom_ra_h = (
-        await fs_rom_handler.get_rom_files(rom)
+    fs_rom_files = await fs_rom_handler.get_rom_files(
+        item.rom, fast_identify=scan_type in FAST_IDENTIFY_SCAN_TYPES
     )
-    fs_rom.update(
+    item.rom_files = fs_rom_files["rom_files"]
+    item.hashes_deferred = fs_rom_files["hashes_deferred"]
+    item.fs_rom.update(
         {
-            "files": rom_files,
-            "crc_hash": rom_crc_c,
-            "md5_hash": rom_md5_h,
-            "sha1_hash": rom_sha1_h,
-            "ra_hash": rom_ra_h,
+            "files": item.rom_files,
+            "crc_hash": fs_rom_files["crc_hash"],
+            "md5_hash": fs_rom_files["md5_hash"],
+            "sha1_hash": fs_rom_files["sha1_hash"],
+            "ra_hash": fs_rom_files["ra_hash"],
         }
     )
+    item.scan_stats.hash_cache_hits += fs_rom_files["hash_cache_hits"]
+    item.scan_stats.hash_cache_misses += fs_rom_files["hash_cache_misses"]
+
+
+async def _lookup_rom_hashes(
+    items: list[_RomScanItem],
+    platform: Platform,
+    scan_type: ScanType,
+    metadata_sources: list[str],
+) -> None:
+    hash_matches = await fetch_hash_matches(
+        scan_type,
+        platform,
+        [(item.rom, item.fs_rom, item.newly_added) for item in items],
+        metadata_sources,
+    )
+    for item, item_hash_matches in zip(items, hash_matches, strict=True):
+        item.hash_matches = item_hash_matches
 
-    scanned_rom = await scan_rom(
+
+async def _fetch_rom_metadata(
+    item: _RomScanItem,
+    platform: Platform,
+    scan_type: ScanType,
+    metadata_sources: list[str],
+) -> None:
+    previous_rom = item.rom
+    item.rom = await scan_rom(
         scan_type=scan_type,
         platform=platform,
-        rom=rom,
-        fs_rom=fs_rom,
+        rom=item.rom,
+        fs_rom=item.fs_rom,
         metadata_sources=metadata_sources,
-        newly_added=newly_added,
+        newly_added=item.newly_added,
+        hash_matches=item.hash_matches,
     )
+    item.media_urls_changed = (item.rom.url_cover, item.rom.url_manual) != (
+        previous_rom.url_cover,
+        previous_rom.url_manual,
+    )
+
+    item.scan_stats.scanned_roms += 1
+    item.scan_stats.added_roms += 1 if item.newly_added else 0
+    item.scan_stats.metadata_roms += 1 if item.rom.is_identified else 0
+
+
+async def _fetch_rom_artwork(item: _RomScanItem) -> None:
+    # Artwork is fetched before the rom is persisted, so it's stored in the same update
+    _added_rom = item.rom
 
-    scan_stats.scanned_roms += 1
-    scan_stats.added_roms += 1 if not rom else 0
-    scan_stats.metadata_roms += 1 if scanned_rom.is_identified else 0
+    # Media from unchanged urls is kept as is, so rescans don't download it again
+    rom_media = await fs_resource_handler.fetch_rom_media(
+        _added_rom, overwrite=item.media_urls_changed
+    )
 
-    _added_rom = db_rom_handler.add_rom(scanned_rom)
+    _added_rom.path_cover_s = rom_media["path_cover_s"]
+    _added_rom.path_cover_l = rom_media["path_cover_l"]
+    _added_rom.path_screenshots = rom_media["path_screenshots"]
+    _added_rom.path_manual = rom_media["path_manual"]
 
-    # Delete the existing rom files in the DB
-    db_rom_handler.purge_rom_files(_added_rom.id)
 
-    # Create each file entry for the rom
+async def _persist_roms(items: list[_RomScanItem]) -> None:
+    # Rom files are reconciled with the ones stored in the DB by path and name
     new_rom_files = [
         RomFile(
-            rom_id=_added_rom.id,
+            rom_id=item.rom.id,
             file_name=file.file_name,
             file_path=file.file_path,
             file_size_bytes=file.file_size_bytes,
@@ -245,72 +376,384 @@ async def _identify_rom(
             sha1_hash=file.sha1_hash,
             ra_hash=file.ra_hash,
         )
-        for file in rom_files
+        for item in items
+        for file in item.rom_files
     ]
-    for new_rom_file in new_rom_files:
-        db_rom_handler.add_rom_file(new_rom_file)
-
-    if _added_rom.ra_metadata:
-        await fs_resource_handler.create_ra_resources_path(platform.id, _added_rom.id)
-
-        # Store the achievements badges
-        for ach in _added_rom.ra_metadata.get("achievements", []):
-            # Store both normal and locked version
-            badge_url_lock = ach.get("badge_url_lock", None)
-            badge_path_lock = ach.get("badge_path_lock", None)
-            if badge_url_lock and badge_path_lock:
-                await fs_resource_handler.store_ra_badge(
-                    badge_url_lock, badge_path_lock
-                )
-            badge_url = ach.get("badge_url", None)
-            badge_path = ach.get("badge_path", None)
-            if badge_url and badge_path:
-                await fs_resource_handler.store_ra_badge(badge_url, badge_path)
-
-    path_cover_s, path_cover_l = await fs_resource_handler.get_cover(
-        entity=_added_rom,
-        overwrite=True,
-        url_cover=_added_rom.url_cover,
-    )
 
-    path_manual = await fs_resource_handler.get_manual(
-        rom=_added_rom,
-        overwrite=True,
-        url_manual=_added_rom.url_manual,
+    # Update the scanned roms with the metadata, cover and screenshots paths
+    updated_roms = db_rom_handler.bulk_update_scanned_roms(
+        [item.rom for item in items], new_rom_files
     )
+    roms_by_id = {rom.id: rom for rom in updated_roms}
+    for item in items:
+        item.rom = roms_by_id.get(item.rom.id, item.rom)
+
+
+async def _run_scan_stage(
+    process: Callable[[_RomScanItem], Awaitable[None]],
+    concurrency: int,
+    input_queue: asyncio.Queue[_RomScanItem],
+    output_queue: asyncio.Queue[_RomScanItem] | None,
+    emitter: _OrderedRomEmitter,
+) -> None:
+    """Run a stage of the scan pipeline, with a bounded number of concurrent workers
+
+    Items are handed to the next stage once processed, or to the emitter after the last
+    stage. The output queue is shut down once every item of the stage has been processed.
+    """
 
-    path_screenshots = await fs_resource_handler.get_rom_screenshots(
-        rom=_added_rom,
-        url_screenshots=_added_rom.url_screenshots,
-    )
+    async def worker() -> None:
+        while True:
+            try:
+                item = await input_queue.get()
+            except asyncio.QueueShutDown:
+                return
 
-    _added_rom.path_cover_s = path_cover_s
-    _added_rom.path_cover_l = path_cover_l
-    _added_rom.path_screenshots = path_screenshots
-    _added_rom.path_manual = path_manual
-    # Update the scanned rom with the cover and screenshots paths and update database
-    db_rom_handler.update_rom(
-        _added_rom.id,
-        {
-            c: getattr(_added_rom, c)
-            for c in inspect(_added_rom).mapper.column_attrs.keys()
-        },
+            # Drop the remaining roms if the flag is set
+            if redis_client.get(STOP_SCAN_FLAG):
+                await emitter.complete(item, scanned=False)
+                continue
+
+            await process(item)
+
+            if output_queue is not None:
+                await output_queue.put(item)
+            else:
+                await emitter.complete(item)
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(max(concurrency, 1)):
+                tg.create_task(worker())
+    finally:
+        if output_queue is not None:
+            output_queue.shutdown()
+
+
+async def _run_batched_scan_stage(
+    process_batch: Callable[[list[_RomScanItem]], Awaitable[None]],
+    batch_size: int,
+    input_queue: asyncio.Queue[_RomScanItem],
+    output_queue: asyncio.Queue[_RomScanItem] | None,
+    emitter: _OrderedRomEmitter,
+) -> None:
+    """Run a stage of the scan pipeline over batches of roms
+
+    A batch is processed once it's full, when no more roms arrive within
+    SCAN_BATCH_LINGER seconds, or when the previous stage is done.
+    """
+    try:
+        finished = False
+        while not finished:
+            batch: list[_RomScanItem] = []
+            try:
+                batch.append(await input_queue.get())
+                async with asyncio.timeout(SCAN_BATCH_LINGER):
+                    while len(batch) < batch_size:
+                        batch.append(await input_queue.get())
+            except asyncio.QueueShutDown:
+                finished = True
+            except TimeoutError:
+                pass
+
+            if not batch:
+                continue
+
+            # Drop the remaining roms if the flag is set
+            scanned = not redis_client.get(STOP_SCAN_FLAG)
+            if scanned:
+                await process_batch(batch)
+
+            for item in batch:
+                if scanned and output_queue is not None:
+                    await output_queue.put(item)
+                else:
+                    await emitter.complete(item, scanned=scanned)
+    finally:
+        if output_queue is not None:
+            output_queue.shutdown()
+
+
+async def _remove_unpersisted_roms(platform: Platform, rom_ids: set[int]) -> None:
+    """Remove the roms added by a scan that stopped or failed before persisting them
+
+    They would otherwise be left without files, hashes or metadata, and skipped by
+    later quick scans as already scanned.
+    """
+    for rom_id in rom_ids:
+        db_rom_handler.delete_rom(rom_id)
+        try:
+            await fs_resource_handler.remove_directory(f"roms/{platform.id}/{rom_id}")
+        except FileNotFoundError:
+            pass
+
+
+def _first_exception(exc: BaseException) -> BaseException:
+    while isinstance(exc, BaseExceptionGroup):
+        exc = exc.exceptions[0]
+    return exc
+
+
+async def _identify_roms(
+    platform: Platform,
+    fs_roms: list[FSRom],
+    scan_type: ScanType,
+    roms_ids: list[str],
+    metadata_sources: list[str],
+    socket_manager: socketio.AsyncRedisManager,
+) -> ScanStats:
+    """Scan the roms of a platform through a pipeline of stages
+
+    Roms go through filesystem walk -> hashing -> hash lookup -> metadata fetch ->
+    artwork download -> persist, with bounded queues between stages so multiple roms
+    are processed at the same time, while each stage keeps its own concurrency limit.
+    """
+    emitter = _OrderedRomEmitter(platform, socket_manager)
+
+    hash_queue: asyncio.Queue[_RomScanItem] = asyncio.Queue(SCAN_PIPELINE_QUEUE_SIZE)
+    hash_lookup_queue: asyncio.Queue[_RomScanItem] = asyncio.Queue(
+        SCAN_PIPELINE_QUEUE_SIZE
+    )
+    metadata_queue: asyncio.Queue[_RomScanItem] = asyncio.Queue(
+        SCAN_PIPELINE_QUEUE_SIZE
     )
+    artwork_queue: asyncio.Queue[_RomScanItem] = asyncio.Queue(
+        SCAN_PIPELINE_QUEUE_SIZE
+    )
+    persist_queue: asyncio.Queue[_RomScanItem] = asyncio.Queue(
+        SCAN_PIPELINE_QUEUE_SIZE
+    )
+    # Rows created for new roms that haven't been through the persist stage yet
+    unpersisted_rom_ids: set[int] = set()
+
+    async def persist_roms(items: list[_RomScanItem]) -> None:
+        await _persist_roms(items)
+        unpersisted_rom_ids.difference_update(item.rom.id for item in items)
+
+    async def walk_roms() -> None:
+        index = 0
+        try:
+            for fs_roms_batch in batched(fs_roms, 200, strict=False):
+                rom_by_filename_map = db_rom_handler.get_roms_by_fs_name(
+                    platform_id=platform.id,
+                    fs_names={fs_rom["fs_name"] for fs_rom in fs_roms_batch},
+                )
 
-    await socket_manager.emit(
-        "scan:scanning_rom",
-        {
-            "platform_name": platform.name,
-            "platform_slug": platform.slug,
-            "platform_fs_slug": platform.fs_slug,
-            **SimpleRomSchema.from_orm_with_factory(_added_rom).model_dump(
-                exclude={"created_at", "updated_at", "rom_user"}
-            ),
-        },
+                for fs_rom in fs_roms_batch:
+                    # Break early if the flag is set
+                    if redis_client.get(STOP_SCAN_FLAG):
+                        return
+
+                    rom, newly_added = _prepare_rom(
+                        platform=platform,
+                        fs_rom=fs_rom,
+                        rom=rom_by_filename_map.get(fs_rom["fs_name"]),
+                        scan_type=scan_type,
+                        roms_ids=roms_ids,
+                    )
+                    if not rom:
+                        continue
+
+                    if newly_added:
+                        unpersisted_rom_ids.add(rom.id)
+                    await hash_queue.put(
+                        _RomScanItem(
+                            index=index,
+                            fs_rom=fs_rom,
+                            rom=rom,
+                            newly_added=newly_added,
+                        )
+                    )
+                    index += 1
+        finally:
+            hash_queue.shutdown()
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(walk_roms())
+            tg.create_task(
+                _run_scan_stage(
+                    lambda item: _hash_rom(item, scan_type),
+                    SCAN_HASHING_WORKERS,
+                    hash_queue,
+                    hash_lookup_queue,
+                    emitter,
+                )
+            )
+            tg.create_task(
+                # Hash lookups are batched, so duplicates and stored identifications
+                # are resolved together
+                _run_batched_scan_stage(
+                    lambda items: _lookup_rom_hashes(
+                        items, platform, scan_type, metadata_sources
+                    ),
+                    SCAN_HASH_LOOKUP_BATCH_SIZE,
+                    hash_lookup_queue,
+                    metadata_queue,
+                    emitter,
+                )
+            )
+            tg.create_task(
+                _run_scan_stage(
+                    lambda item: _fetch_rom_metadata(
+                        item, platform, scan_type, metadata_sources
+                    ),
+                    SCAN_METADATA_WORKERS,
+                    metadata_queue,
+                    artwork_queue,
+                    emitter,
+                )
+            )
+            tg.create_task(
+                _run_scan_stage(
+                    _fetch_rom_artwork,
+                    SCAN_ARTWORK_WORKERS,
+                    artwork_queue,
+                    persist_queue,
+                    emitter,
+                )
+            )
+            tg.create_task(
+                # Database sessions are synchronous, so roms are written in batches
+                _run_batched_scan_stage(
+                    persist_roms,
+                    SCAN_PERSIST_BATCH_SIZE,
+                    persist_queue,
+                    None,
+                    emitter,
+                )
+            )
+    except BaseExceptionGroup as eg:
+        # Surface the original error, as a failed rom used to stop the scan
+        raise _first_exception(eg) from eg
+    finally:
+        if unpersisted_rom_ids:
+            await _remove_unpersisted_roms(platform, unpersisted_rom_ids)
+
+    if emitter.deferred_hashes_rom_ids:
+        low_prio_queue.enqueue(
+            calculate_deferred_rom_hashes,
+            emitter.deferred_hashes_rom_ids,
+            metadata_sources,
+            job_timeout=SCAN_TIMEOUT,
+        )
+
+    return emitter.scan_stats
+
+
+def _has_new_hash_match(item: _RomScanItem) -> bool:
+    if not item.hash_matches:
+        return False
+
+    return bool(
+        (item.hash_matches["playmatch_rom"]["igdb_id"] and not item.rom.igdb_id)
+        or (
+            item.hash_matches["hasheous_hash_match"]["hasheous_id"]
+            and not item.rom.hasheous_id
+        )
     )
-    await socket_manager.emit("", None)
 
-    return scan_stats
+
+async def _identify_rom_hashes(
+    platform: Platform, items: list[_RomScanItem], metadata_sources: list[str]
+) -> None:
+    """Identify roms by their full hashes, and update the ones newly matched"""
+    # Ids missing from the roms are looked up, the ones already set are kept
+    await _lookup_rom_hashes(items, platform, ScanType.PARTIAL, metadata_sources)
+
+    matched_items = [item for item in items if _has_new_hash_match(item)]
+    for item in matched_items:
+        await _fetch_rom_metadata(item, platform, ScanType.PARTIAL, metadata_sources)
+        await _fetch_rom_artwork(item)
+
+    if matched_items:
+        await _persist_roms(matched_items)
+        log.info(
+            f"Identified {hl(str(len(matched_items)))} roms of {hl(platform.name)} "
+            "by their full hashes"
+        )
+
+
+@initialize_context()
+async def calculate_deferred_rom_hashes(
+    rom_ids: list[int], metadata_sources: list[str] | None = None
+) -> None:
+    """Calculate the full hashes of roms identified from their archive headers
+
+    The hash lookups of the scan only had the CRC of the archive headers, so the roms
+    are identified again by their full hashes, which Playmatch and Hasheous need.
+
+    Args:
+        rom_ids (list[int]): List of rom ids to calculate the hashes for
+        metadata_sources (list[str], optional): Metadata sources of the scan
+    """
+    log.info(f"Calculating hashes for {hl(str(len(rom_ids)))} roms")
+
+    hash_sources = [
+        source
+        for source in metadata_sources or []
+        if source in HASH_IDENTIFICATION_SOURCES
+    ]
+    items_by_platform_id: dict[int, list[_RomScanItem]] = {}
+    for index, rom_id in enumerate(rom_ids):
+        rom = db_rom_handler.get_rom(rom_id)
+        if not rom or rom.missing_from_fs:
+            continue
+
+        try:
+            fs_rom_files = await fs_rom_handler.get_rom_files(rom)
+        except FileNotFoundError:
+            continue
+
+        rom_files_by_path = {rom_file.full_path: rom_file for rom_file in rom.files}
+        for fs_rom_file in fs_rom_files["rom_files"]:
+            rom_file = rom_files_by_path.get(fs_rom_file.full_path)
+            if not rom_file:
+                continue
+
+            db_rom_handler.update_rom_file(
+                rom_file.id,
+                {
+                    "crc_hash": fs_rom_file.crc_hash,
+                    "md5_hash": fs_rom_file.md5_hash,
+                    "sha1_hash": fs_rom_file.sha1_hash,
+                },
+            )
+
+        db_rom_handler.update_rom(
+            rom.id,
+            {
+                "crc_hash": fs_rom_files["crc_hash"],
+                "md5_hash": fs_rom_files["md5_hash"],
+                "sha1_hash": fs_rom_files["sha1_hash"],
+            },
+        )
+
+        items_by_platform_id.setdefault(rom.platform_id, []).append(
+            _RomScanItem(
+                index=index,
+                fs_rom=FSRom(
+                    multi=rom.multi,
+                    fs_name=rom.fs_name,
+                    files=fs_rom_files["rom_files"],
+                    crc_hash=fs_rom_files["crc_hash"],
+                    md5_hash=fs_rom_files["md5_hash"],
+                    sha1_hash=fs_rom_files["sha1_hash"],
+                    ra_hash=fs_rom_files["ra_hash"],
+                ),
+                rom=rom,
+                newly_added=False,
+                rom_files=fs_rom_files["rom_files"],
+            )
+        )
+
+    if not hash_sources:
+        return
+
+    for platform_id, items in items_by_platform_id.items():
+        platform = db_platform_handler.get_platform(platform_id)
+        if platform:
+            await _identify_rom_hashes(platform, items, hash_sources)
 
 
 async def _identify_platform(
@@ -392,22 +835,14 @@ async def _identify_platform(
     else:
         log.info(f"{hl(str(len(fs_roms)))} roms found in the file system")
 
-    for fs_roms_batch in batched(fs_roms, 200, strict=False):
-        rom_by_filename_map = db_rom_handler.get_roms_by_fs_name(
-            platform_id=platform.id,
-            fs_names={fs_rom["fs_name"] for fs_rom in fs_roms_batch},
-        )
-
-        for fs_rom in fs_roms_batch:
-            scan_stats += await _identify_rom(
-                platform=platform,
-                fs_rom=fs_rom,
-                rom=rom_by_filename_map.get(fs_rom["fs_name"]),
-                scan_type=scan_type,
-                roms_ids=roms_ids,
-                metadata_sources=metadata_sources,
-                socket_manager=socket_manager,
-            )
+    scan_stats += await _identify_roms(
+        platform=platform,
+        fs_roms=fs_roms,
+        scan_type=scan_type,
+        roms_ids=roms_ids,
+        metadata_sources=metadata_sources,
+        socket_manager=socket_manager,
+    )
 
     missing_roms = db_rom_handler.mark_missing_roms(
         platform.id, [rom["fs_name"] for rom in fs_roms]
@@ -504,6 +939,17 @@ async def scan_platforms(
             for p in missed_platforms:
                 log.warning(f" - {p.slug}")
 
+        # Hashes of removed roms would otherwise be cached forever
+        await fs_rom_handler.prune_hashes_cache()
+
+        for rate_limiter_status in get_rate_limiters_status():
+            if rate_limiter_status["total_wait_time"]:
+                log.info(
+                    f"Waited {rate_limiter_status['total_wait_time']:.1f}s for the "
+                    f"{hl(rate_limiter_status['provider'])} rate limit, throttled "
+                    f"{rate_limiter_status['rate_limited_responses']} times"
+                )
+
         log.info(emoji.emojize(":check_mark:  Scan completed "))
         await sm.emit("scan:done", scan_stats.__dict__)
     except ScanStoppedException:
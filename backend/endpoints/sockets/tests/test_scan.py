@@ -1,9 +1,24 @@
-from unittest.mock import Mock
+from unittest.mock import AsyncMock, Mock, patch
 
+import httpx
 import pytest
-from endpoints.sockets.scan import ScanStats, _should_scan_rom
-from handler.scan_handler import ScanType
-from models.rom import Rom
+from endpoints.sockets.scan import (
+    ScanStats,
+    _OrderedRomEmitter,
+    _RomScanItem,
+    _identify_rom_hashes,
+    _identify_roms,
+    _should_scan_rom,
+)
+from handler.metadata.hasheous_handler import HasheousRom
+from handler.metadata.playmatch_handler import PlaymatchRomMatch
+from handler.scan_handler import (
+    HashMatches,
+    MetadataSource,
+    ScanType,
+    fetch_hash_matches,
+)
+from models.rom import Rom, RomFile
 
 
 def test_scan_stats():
@@ -16,6 +31,8 @@ def test_scan_stats():
     assert stats.metadata_roms == 0
     assert stats.scanned_firmware == 0
     assert stats.added_firmware == 0
+    assert stats.hash_cache_hits == 0
+    assert stats.hash_cache_misses == 0
 
     stats.scanned_platforms += 1
     stats.added_platforms += 1
@@ -25,6 +42,8 @@ def test_scan_stats():
     stats.metadata_roms += 1
     stats.scanned_firmware += 1
     stats.added_firmware += 1
+    stats.hash_cache_hits += 1
+    stats.hash_cache_misses += 1
 
     assert stats.scanned_platforms == 1
     assert stats.added_platforms == 1
@@ -34,6 +53,8 @@ def test_scan_stats():
     assert stats.metadata_roms == 1
     assert stats.scanned_firmware == 1
     assert stats.added_firmware == 1
+    assert stats.hash_cache_hits == 1
+    assert stats.hash_cache_misses == 1
 
 
 def test_merging_scan_stats():
@@ -46,6 +67,8 @@ def test_merging_scan_stats():
         metadata_roms=6,
         scanned_firmware=7,
         added_firmware=8,
+        hash_cache_hits=9,
+        hash_cache_misses=10,
     )
 
     stats2 = ScanStats(
@@ -57,6 +80,8 @@ def test_merging_scan_stats():
         metadata_roms=15,
         scanned_firmware=16,
         added_firmware=17,
+        hash_cache_hits=18,
+        hash_cache_misses=19,
     )
 
     stats += stats2
@@ -69,12 +94,180 @@ def test_merging_scan_stats():
     assert stats.metadata_roms == 21
     assert stats.scanned_firmware == 23
     assert stats.added_firmware == 25
+    assert stats.hash_cache_hits == 27
+    assert stats.hash_cache_misses == 29
 
     stats3: dict = {}
     with pytest.raises(NotImplementedError):
         stats += stats3
 
 
+async def test_ordered_rom_emitter():
+    emitter = _OrderedRomEmitter(platform=Mock(), socket_manager=Mock())
+    emitter._emit = AsyncMock()  # type: ignore
+
+    roms = [Mock(spec=Rom) for _ in range(4)]
+    items = [
+        _RomScanItem(index=i, fs_rom=Mock(), rom=rom, newly_added=False)
+        for i, rom in enumerate(roms)
+    ]
+    for item in items:
+        item.scan_stats.scanned_roms = 1
+
+    # Roms leave the pipeline out of order, and one of them is dropped
+    await emitter.complete(items[2])
+    await emitter.complete(items[1], scanned=False)
+    emitter._emit.assert_not_called()
+
+    await emitter.complete(items[0])
+    await emitter.complete(items[3])
+
+    assert [call.args[0] for call in emitter._emit.call_args_list] == [
+        roms[0],
+        roms[2],
+        roms[3],
+    ]
+    assert emitter.scan_stats.scanned_roms == 4
+
+
+@patch("endpoints.sockets.scan.redis_client", Mock(get=Mock(return_value=None)))
+@patch("endpoints.sockets.scan.fs_resource_handler")
+@patch("endpoints.sockets.scan.db_rom_handler")
+async def test_identify_roms_removes_unpersisted_roms_on_error(
+    db_rom_handler: Mock, fs_resource_handler: Mock
+):
+    fs_resource_handler.remove_directory = AsyncMock()
+    platform = Mock(id=1)
+    new_rom = Mock(spec=Rom, id=10)
+    existing_rom = Mock(spec=Rom, id=11)
+    prepared_roms = {"new.z64": (new_rom, True), "existing.z64": (existing_rom, False)}
+
+    with (
+        patch(
+            "endpoints.sockets.scan._prepare_rom",
+            side_effect=lambda fs_rom, **kwargs: prepared_roms[fs_rom["fs_name"]],
+        ),
+        patch("endpoints.sockets.scan._hash_rom", AsyncMock()),
+        patch("endpoints.sockets.scan._lookup_rom_hashes", AsyncMock()),
+        patch(
+            "endpoints.sockets.scan._fetch_rom_metadata",
+            AsyncMock(side_effect=RuntimeError("metadata")),
+        ),
+        pytest.raises(RuntimeError, match="metadata"),
+    ):
+        await _identify_roms(
+            platform=platform,
+            fs_roms=[
+                {"fs_name": "new.z64"},  # type: ignore
+                {"fs_name": "existing.z64"},  # type: ignore
+            ],
+            scan_type=ScanType.QUICK,
+            roms_ids=[],
+            metadata_sources=[],
+            socket_manager=Mock(),
+        )
+
+    db_rom_handler.delete_rom.assert_called_once_with(10)
+    fs_resource_handler.remove_directory.assert_awaited_once_with("roms/1/10")
+
+
+async def test_identify_rom_hashes_updates_newly_matched_roms():
+    platform = Mock(id=1)
+    items = [
+        _RomScanItem(
+            index=i,
+            fs_rom=Mock(),
+            rom=Mock(spec=Rom, igdb_id=None, hasheous_id=None),
+            newly_added=False,
+        )
+        for i in range(2)
+    ]
+
+    async def lookup_rom_hashes(items, *args):
+        for hasheous_id, item in enumerate(items):
+            item.hash_matches = HashMatches(
+                playmatch_rom=PlaymatchRomMatch(igdb_id=None),
+                hasheous_hash_match=HasheousRom(hasheous_id=hasheous_id or None),
+                hasheous_rom=HasheousRom(hasheous_id=hasheous_id or None),
+            )
+
+    with (
+        patch("endpoints.sockets.scan._lookup_rom_hashes", lookup_rom_hashes),
+        patch("endpoints.sockets.scan._fetch_rom_metadata") as fetch_rom_metadata,
+        patch("endpoints.sockets.scan._fetch_rom_artwork") as fetch_rom_artwork,
+        patch("endpoints.sockets.scan._persist_roms") as persist_roms,
+    ):
+        await _identify_rom_hashes(platform, items, [MetadataSource.HASHEOUS])
+
+    # Only the rom matched by its full hashes is updated
+    fetch_rom_metadata.assert_awaited_once_with(
+        items[1], platform, ScanType.PARTIAL, [MetadataSource.HASHEOUS]
+    )
+    fetch_rom_artwork.assert_awaited_once_with(items[1])
+    persist_roms.assert_awaited_once_with([items[1]])
+
+
+@patch("handler.scan_handler.HASHEOUS_API_ENABLED", True)
+@patch("handler.scan_handler.db_hash_identification_handler")
+async def test_fetch_hash_matches_coalesces_lookups(db_handler: Mock):
+    db_handler.get_identifications.return_value = {}
+    platform = Mock(slug="n64", igdb_id=None, hasheous_id=1)
+    duplicate_file = RomFile(
+        file_name="game.z64", file_size_bytes=10, crc_hash="abcd1234"
+    )
+    other_file = RomFile(file_name="other.z64", file_size_bytes=10, md5_hash="00ff")
+    roms = [
+        (Mock(spec=Rom), {"files": [duplicate_file]}, True),
+        (Mock(spec=Rom), {"files": [other_file]}, True),
+        (Mock(spec=Rom), {"files": [duplicate_file]}, True),
+    ]
+
+    with (
+        patch(
+            "handler.scan_handler.meta_hasheous_handler.lookup_rom",
+            AsyncMock(return_value=HasheousRom(hasheous_id=None)),
+        ) as lookup_rom,
+        patch(
+            "handler.scan_handler.meta_hasheous_handler.get_igdb_game"
+        ) as get_igdb_game,
+    ):
+        hash_matches = await fetch_hash_matches(
+            ScanType.QUICK, platform, roms, [MetadataSource.HASHEOUS]  # type: ignore
+        )
+
+    assert len(hash_matches) == 3
+    assert lookup_rom.await_count == 2
+    assert db_handler.get_identifications.call_count == 2
+    assert db_handler.upsert_identification.call_count == 2
+    get_igdb_game.assert_not_called()
+
+
+@patch("handler.metadata.hasheous_handler.HASHEOUS_API_ENABLED", True)
+@patch("handler.scan_handler.HASHEOUS_API_ENABLED", True)
+@patch("handler.scan_handler.db_hash_identification_handler")
+async def test_fetch_hash_matches_skips_storing_failed_lookups(db_handler: Mock):
+    db_handler.get_identifications.return_value = {}
+    platform = Mock(slug="n64", igdb_id=None, hasheous_id=1)
+    rom_file = RomFile(file_name="game.z64", file_size_bytes=10, md5_hash="0f34")
+
+    def respond(request: httpx.Request) -> httpx.Response:
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+    with patch(
+        "handler.metadata.hasheous_handler.ctx_httpx_client", get=lambda: client
+    ):
+        hash_matches = await fetch_hash_matches(
+            ScanType.QUICK,
+            platform,
+            [(Mock(spec=Rom), {"files": [rom_file]}, True)],  # type: ignore
+            [MetadataSource.HASHEOUS],
+        )
+
+    assert hash_matches[0]["hasheous_rom"]["hasheous_id"] is None
+    db_handler.upsert_identification.assert_not_called()
+
+
 class TestShouldScanRom:
     def test_new_platforms_scan_with_no_rom(self):
         """NEW_PLATFORMS should scan when rom is None"""
@@ -1,3 +1,7 @@
+from adapters.services.rate_limiter import (
+    RateLimiterStatus,
+    get_rate_limiters_status,
+)
 from endpoints.responses.stats import StatsReturn
 from handler.database import db_stats_handler
 from utils.router import APIRouter
@@ -24,3 +28,17 @@ def stats() -> StatsReturn:
         "SCREENSHOTS": db_stats_handler.get_screenshots_count(),
         "TOTAL_FILESIZE_BYTES": db_stats_handler.get_total_filesize(),
     }
+
+
+@router.get("/rate-limits")
+def rate_limits() -> list[RateLimiterStatus]:
+    """Endpoint to return the state of the rate limiter of each metadata provider
+
+    Limiters are kept per process, so this covers the requests sent by the web server,
+    while scans report theirs in the worker logs.
+
+    Returns:
+        list[RateLimiterStatus]: Rate, budget and waits of each provider
+    """
+
+    return get_rate_limiters_status()
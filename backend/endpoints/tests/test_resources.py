@@ -0,0 +1,56 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from handler.filesystem import fs_resource_handler
+from handler.filesystem.image_variants import IMAGE_VARIANTS_PATH, image_variant_cache
+from main import app
+from PIL.Image import DecompressionBombError
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def cover():
+    cover = Path(fs_resource_handler.base_path, "roms/1/1/cover/big.png")
+    cover.parent.mkdir(parents=True, exist_ok=True)
+    cover.write_bytes(b"cover")
+    yield cover
+    cover.unlink(missing_ok=True)
+
+
+def test_get_resource_image_variant_rejects_variant_cache(client, access_token):
+    variant = Path(IMAGE_VARIANTS_PATH, "ab/variant.webp")
+    variant.parent.mkdir(parents=True, exist_ok=True)
+    variant.write_bytes(b"variant")
+
+    try:
+        response = client.get(
+            "/api/resources/image_variants/ab/variant.webp",
+            headers={"Authorization": f"Bearer {access_token}"},
+            params={"width": 64},
+        )
+    finally:
+        variant.unlink()
+
+    assert response.status_code == 404
+
+
+def test_get_resource_image_variant_rejects_decompression_bombs(
+    client, access_token, cover: Path
+):
+    with patch.object(
+        image_variant_cache, "get", side_effect=DecompressionBombError("Too large")
+    ):
+        response = client.get(
+            "/api/resources/roms/1/1/cover/big.png",
+            headers={"Authorization": f"Bearer {access_token}"},
+            params={"width": 64},
+        )
+
+    assert response.status_code == 400
@@ -0,0 +1,19 @@
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+def test_rate_limits(client):
+    response = client.get("/api/stats/rate-limits")
+    assert response.status_code == 200
+
+    rate_limits = {status["provider"]: status for status in response.json()}
+    assert rate_limits["igdb"]["max_rate"] == 4
+    assert rate_limits["igdb"]["max_in_flight"] == 8
+    assert rate_limits["igdb"]["in_flight"] == 0
@@ -1,5 +1,6 @@
 from .collections_handler import DBCollectionsHandler
 from .firmware_handler import DBFirmwareHandler
+from .hash_identifications_handler import DBHashIdentificationsHandler
 from .platforms_handler import DBPlatformsHandler
 from .roms_handler import DBRomsHandler
 from .saves_handler import DBSavesHandler
@@ -9,6 +10,7 @@ from .stats_handler import DBStatsHandler
 from .users_handler import DBUsersHandler
 
 db_firmware_handler = DBFirmwareHandler()
+db_hash_identification_handler = DBHashIdentificationsHandler()
 db_platform_handler = DBPlatformsHandler()
 db_rom_handler = DBRomsHandler()
 db_save_handler = DBSavesHandler()
@@ -0,0 +1,76 @@
+from collections.abc import Collection
+
+from decorators.database import begin_session
+from models.hash_identification import HashIdentification
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from .base_handler import DBBaseHandler
+
+
+class DBHashIdentificationsHandler(DBBaseHandler):
+    @begin_session
+    def get_identification(
+        self,
+        provider: str,
+        *,
+        crc_hash: str | None,
+        md5_hash: str | None,
+        sha1_hash: str | None,
+        session: Session = None,
+    ) -> HashIdentification | None:
+        return session.scalar(
+            select(HashIdentification)
+            .filter_by(
+                provider=provider,
+                crc_hash=crc_hash or "",
+                md5_hash=md5_hash or "",
+                sha1_hash=sha1_hash or "",
+            )
+            .limit(1)
+        )
+
+    @begin_session
+    def get_identifications(
+        self,
+        provider: str,
+        hashes: Collection[tuple[str, str, str]],
+        session: Session = None,
+    ) -> dict[tuple[str, str, str], HashIdentification]:
+        """Get the identifications of many files, keyed by (crc, md5, sha1) hashes."""
+        if not hashes:
+            return {}
+
+        identifications = session.scalars(
+            select(HashIdentification).where(
+                HashIdentification.provider == provider,
+                tuple_(
+                    HashIdentification.crc_hash,
+                    HashIdentification.md5_hash,
+                    HashIdentification.sha1_hash,
+                ).in_(list(hashes)),
+            )
+        ).all()
+        return {
+            (i.crc_hash, i.md5_hash, i.sha1_hash): i for i in identifications
+        }
+
+    @begin_session
+    def upsert_identification(
+        self, identification: HashIdentification, session: Session = None
+    ) -> HashIdentification:
+        identification.crc_hash = identification.crc_hash or ""
+        identification.md5_hash = identification.md5_hash or ""
+        identification.sha1_hash = identification.sha1_hash or ""
+
+        identification.id = session.scalar(
+            select(HashIdentification.id)
+            .filter_by(
+                provider=identification.provider,
+                crc_hash=identification.crc_hash,
+                md5_hash=identification.md5_hash,
+                sha1_hash=identification.sha1_hash,
+            )
+            .limit(1)
+        )
+        return session.merge(identification)
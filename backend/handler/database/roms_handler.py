@@ -1,4 +1,6 @@
 import functools
+import math
+import struct
 from collections.abc import Iterable, Sequence
 
 from config import ROMM_DB_DRIVER
@@ -24,10 +26,22 @@ from sqlalchemy import (
     text,
     update,
 )
+from sqlalchemy.inspection import inspect
 from sqlalchemy.orm import InstrumentedAttribute, Query, Session, selectinload
 
 from .base_handler import DBBaseHandler
 
+# Fields of the rom files updated on rescans, when they differ from the stored ones
+ROM_FILE_RECONCILED_FIELDS = (
+    "file_size_bytes",
+    "last_modified",
+    "category",
+    "crc_hash",
+    "md5_hash",
+    "sha1_hash",
+    "ra_hash",
+)
+
 EJS_SUPPORTED_PLATFORMS = [
     "3do",
     "amiga",
@@ -134,6 +148,15 @@ def with_simple(func):
     return wrapper
 
 
+def _round_timestamp(timestamp: float) -> float:
+    """Round a timestamp the way the float columns of the database store it."""
+    if ROMM_DB_DRIVER == "postgresql":
+        return timestamp
+
+    # MariaDB and MySQL store float columns in single precision
+    return struct.unpack("f", struct.pack("f", timestamp))[0]
+
+
 class DBRomsHandler(DBBaseHandler):
     @begin_session
     @with_details
@@ -578,6 +601,7 @@ class DBRomsHandler(DBBaseHandler):
                     RomFile.rom_id,
                     func.sum(RomFile.file_size_bytes).label("total_size"),
                 )
+                .filter(RomFile.missing_from_fs.is_(False))
                 .group_by(RomFile.rom_id)
                 .subquery()
             )
@@ -783,7 +807,9 @@ class DBRomsHandler(DBBaseHandler):
 
     @begin_session
     def get_rom_file_by_id(self, id: int, session: Session = None) -> RomFile | None:
-        return session.scalar(select(RomFile).filter_by(id=id).limit(1))
+        return session.scalar(
+            select(RomFile).filter_by(id=id, missing_from_fs=False).limit(1)
+        )
 
     @begin_session
     def update_rom_file(self, id: int, data: dict, session: Session = None) -> RomFile:
@@ -796,16 +822,117 @@ class DBRomsHandler(DBBaseHandler):
 
         return session.query(RomFile).filter_by(id=id).one()
 
+    def _reconcile_rom_files(
+        self,
+        rom_ids: Sequence[int],
+        rom_files: Sequence[RomFile],
+        session: Session,
+    ) -> None:
+        stored_rom_files = {
+            (rom_file.rom_id, rom_file.file_path, rom_file.file_name): rom_file
+            for rom_file in session.scalars(
+                select(RomFile).where(RomFile.rom_id.in_(rom_ids))
+            )
+        }
+
+        new_rom_files: list[RomFile] = []
+        rom_file_updates: list[dict] = []
+        for rom_file in rom_files:
+            stored_rom_file = stored_rom_files.pop(
+                (rom_file.rom_id, rom_file.file_path, rom_file.file_name), None
+            )
+            if not stored_rom_file:
+                new_rom_files.append(rom_file)
+                continue
+
+            changes = {
+                key: getattr(rom_file, key)
+                for key in ROM_FILE_RECONCILED_FIELDS
+                if getattr(rom_file, key) != getattr(stored_rom_file, key)
+            }
+            # Differences left after rounding are sub-second parts the column dropped
+            if changes.get("last_modified") is not None and math.isclose(
+                _round_timestamp(changes["last_modified"]),
+                stored_rom_file.last_modified or 0,
+                abs_tol=1,
+            ):
+                del changes["last_modified"]
+            if stored_rom_file.missing_from_fs:
+                changes["missing_from_fs"] = False
+            if changes:
+                rom_file_updates.append({"id": stored_rom_file.id, **changes})
+
+        missing_rom_file_ids = [
+            rom_file.id
+            for rom_file in stored_rom_files.values()
+            if not rom_file.missing_from_fs
+        ]
+
+        if rom_file_updates:
+            session.execute(update(RomFile), rom_file_updates)
+        if missing_rom_file_ids:
+            session.execute(
+                update(RomFile)
+                .where(RomFile.id.in_(missing_rom_file_ids))
+                .values(missing_from_fs=True)
+                .execution_options(synchronize_session=False)
+            )
+        session.add_all(new_rom_files)
+
     @begin_session
-    def purge_rom_files(
-        self, rom_id: int, session: Session = None
-    ) -> Sequence[RomFile]:
-        purged_rom_files = (
-            session.scalars(select(RomFile).filter_by(rom_id=rom_id)).unique().all()
-        )
-        session.execute(
-            delete(RomFile)
-            .where(RomFile.rom_id == rom_id)
-            .execution_options(synchronize_session="evaluate")
+    @with_details
+    def bulk_update_scanned_roms(
+        self,
+        roms: Sequence[Rom],
+        rom_files: Sequence[RomFile],
+        query: Query = None,
+        session: Session = None,
+    ) -> Sequence[Rom]:
+        """Update a batch of scanned roms and reconcile their files in a single transaction.
+
+        Only the attributes set on each rom that differ from the stored values are updated,
+        files are matched to the stored ones by path and name, and files no longer found on
+        the filesystem are marked as missing, so rescanning unchanged roms writes nothing.
+        """
+        if not roms:
+            return []
+
+        rom_ids = [rom.id for rom in roms]
+        column_keys = set(Rom.__mapper__.column_attrs.keys())
+
+        stored_roms = {
+            row["id"]: row
+            for row in session.execute(
+                select(*(getattr(Rom, key).label(key) for key in column_keys)).where(
+                    Rom.id.in_(rom_ids)
+                )
+            ).mappings()
+        }
+
+        rom_updates = []
+        for rom in roms:
+            stored_rom = stored_roms.get(rom.id, {})
+            changes = {
+                key: value
+                for key, value in inspect(rom).dict.items()
+                if key in column_keys and stored_rom.get(key) != value
+            }
+            if changes:
+                rom_updates.append({"id": rom.id, **changes})
+
+        # Roms are grouped by the set of updated columns, so each group is sent as a
+        # single executemany UPDATE
+        if rom_updates:
+            session.execute(update(Rom), rom_updates)
+
+        self._reconcile_rom_files(rom_ids, rom_files, session=session)
+        session.flush()
+
+        # Bulk updates don't refresh the objects already loaded in the session
+        session.expire_all()
+
+        return (
+            session.scalars(query.filter(Rom.id.in_(rom_ids)).order_by(Rom.id))
+            .unique()
+            .all()
         )
-        return purged_rom_files
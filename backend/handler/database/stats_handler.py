@@ -39,7 +39,9 @@ class DBStatsHandler(DBBaseHandler):
         """Get the total filesize of all roms in the database, in bytes."""
         return (
             session.scalar(
-                select(func.sum(RomFile.file_size_bytes)).select_from(RomFile)
+                select(func.sum(RomFile.file_size_bytes))
+                .select_from(RomFile)
+                .filter(RomFile.missing_from_fs.is_(False))
             )
             or 0
         )
@@ -52,7 +54,10 @@ class DBStatsHandler(DBBaseHandler):
                 select(func.sum(RomFile.file_size_bytes))
                 .select_from(RomFile)
                 .join(Rom)
-                .filter(Rom.platform_id == platform_id)
+                .filter(
+                    Rom.platform_id == platform_id,
+                    RomFile.missing_from_fs.is_(False),
+                )
             )
             or 0
         )
@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Final, Literal
+
+from config import (
+    IMAGE_VARIANTS_CACHE_MAX_SIZE_MB,
+    IMAGE_VARIANTS_WORKERS,
+    RESOURCES_BASE_PATH,
+)
+from handler.metadata.base_hander import single_flight
+from logger.logger import log
+from PIL import Image
+
+IMAGE_VARIANTS_PATH: Final = os.path.join(RESOURCES_BASE_PATH, "image_variants")
+
+ImageFormat = Literal["webp", "avif", "jpeg", "png"]
+
+PIL_FORMATS: Final[dict[ImageFormat, str]] = {
+    "webp": "WEBP",
+    "avif": "AVIF",
+    "jpeg": "JPEG",
+    "png": "PNG",
+}
+MEDIA_TYPES: Final[dict[ImageFormat, str]] = {
+    "webp": "image/webp",
+    "avif": "image/avif",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+}
+
+MAX_VARIANT_WIDTH: Final = 2048
+# Widths are rounded up to a multiple of this, to bound the variants of each image
+VARIANT_WIDTH_STEP: Final = 32
+# Once full, the cache is brought back under this share of its maximum size
+EVICTION_TARGET_RATIO: Final = 0.8
+# Seconds between updates of the last use of a variant, to avoid a write per request
+VARIANT_TOUCH_INTERVAL: Final = 60 * 60
+
+
+def is_format_supported(image_format: ImageFormat) -> bool:
+    # AVIF needs a recent enough Pillow, or its plugin
+    Image.init()
+    return PIL_FORMATS[image_format] in Image.SAVE
+
+
+def round_variant_width(width: int) -> int:
+    width = -(-width // VARIANT_WIDTH_STEP) * VARIANT_WIDTH_STEP
+    return min(width, MAX_VARIANT_WIDTH)
+
+
+class ImageVariantCache:
+    """Resized and re-encoded variants of the resource images, cached on disk.
+
+    Variants are generated on first request in a pool of worker threads. They're
+    named after the source image, its size and modification time, so a replaced image
+    gets new variants. The least recently used variants are removed once the cache
+    grows past its maximum size.
+    """
+
+    def __init__(self, base_path: str, max_size: int, max_workers: int) -> None:
+        self.base_path = Path(base_path)
+        self.max_size = max_size
+        self.max_workers = max(max_workers, 1)
+        self._executor: ThreadPoolExecutor | None = None
+        # Estimated size of the cache, read from disk on first use
+        self._size: int | None = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Pillow releases the GIL while decoding, resizing and encoding images
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="image_variants"
+            )
+        return self._executor
+
+    def _get_variant_path(
+        self, source: Path, width: int, image_format: ImageFormat, quality: int
+    ) -> Path:
+        stat = source.stat()
+        key = f"{source}:{stat.st_size}:{stat.st_mtime_ns}:{width}:{quality}"
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.base_path / digest[:2] / f"{digest}.{image_format}"
+
+    def _touch(self, variant_path: Path) -> bool:
+        """Mark the variant as used, and return whether it exists."""
+        try:
+            if time.time() - variant_path.stat().st_mtime > VARIANT_TOUCH_INTERVAL:
+                os.utime(variant_path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _generate(
+        self,
+        source: Path,
+        variant_path: Path,
+        width: int,
+        image_format: ImageFormat,
+        quality: int,
+    ) -> int:
+        with Image.open(source) as img:
+            height = max(round(img.height * width / img.width), 1)
+            # JPEG images are decoded at a reduced scale, close to the variant size
+            img.draft("RGB", (width, height))
+
+            variant: Image.Image = img
+            if variant.mode not in ("RGB", "RGBA", "L", "LA"):
+                variant = variant.convert("RGBA")
+            if image_format == "jpeg" and variant.mode != "RGB":
+                variant = variant.convert("RGB")
+            # Images are never upscaled
+            if width < variant.width:
+                variant = variant.resize(
+                    (width, height), Image.Resampling.LANCZOS, reducing_gap=3.0
+                )
+
+            variant_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = variant_path.with_name(
+                f".{variant_path.name}.{uuid.uuid4().hex}"
+            )
+            try:
+                variant.save(
+                    tmp_path, format=PIL_FORMATS[image_format], quality=quality
+                )
+                os.replace(tmp_path, variant_path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+
+        return variant_path.stat().st_size
+
+    def _evict_sync(self) -> int:
+        """Remove the least recently used variants, and return the cache size."""
+        variants: list[tuple[float, int, Path]] = []
+        for variant_path in self.base_path.glob("*/[!.]*"):
+            try:
+                stat = variant_path.stat()
+            except FileNotFoundError:
+                continue
+            variants.append((stat.st_mtime, stat.st_size, variant_path))
+
+        size = sum(variant_size for _, variant_size, _ in variants)
+        if size <= self.max_size:
+            return size
+
+        removed_variants = 0
+        variants.sort()
+        # The latest variant is kept, it may be about to be served
+        for _, variant_size, variant_path in variants[:-1]:
+            if size <= self.max_size * EVICTION_TARGET_RATIO:
+                break
+            variant_path.unlink(missing_ok=True)
+            size -= variant_size
+            removed_variants += 1
+
+        log.debug(f"Removed {removed_variants} least recently used image variants")
+        return size
+
+    @single_flight
+    async def _evict(self) -> None:
+        self._size = await asyncio.to_thread(self._evict_sync)
+
+    @single_flight
+    async def _create(
+        self,
+        source: Path,
+        variant_path: Path,
+        width: int,
+        image_format: ImageFormat,
+        quality: int,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        variant_size = await loop.run_in_executor(
+            self._get_executor(),
+            self._generate,
+            source,
+            variant_path,
+            width,
+            image_format,
+            quality,
+        )
+
+        if self._size is None:
+            await self._evict()
+        else:
+            self._size += variant_size
+            if self._size > self.max_size:
+                await self._evict()
+
+    async def get(
+        self, source: Path, width: int, image_format: ImageFormat, quality: int
+    ) -> Path:
+        """Return the path of a variant of an image, generating it if needed.
+
+        :param source: Path of the image.
+        :param width: Maximum width of the variant, the height keeps the aspect ratio.
+        :param image_format: Format the variant is encoded in.
+        :param quality: Encoding quality, from 1 to 100, ignored by lossless formats.
+        :raises FileNotFoundError: If the image doesn't exist.
+        :raises PIL.UnidentifiedImageError: If the file isn't a supported image.
+        """
+        variant_path = await asyncio.to_thread(
+            self._get_variant_path, source, width, image_format, quality
+        )
+        if not await asyncio.to_thread(self._touch, variant_path):
+            await self._create(source, variant_path, width, image_format, quality)
+
+        return variant_path
+
+
+image_variant_cache = ImageVariantCache(
+    IMAGE_VARIANTS_PATH,
+    max_size=IMAGE_VARIANTS_CACHE_MAX_SIZE_MB * 1024 * 1024,
+    max_workers=IMAGE_VARIANTS_WORKERS,
+)
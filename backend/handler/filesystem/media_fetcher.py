@@ -0,0 +1,126 @@
+import asyncio
+import http
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from typing import Final
+
+import httpx
+from adapters.services.rate_limiter import parse_retry_after
+from anyio import AsyncFile
+from logger.logger import log
+from utils.context import ctx_httpx_client
+
+# Media downloads running at once, across all roms and per media host
+MEDIA_DOWNLOAD_CONCURRENCY: Final = 16
+MEDIA_DOWNLOAD_CONCURRENCY_PER_HOST: Final = 6
+MEDIA_DOWNLOAD_RETRIES: Final = 3
+# Base delay of the exponential backoff between retries, in seconds
+MEDIA_DOWNLOAD_RETRY_DELAY: Final = 1.0
+
+RETRYABLE_STATUS_CODES: Final = frozenset(
+    {
+        http.HTTPStatus.TOO_MANY_REQUESTS,
+        http.HTTPStatus.BAD_GATEWAY,
+        http.HTTPStatus.SERVICE_UNAVAILABLE,
+        http.HTTPStatus.GATEWAY_TIMEOUT,
+    }
+)
+
+
+class MediaFetcher:
+    """Downloads media files (covers, screenshots, manuals, badges) to the filesystem.
+
+    Downloads can be started all at once, they're run within a global limit and a
+    limit per host. Transient failures are retried with exponential backoff, or
+    after the delay requested by the server.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = MEDIA_DOWNLOAD_CONCURRENCY,
+        max_concurrency_per_host: int = MEDIA_DOWNLOAD_CONCURRENCY_PER_HOST,
+        max_retries: int = MEDIA_DOWNLOAD_RETRIES,
+    ) -> None:
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_concurrency_per_host = max(max_concurrency_per_host, 1)
+        self.max_retries = max_retries
+
+        self._semaphore: asyncio.Semaphore | None = None
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _get_semaphores(
+        self, host: str
+    ) -> tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        # Asyncio primitives are bound to the event loop they're first used in
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._host_semaphores = {}
+            self._loop = loop
+
+        host_semaphore = self._host_semaphores.get(host)
+        if host_semaphore is None:
+            host_semaphore = asyncio.Semaphore(self.max_concurrency_per_host)
+            self._host_semaphores[host] = host_semaphore
+
+        return self._semaphore, host_semaphore
+
+    @asynccontextmanager
+    async def _acquire(self, url: str) -> AsyncIterator[None]:
+        semaphore, host_semaphore = self._get_semaphores(httpx.URL(url).host)
+        # The host slot is taken first, so a busy host doesn't hold global slots
+        async with host_semaphore, semaphore:
+            yield
+
+    async def download(
+        self,
+        url: str,
+        open_file: Callable[[], Awaitable[AsyncFile[bytes]]],
+        headers: dict[str, str] | None = None,
+    ) -> httpx.Response | None:
+        """Download a file, and return the response of the server if it succeeded.
+
+        :param url: URL of the file.
+        :param open_file: Callable opening the destination file for writing. The file
+            is only opened once the server answered successfully.
+        :param headers: Request headers, e.g. to make the request conditional. If the
+            file wasn't modified, the response is returned without writing the file.
+        :raises httpx.TransportError: If the download still fails after retrying.
+        """
+        httpx_client = ctx_httpx_client.get()
+
+        for attempt in range(self.max_retries + 1):
+            retry_after: float | None = None
+            try:
+                async with self._acquire(url):
+                    async with httpx_client.stream(
+                        "GET", url, headers=headers, timeout=120
+                    ) as response:
+                        if response.status_code == http.HTTPStatus.OK:
+                            async with await open_file() as f:
+                                async for chunk in response.aiter_raw():
+                                    await f.write(chunk)
+                            return response
+
+                        if response.status_code == http.HTTPStatus.NOT_MODIFIED:
+                            return response
+
+                        if response.status_code not in RETRYABLE_STATUS_CODES:
+                            return None
+
+                        retry_after = parse_retry_after(response.headers)
+            except httpx.TransportError as exc:
+                if attempt == self.max_retries:
+                    raise
+                log.debug(f"Retrying download of {url} after error: {str(exc)}")
+
+            if attempt < self.max_retries:
+                if retry_after is None:
+                    retry_after = MEDIA_DOWNLOAD_RETRY_DELAY * 2**attempt
+                await asyncio.sleep(retry_after)
+
+        return None
+
+
+media_fetcher = MediaFetcher()
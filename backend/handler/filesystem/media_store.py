@@ -0,0 +1,336 @@
+import asyncio
+import fcntl
+import hashlib
+import http
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from enum import Enum
+from pathlib import Path
+from typing import Final, NotRequired, TypedDict
+
+import httpx
+from anyio import open_file
+from config import RESOURCES_BASE_PATH
+from handler.metadata.base_hander import single_flight
+from logger.logger import log
+
+from .media_fetcher import MediaFetcher, media_fetcher
+
+MEDIA_STORE_PATH: Final = os.path.join(RESOURCES_BASE_PATH, "media_store")
+# Blobs added or reused more recently are kept, as they may not be linked yet
+BLOB_GRACE_PERIOD: Final = 60 * 60
+
+
+class FetchResult(Enum):
+    STORED = "stored"
+    UNCHANGED = "unchanged"
+    NOT_FOUND = "not_found"
+
+
+class MediaRecord(TypedDict):
+    url: str
+    digest: str
+    # Validators sent back to the server to only download the file again if it changed
+    etag: str | None
+    last_modified: str | None
+    # Targets the blob was copied to instead of linked, with the modification time of
+    # each copy, as copies don't count as links to the blob
+    copies: NotRequired[dict[str, int]]
+
+
+def _hash_file(file_path: Path) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _sharded_path(directory: Path, digest: str) -> Path:
+    return directory / digest[:2] / digest
+
+
+def _is_copy_of(target: Path, mtime_ns: int) -> bool:
+    try:
+        return target.stat().st_mtime_ns == mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+class MediaStore:
+    """Content-addressed store of the media files downloaded for roms and collections.
+
+    Each distinct file is stored once as a blob named after the hash of its content,
+    and the files under the resources path of each rom are hard links to it. The same
+    badge or cover used by several roms therefore takes disk space once, and is only
+    downloaded once, as blobs are also indexed by the URL they were downloaded from.
+
+    A file already linked from the blob of its URL is left untouched, so fetching the
+    media of an unchanged rom again doesn't write anything. The content behind a URL
+    is only checked again with a conditional request when revalidating it.
+
+    On filesystems without hard links, blobs are copied instead, and the copies are
+    tracked in the record of their URL to keep the blob while they're unchanged.
+
+    Unreferenced blobs are removed by a scheduled task, which holds an exclusive file
+    lock on the store while fetches from any process hold a shared one.
+
+    Files linked from the store must never be written to in place, only replaced.
+    """
+
+    def __init__(
+        self,
+        base_path: str,
+        fetcher: MediaFetcher,
+        blob_grace_period: int = BLOB_GRACE_PERIOD,
+    ) -> None:
+        self.base_path = Path(base_path)
+        self.blobs_path = self.base_path / "blobs"
+        self.urls_path = self.base_path / "urls"
+        self.tmp_path = self.base_path / "tmp"
+        self.lock_path = self.base_path / ".lock"
+        self.fetcher = fetcher
+        self.blob_grace_period = blob_grace_period
+        # Records are updated from worker threads when tracking copies
+        self._records_lock = threading.Lock()
+
+    @contextmanager
+    def _lock(self, exclusive: bool = False) -> Iterator[None]:
+        """Hold the lock on the store, across processes."""
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _get_record_path(self, url: str) -> Path:
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        return _sharded_path(self.urls_path, digest).with_suffix(".json")
+
+    def _read_record(self, record_path: Path) -> MediaRecord | None:
+        try:
+            with open(record_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_record(self, record: MediaRecord) -> None:
+        record_path = self._get_record_path(record["url"])
+        record_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_record_path = record_path.with_name(
+            f".{record_path.name}.{uuid.uuid4().hex}"
+        )
+        with open(tmp_record_path, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp_record_path, record_path)
+
+    def _get_record(self, url: str) -> MediaRecord | None:
+        """Return the record of the URL, if its blob is still stored."""
+        record = self._read_record(self._get_record_path(url))
+        if record is None:
+            return None
+
+        if not _sharded_path(self.blobs_path, record["digest"]).exists():
+            return None
+
+        return record
+
+    def _add_copy(self, record: MediaRecord, target: Path) -> None:
+        with self._records_lock:
+            # Copies made for other targets since the record was read are kept
+            current_record = self._get_record(record["url"])
+            if current_record is None or current_record["digest"] != record["digest"]:
+                return
+
+            copies = current_record.setdefault("copies", {})
+            copies[str(target)] = target.stat().st_mtime_ns
+            self._write_record(current_record)
+
+    def _link(self, record: MediaRecord, target: Path) -> FetchResult:
+        """Replace the target with a link to the blob of the record, or a copy of it.
+
+        :raises FileNotFoundError: If the blob was removed since the record was read.
+        """
+        with self._lock():
+            return self._link_blob(record, target)
+
+    def _link_blob(self, record: MediaRecord, target: Path) -> FetchResult:
+        blob_path = _sharded_path(self.blobs_path, record["digest"])
+        try:
+            if target.samefile(blob_path):
+                return FetchResult.UNCHANGED
+        except FileNotFoundError:
+            pass
+
+        copy_mtime_ns = record.get("copies", {}).get(str(target))
+        if copy_mtime_ns is not None and _is_copy_of(target, copy_mtime_ns):
+            return FetchResult.UNCHANGED
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_target = target.with_name(f".{target.name}.{uuid.uuid4().hex}")
+        try:
+            os.link(blob_path, tmp_target)
+            copied = False
+        except OSError:
+            # Hard links may not be supported by the filesystem
+            shutil.copyfile(blob_path, tmp_target)
+            copied = True
+        os.replace(tmp_target, target)
+
+        if copied:
+            self._add_copy(record, target)
+        return FetchResult.STORED
+
+    def _add(self, url: str, file_path: Path, headers: httpx.Headers) -> MediaRecord:
+        with self._lock():
+            return self._add_blob(url, file_path, headers)
+
+    def _add_blob(
+        self, url: str, file_path: Path, headers: httpx.Headers
+    ) -> MediaRecord:
+        digest = _hash_file(file_path)
+        blob_path = _sharded_path(self.blobs_path, digest)
+        if blob_path.exists():
+            # Reusing the blob starts its grace period over, until it's linked again
+            os.utime(blob_path)
+        else:
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(file_path, blob_path)
+
+        # Records reference the blobs by name, which doesn't count as a link to them
+        record = MediaRecord(
+            url=url,
+            digest=digest,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+        )
+        with self._records_lock:
+            previous_record = self._get_record(url)
+            # Copies of the previous content are still valid if it didn't change
+            if previous_record and previous_record["digest"] == digest:
+                record["copies"] = previous_record.get("copies", {})
+            self._write_record(record)
+
+        return record
+
+    @single_flight
+    async def _download(self, url: str, revalidate: bool) -> MediaRecord | None:
+        """Download the file at the URL into the store, and return its record."""
+        record = await asyncio.to_thread(self._get_record, url)
+        if record and not revalidate:
+            return record
+
+        headers: dict[str, str] = {}
+        if record and record["etag"]:
+            headers["If-None-Match"] = record["etag"]
+        if record and record["last_modified"]:
+            headers["If-Modified-Since"] = record["last_modified"]
+
+        self.tmp_path.mkdir(parents=True, exist_ok=True)
+        tmp_file_path = self.tmp_path / uuid.uuid4().hex
+        try:
+            response = await self.fetcher.download(
+                url, lambda: open_file(tmp_file_path, "wb"), headers=headers
+            )
+            if response is None:
+                return None
+
+            if response.status_code == http.HTTPStatus.NOT_MODIFIED:
+                return record
+
+            return await asyncio.to_thread(
+                self._add, url, tmp_file_path, response.headers
+            )
+        finally:
+            tmp_file_path.unlink(missing_ok=True)
+
+    async def fetch(
+        self, url: str, target: Path, revalidate: bool = False
+    ) -> FetchResult:
+        """Store the file at the URL as the target.
+
+        The file is only downloaded if it wasn't downloaded before, or if it changed
+        since then when revalidating it. Concurrent downloads of the same URL are
+        coalesced into one.
+
+        :param url: URL of the file.
+        :param target: Path the file is stored as.
+        :param revalidate: Whether to ask the server if the file changed, with a
+            conditional request.
+        :raises httpx.TransportError: If the download fails.
+        """
+        record = await asyncio.to_thread(self._get_record, url)
+        if record is None or revalidate:
+            record = await self._download(url, revalidate)
+            if record is None:
+                return FetchResult.NOT_FOUND
+
+        try:
+            return await asyncio.to_thread(self._link, record, target)
+        except FileNotFoundError:
+            # The blob was removed as unreferenced since its record was read
+            record = await self._download(url, False)
+            if record is None:
+                return FetchResult.NOT_FOUND
+            return await asyncio.to_thread(self._link, record, target)
+
+    def _remove_unreferenced(self) -> int:
+        # Blobs copied to targets that are still unchanged are kept
+        copied_digests: set[str] = set()
+        grace_period_start = time.time() - self.blob_grace_period
+        with self._lock(exclusive=True), self._records_lock:
+            for record_path in self.urls_path.glob("*/*.json"):
+                record = self._read_record(record_path)
+                if record is None:
+                    record_path.unlink(missing_ok=True)
+                    continue
+
+                copies = record.get("copies", {})
+                kept_copies = {
+                    target: mtime_ns
+                    for target, mtime_ns in copies.items()
+                    if _is_copy_of(Path(target), mtime_ns)
+                }
+                if kept_copies:
+                    copied_digests.add(record["digest"])
+                if kept_copies != copies:
+                    record["copies"] = kept_copies
+                    self._write_record(record)
+
+            removed_blobs = 0
+            for blob_path in self.blobs_path.glob("*/*"):
+                blob_stat = blob_path.stat()
+                # The blob itself is its only link left
+                if (
+                    blob_stat.st_nlink <= 1
+                    and blob_stat.st_mtime < grace_period_start
+                    and blob_path.name not in copied_digests
+                ):
+                    blob_path.unlink()
+                    removed_blobs += 1
+
+            for record_path in self.urls_path.glob("*/*.json"):
+                record = self._read_record(record_path)
+                if record is None or not (
+                    _sharded_path(self.blobs_path, record["digest"]).exists()
+                ):
+                    record_path.unlink(missing_ok=True)
+
+        return removed_blobs
+
+    async def remove_unreferenced(self) -> None:
+        """Remove the blobs no longer linked or copied to any rom or collection.
+
+        Blobs within their grace period are kept, as a fetch may be about to link them.
+        """
+        removed_blobs = await asyncio.to_thread(self._remove_unreferenced)
+        if removed_blobs:
+            log.info(f"Removed {removed_blobs} unreferenced media files")
+
+
+media_store = MediaStore(MEDIA_STORE_PATH, media_fetcher)
@@ -1,21 +1,45 @@
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from pathlib import Path
+from typing import Final, TypedDict
 
 import httpx
-from config import RESOURCES_BASE_PATH
+from config import RESOURCES_BASE_PATH, SCAN_ARTWORK_WORKERS
 from logger.logger import log
 from models.collection import Collection
 from models.rom import Rom
 from PIL import Image, ImageFile, UnidentifiedImageError
-from utils.context import ctx_httpx_client
 
 from .base_handler import CoverSize, FSHandler
+from .media_store import FetchResult, media_store
+
+# Small covers are a fraction of the big ones, so a cheap filter is good enough
+SMALL_COVER_RESAMPLING: Final = Image.Resampling.BILINEAR
+# Reduce the image by an integer factor before resampling, much faster on big covers
+SMALL_COVER_REDUCING_GAP: Final = 2.0
+
+
+class RomMedia(TypedDict):
+    path_cover_s: str | None
+    path_cover_l: str | None
+    path_manual: str | None
+    path_screenshots: list[str]
 
 
 class FSResourcesHandler(FSHandler):
     def __init__(self) -> None:
         super().__init__(base_path=RESOURCES_BASE_PATH)
+        self._executor: ThreadPoolExecutor | None = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Pillow releases the GIL while decoding, resizing and encoding images
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=SCAN_ARTWORK_WORKERS, thread_name_prefix="artwork"
+            )
+        return self._executor
 
     def get_platform_resources_path(self, platform_id: int) -> str:
         return os.path.join("roms", str(platform_id))
@@ -45,44 +69,75 @@ class FSResourcesHandler(FSHandler):
         small_width = int(cover.width * ratio)
         small_height = int(cover.height * ratio)
         small_size = (small_width, small_height)
-        small_img = cover.resize(small_size)
+
+        # JPEG covers are decoded straight at a reduced scale, if not loaded yet
+        cover.draft(None, small_size)
+        small_img = cover.resize(
+            small_size,
+            SMALL_COVER_RESAMPLING,
+            reducing_gap=SMALL_COVER_REDUCING_GAP,
+        )
 
         small_img.save(save_path)
 
+    def _derive_small_cover(self, cover_path: Path, save_path: Path) -> None:
+        with Image.open(cover_path) as img:
+            self.resize_cover_to_small(img, save_path=str(save_path))
+
+    def _save_artwork(
+        self, artwork: BytesIO, path_cover_l: Path, path_cover_s: Path
+    ) -> None:
+        with Image.open(artwork) as img:
+            # The previous cover may be linked from the media store, shared with others
+            path_cover_l.unlink(missing_ok=True)
+            img.save(path_cover_l)
+            self.resize_cover_to_small(img, save_path=str(path_cover_s))
+
     async def _store_cover(
-        self, entity: Rom | Collection, url_cover: str, size: CoverSize
+        self, entity: Rom | Collection, url_cover: str, revalidate: bool = False
     ) -> None:
-        """Store roms resources in filesystem
+        """Store rom or collection cover in filesystem
+
+        The cover is downloaded once as the big cover, and the small cover is derived
+        from it in a worker thread. Both are left untouched if the big cover is
+        already the one at the URL.
 
         Args:
-            fs_slug: short name of the platform
-            rom_name: name of rom file
+            entity: Rom or Collection object
             url_cover: url to get the cover
-            size: size of the cover
+            revalidate: whether to check if the cover at the url changed
         """
         cover_file = f"{entity.fs_resources_path}/cover"
         await self.make_directory(f"{cover_file}")
 
-        httpx_client = ctx_httpx_client.get()
         try:
-            async with httpx_client.stream("GET", url_cover, timeout=120) as response:
-                if response.status_code == 200:
-                    async with await self.write_file_streamed(
-                        path=cover_file, filename=f"{size.value}.png"
-                    ) as f:
-                        async for chunk in response.aiter_raw():
-                            await f.write(chunk)
+            result = await media_store.fetch(
+                url_cover,
+                self.validate_path(f"{cover_file}/{CoverSize.BIG.value}.png"),
+                revalidate=revalidate,
+            )
         except httpx.TransportError as exc:
             log.error(f"Unable to fetch cover at {url_cover}: {str(exc)}")
+            return None
 
-        if size == CoverSize.SMALL:
-            try:
-                image_path = self.validate_path(f"{cover_file}/{size.value}.png")
-                with Image.open(image_path) as img:
-                    self.resize_cover_to_small(img, save_path=str(image_path))
-            except UnidentifiedImageError as exc:
-                log.error(f"Unable to identify image {cover_file}: {str(exc)}")
-                return None
+        if result == FetchResult.NOT_FOUND:
+            return None
+        if result == FetchResult.UNCHANGED and self.cover_exists(
+            entity, CoverSize.SMALL
+        ):
+            return None
+
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                self._get_executor(),
+                self._derive_small_cover,
+                self.validate_path(f"{cover_file}/{CoverSize.BIG.value}.png"),
+                self.validate_path(f"{cover_file}/{CoverSize.SMALL.value}.png"),
+            )
+        except UnidentifiedImageError as exc:
+            log.error(f"Unable to identify image {cover_file}: {str(exc)}")
+            return None
 
     def _get_cover_path(self, entity: Rom | Collection, size: CoverSize) -> str | None:
         """Returns rom cover filesystem path adapted to frontend folder structure
@@ -103,22 +158,20 @@ class FSResourcesHandler(FSHandler):
         if not entity:
             return None, None
 
+        # Existing covers, e.g. uploaded by the user, are only replaced when overwriting
+        # them, in which case the cover at the url is only downloaded if it changed
         small_cover_exists = self.cover_exists(entity, CoverSize.SMALL)
-        if url_cover and (overwrite or not small_cover_exists):
-            await self._store_cover(entity, url_cover, CoverSize.SMALL)
+        big_cover_exists = self.cover_exists(entity, CoverSize.BIG)
+        if url_cover and (overwrite or not (small_cover_exists and big_cover_exists)):
+            await self._store_cover(entity, url_cover, revalidate=overwrite)
             small_cover_exists = self.cover_exists(entity, CoverSize.SMALL)
+            big_cover_exists = self.cover_exists(entity, CoverSize.BIG)
 
         path_cover_s = (
             self._get_cover_path(entity, CoverSize.SMALL)
             if small_cover_exists
             else None
         )
-
-        big_cover_exists = self.cover_exists(entity, CoverSize.BIG)
-        if url_cover and (overwrite or not big_cover_exists):
-            await self._store_cover(entity, url_cover, CoverSize.BIG)
-            big_cover_exists = self.cover_exists(entity, CoverSize.BIG)
-
         path_cover_l = (
             self._get_cover_path(entity, CoverSize.BIG) if big_cover_exists else None
         )
@@ -154,10 +207,15 @@ class FSResourcesHandler(FSHandler):
         """Store artwork in filesystem and return paths."""
         path_cover_l, path_cover_s = await self._build_artwork_path(entity, file_ext)
 
+        loop = asyncio.get_running_loop()
         try:
-            with Image.open(artwork) as img:
-                img.save(path_cover_l)
-                self.resize_cover_to_small(img, save_path=str(path_cover_s))
+            await loop.run_in_executor(
+                self._get_executor(),
+                self._save_artwork,
+                artwork,
+                path_cover_l,
+                path_cover_s,
+            )
         except UnidentifiedImageError as exc:
             log.error(
                 f"Unable to identify image for {entity.fs_resources_path}: {str(exc)}"
@@ -177,17 +235,10 @@ class FSResourcesHandler(FSHandler):
         """
         screenshot_path = f"{rom.fs_resources_path}/screenshots"
 
-        httpx_client = ctx_httpx_client.get()
         try:
-            async with httpx_client.stream(
-                "GET", url_screenhot, timeout=120
-            ) as response:
-                if response.status_code == 200:
-                    async with await self.write_file_streamed(
-                        path=screenshot_path, filename=f"{idx}.jpg"
-                    ) as f:
-                        async for chunk in response.aiter_raw():
-                            await f.write(chunk)
+            await media_store.fetch(
+                url_screenhot, self.validate_path(f"{screenshot_path}/{idx}.jpg")
+            )
         except httpx.TransportError as exc:
             log.error(f"Unable to fetch screenshot at {url_screenhot}: {str(exc)}")
             return None
@@ -207,12 +258,17 @@ class FSResourcesHandler(FSHandler):
         if not rom or not url_screenshots:
             return []
 
-        path_screenshots: list[str] = []
-        for idx, url_screenhot in enumerate(url_screenshots):
-            await self._store_screenshot(rom, url_screenhot, idx)
-            path_screenshots.append(self._get_screenshot_path(rom, str(idx)))
+        await asyncio.gather(
+            *(
+                self._store_screenshot(rom, url_screenhot, idx)
+                for idx, url_screenhot in enumerate(url_screenshots)
+            )
+        )
 
-        return path_screenshots
+        return [
+            self._get_screenshot_path(rom, str(idx))
+            for idx in range(len(url_screenshots))
+        ]
 
     def manual_exists(self, rom: Rom) -> bool:
         """Check if rom manual exists in filesystem
@@ -227,18 +283,15 @@ class FSResourcesHandler(FSHandler):
             return True
         return False
 
-    async def _store_manual(self, rom: Rom, url_manual: str):
+    async def _store_manual(self, rom: Rom, url_manual: str, revalidate: bool = False):
         manual_path = f"{rom.fs_resources_path}/manual"
 
-        httpx_client = ctx_httpx_client.get()
         try:
-            async with httpx_client.stream("GET", url_manual, timeout=120) as response:
-                if response.status_code == 200:
-                    async with await self.write_file_streamed(
-                        path=manual_path, filename=f"{rom.id}.pdf"
-                    ) as f:
-                        async for chunk in response.aiter_raw():
-                            await f.write(chunk)
+            await media_store.fetch(
+                url_manual,
+                self.validate_path(f"{manual_path}/{rom.id}.pdf"),
+                revalidate=revalidate,
+            )
         except httpx.TransportError as exc:
             log.error(f"Unable to fetch manual at {url_manual}: {str(exc)}")
             return None
@@ -261,29 +314,71 @@ class FSResourcesHandler(FSHandler):
         if not rom:
             return None
 
-        manual_exists = self.manual_exists(rom)
-        if url_manual and (overwrite or not manual_exists):
-            await self._store_manual(rom, url_manual)
-            manual_exists = self.manual_exists(rom)
+        if url_manual and (overwrite or not self.manual_exists(rom)):
+            await self._store_manual(rom, url_manual, revalidate=overwrite)
 
-        path_manual = self._get_manual_path(rom) if manual_exists else None
+        path_manual = self._get_manual_path(rom) if self.manual_exists(rom) else None
         return path_manual
 
     async def store_ra_badge(self, url: str, path: str) -> None:
-        httpx_client = ctx_httpx_client.get()
-        directory, filename = os.path.split(path)
-
+        # Badges shared with other roms are linked from the media store right away
         try:
-            async with httpx_client.stream("GET", url, timeout=120) as response:
-                if response.status_code == 200:
-                    async with await self.write_file_streamed(
-                        path=directory, filename=filename
-                    ) as f:
-                        async for chunk in response.aiter_raw():
-                            await f.write(chunk)
+            await media_store.fetch(url, self.validate_path(path))
         except httpx.TransportError as exc:
             log.error(f"Unable to fetch cover at {url}: {str(exc)}")
 
+    async def store_ra_badges(self, rom: Rom) -> None:
+        """Store the locked and unlocked badges of all the rom achievements."""
+        if not rom.ra_metadata:
+            return
+
+        await self.create_ra_resources_path(rom.platform_id, rom.id)
+
+        badges = [
+            (ach.get(url_key), ach.get(path_key))
+            for ach in rom.ra_metadata.get("achievements", [])
+            for url_key, path_key in (
+                ("badge_url_lock", "badge_path_lock"),
+                ("badge_url", "badge_path"),
+            )
+        ]
+        await asyncio.gather(
+            *(
+                self.store_ra_badge(badge_url, badge_path)
+                for badge_url, badge_path in badges
+                if badge_url and badge_path
+            )
+        )
+
+    async def fetch_rom_media(self, rom: Rom, overwrite: bool = False) -> RomMedia:
+        """Download all the media of a rom at once: cover, manual, screenshots and
+        achievement badges.
+
+        An existing cover or manual is only replaced when overwriting it, and media
+        already stored from the same urls is only downloaded again if the server
+        reports it changed."""
+        (path_cover_s, path_cover_l), path_manual, path_screenshots, _ = (
+            await asyncio.gather(
+                self.get_cover(
+                    entity=rom, overwrite=overwrite, url_cover=rom.url_cover
+                ),
+                self.get_manual(
+                    rom=rom, overwrite=overwrite, url_manual=rom.url_manual
+                ),
+                self.get_rom_screenshots(
+                    rom=rom, url_screenshots=rom.url_screenshots
+                ),
+                self.store_ra_badges(rom),
+            )
+        )
+
+        return RomMedia(
+            path_cover_s=path_cover_s,
+            path_cover_l=path_cover_l,
+            path_manual=path_manual,
+            path_screenshots=path_screenshots,
+        )
+
     def get_ra_resources_path(self, platform_id: int, rom_id: int) -> str:
         return os.path.join(
             "roms",
@@ -1,26 +1,34 @@
+import asyncio
 import binascii
 import bz2
 import fnmatch
 import hashlib
+import json
+import multiprocessing
 import os
 import re
 import tarfile
+import threading
 import zipfile
 import zlib
 from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import batched
 from pathlib import Path
 from typing import IO, Any, Final, Literal, TypedDict
 
-import magic
 import py7zr
 import zipfile_inflate64  # trunk-ignore(ruff/F401): Patches zipfile to support Enhanced Deflate
 from adapters.services.rahasher import RAHasherService
-from config import LIBRARY_BASE_PATH
+from config import LIBRARY_BASE_PATH, SCAN_HASHING_WORKERS
 from config.config_manager import config_manager as cm
 from exceptions.fs_exceptions import (
     RomAlreadyExistsException,
     RomsNotFoundException,
 )
+from handler.redis_handler import async_cache
+from logger.logger import log
 from models.platform import Platform
 from models.rom import Rom, RomFile, RomFileCategory
 from py7zr.exceptions import (
@@ -42,28 +50,6 @@ from .base_handler import (
     FSHandler,
 )
 
-# Known compressed file MIME types
-COMPRESSED_MIME_TYPES: Final = frozenset(
-    (
-        "application/x-7z-compressed",
-        "application/x-bzip2",
-        "application/x-gzip",
-        "application/x-tar",
-        "application/zip",
-    )
-)
-
-# Known file extensions that are compressed
-COMPRESSED_FILE_EXTENSIONS = frozenset(
-    (
-        ".7z",
-        ".bz2",
-        ".gz",
-        ".tar",
-        ".zip",
-    )
-)
-
 NON_HASHABLE_PLATFORMS = frozenset(
     (
         "amazon-alexa",
@@ -97,6 +83,15 @@ NON_HASHABLE_PLATFORMS = frozenset(
 )
 
 FILE_READ_CHUNK_SIZE = 1024 * 8
+# Uncompressed files are read in larger blocks, to reduce the per-chunk overhead of
+# updating the hashes from Python
+LARGE_FILE_READ_CHUNK_SIZE = 1024 * 1024 * 2
+
+# Fingerprints and hashes of the files of each rom, keyed by the absolute rom path
+ROM_HASHES_CACHE_KEY: Final = "romm:rom_hashes"
+RA_HASHES_CACHE_KEY: Final = "romm:ra_hashes"
+# Fields read and removed at a time when pruning the hashes caches
+HASHES_CACHE_PRUNE_BATCH_SIZE: Final = 1000
 
 
 class FSRom(TypedDict):
@@ -115,13 +110,38 @@ class FileHash(TypedDict):
     sha1_hash: str
 
 
-def is_compressed_file(file_path: str) -> bool:
-    mime = magic.Magic(mime=True)
-    file_type = mime.from_file(file_path)
+class FSRomFiles(TypedDict):
+    rom_files: list[RomFile]
+    crc_hash: str
+    md5_hash: str
+    sha1_hash: str
+    ra_hash: str
+    hash_cache_hits: int
+    hash_cache_misses: int
+    # Only the CRC was read from the archive headers, MD5 and SHA1 are still pending
+    hashes_deferred: bool
 
-    return file_type in COMPRESSED_MIME_TYPES or file_path.endswith(
-        tuple(COMPRESSED_FILE_EXTENSIONS)
-    )
+
+class RomHashesCacheEntry(TypedDict):
+    fingerprint: dict[str, list[int]]
+    files: dict[str, FileHash]
+    crc_hash: str
+    md5_hash: str
+    sha1_hash: str
+    ra_hash: str
+
+
+class RAHashCacheEntry(TypedDict):
+    fingerprint: dict[str, list[int]]
+    platform_id: int
+    ra_hash: str
+
+
+EMPTY_FILE_HASH: Final = FileHash(crc_hash="", md5_hash="", sha1_hash="")
+
+
+def _get_missing_paths(paths: list[str]) -> list[str]:
+    return [path for path in paths if not os.path.exists(path)]
 
 
 def read_basic_file(file_path: os.PathLike[str]) -> Iterator[bytes]:
@@ -130,6 +150,21 @@ def read_basic_file(file_path: os.PathLike[str]) -> Iterator[bytes]:
             yield chunk
 
 
+def read_basic_file_into(
+    file_path: os.PathLike[str], chunk_size: int = LARGE_FILE_READ_CHUNK_SIZE
+) -> Iterator[memoryview]:
+    """Read a file into a reusable buffer, yielding zero-copy views of each block.
+
+    The yielded views share the same buffer, so each one is only valid until the next
+    block is read.
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        while size := f.readinto(buffer):
+            yield view[:size]
+
+
 def read_zip_file(file: str | os.PathLike[str] | IO[bytes]) -> Iterator[bytes]:
     try:
         with zipfile.ZipFile(file, "r") as z:
@@ -223,6 +258,44 @@ def read_bz2_file(file_path: Path) -> Iterator[bytes]:
             yield chunk
 
 
+def read_archive_header_hash(file_path: Path) -> FileHash | None:
+    """Read the CRC of the first file of a zip or 7z archive from its headers.
+
+    This matches the CRC calculated when decompressing the archive, as only its first
+    file is hashed. Returns None if the CRC is not available without decompressing.
+    """
+    extension = file_path.suffix.lower()
+    try:
+        if extension == ".zip":
+            with zipfile.ZipFile(file_path, "r") as z:
+                infolist = z.infolist()
+                if not infolist:
+                    return None
+                crc_c = infolist[0].CRC
+        elif extension == ".7z":
+            with py7zr.SevenZipFile(file_path, mode="r") as archive:
+                file_list = archive.list()
+                if not file_list or file_list[0].crc32 is None:
+                    return None
+                crc_c = file_list[0].crc32
+        else:
+            return None
+    except (
+        OSError,
+        zipfile.BadZipFile,
+        Bad7zFile,
+        PasswordRequired,
+        UnsupportedCompressionMethodError,
+    ):
+        return None
+
+    return FileHash(
+        crc_hash=crc32_to_hex(crc_c) if crc_c != DEFAULT_CRC_C else "",
+        md5_hash="",
+        sha1_hash="",
+    )
+
+
 def category_matches(category: str, path_parts: list[str]):
     return category in path_parts or f"{category}s" in path_parts
 
@@ -232,6 +305,195 @@ DEFAULT_MD5_H_DIGEST = hashlib.md5(usedforsecurity=False).digest()
 DEFAULT_SHA1_H_DIGEST = hashlib.sha1(usedforsecurity=False).digest()
 
 
+def _build_file_hash(crc_c: int, md5_h: Any, sha1_h: Any) -> FileHash:
+    return FileHash(
+        crc_hash=crc32_to_hex(crc_c) if crc_c != DEFAULT_CRC_C else "",
+        md5_hash=md5_h.hexdigest() if md5_h.digest() != DEFAULT_MD5_H_DIGEST else "",
+        sha1_hash=(
+            sha1_h.hexdigest() if sha1_h.digest() != DEFAULT_SHA1_H_DIGEST else ""
+        ),
+    )
+
+
+def calculate_file_hashes(
+    file_path: Path,
+    rom_crc_c: int,
+    rom_md5_h: Any,
+    rom_sha1_h: Any,
+) -> tuple[int, int, Any, Any, Any, Any]:
+    """Calculate the hashes of a file, and update the provided rom hashes with its content."""
+    extension = Path(file_path).suffix.lower()
+    try:
+        crc_c = 0
+        md5_h = hashlib.md5(usedforsecurity=False)
+        sha1_h = hashlib.sha1(usedforsecurity=False)
+
+        # Until the rom hashes have been fed any content, they would end up equal to the
+        # hashes of this file, so they're copied at the end instead of calculated twice
+        update_rom_hashes = (
+            rom_crc_c != DEFAULT_CRC_C
+            or rom_md5_h.digest() != DEFAULT_MD5_H_DIGEST
+            or rom_sha1_h.digest() != DEFAULT_SHA1_H_DIGEST
+        )
+
+        def update_file_hashes(chunk: bytes | bytearray | memoryview):
+            md5_h.update(chunk)
+            sha1_h.update(chunk)
+
+            nonlocal crc_c
+            crc_c = binascii.crc32(chunk, crc_c)
+
+        def update_file_and_rom_hashes(chunk: bytes | bytearray | memoryview):
+            md5_h.update(chunk)
+            rom_md5_h.update(chunk)
+
+            sha1_h.update(chunk)
+            rom_sha1_h.update(chunk)
+
+            nonlocal crc_c
+            crc_c = binascii.crc32(chunk, crc_c)
+            nonlocal rom_crc_c
+            rom_crc_c = binascii.crc32(chunk, rom_crc_c)
+
+        update_hashes = (
+            update_file_and_rom_hashes if update_rom_hashes else update_file_hashes
+        )
+
+        if extension == ".zip":
+            for chunk in read_zip_file(file_path):
+                update_hashes(chunk)
+
+        elif extension == ".tar":
+            for chunk in read_tar_file(file_path):
+                update_hashes(chunk)
+
+        elif extension == ".gz":
+            for chunk in read_gz_file(file_path):
+                update_hashes(chunk)
+
+        elif extension == ".7z":
+            process_7z_file(
+                file_path=file_path,
+                fn_hash_update=update_hashes,
+                fn_hash_read=lambda size: sha1_h.digest(),
+            )
+
+        elif extension == ".bz2":
+            for chunk in read_bz2_file(file_path):
+                update_hashes(chunk)
+
+        else:
+            for chunk in read_basic_file_into(file_path):
+                update_hashes(chunk)
+
+        if not update_rom_hashes:
+            rom_crc_c = crc_c
+            rom_md5_h = md5_h.copy()
+            rom_sha1_h = sha1_h.copy()
+
+        return crc_c, rom_crc_c, md5_h, rom_md5_h, sha1_h, rom_sha1_h
+    except (FileNotFoundError, PermissionError):
+        return (
+            0,
+            rom_crc_c,
+            hashlib.md5(usedforsecurity=False),
+            rom_md5_h,
+            hashlib.sha1(usedforsecurity=False),
+            rom_sha1_h,
+        )
+
+
+def calculate_rom_files_hashes(
+    file_paths: list[Path],
+) -> tuple[list[FileHash], FileHash]:
+    """Calculate the hashes of every file of a rom, and the hashes of the rom itself.
+
+    The rom hashes are calculated over the content of all files, in the same order as
+    they are provided. This runs in the hashing worker processes, so it must only
+    receive and return picklable values.
+    """
+    rom_crc_c = 0
+    rom_md5_h = hashlib.md5(usedforsecurity=False)
+    rom_sha1_h = hashlib.sha1(usedforsecurity=False)
+
+    file_hashes: list[FileHash] = []
+    for file_path in file_paths:
+        try:
+            crc_c, rom_crc_c, md5_h, rom_md5_h, sha1_h, rom_sha1_h = (
+                calculate_file_hashes(file_path, rom_crc_c, rom_md5_h, rom_sha1_h)
+            )
+        except zlib.error:
+            crc_c = 0
+            md5_h = hashlib.md5(usedforsecurity=False)
+            sha1_h = hashlib.sha1(usedforsecurity=False)
+
+        file_hashes.append(_build_file_hash(crc_c, md5_h, sha1_h))
+
+    return file_hashes, _build_file_hash(rom_crc_c, rom_md5_h, rom_sha1_h)
+
+
+class RomHashingEngine:
+    """Offloads rom hashing, including decompression, to a pool of worker processes.
+
+    Each rom is hashed by a single worker, so the rom hashes are calculated over its files
+    in order, while different roms are hashed in parallel.
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        self.max_workers = max(max_workers, 1)
+        self._executor: ProcessPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # The pool is created lazily so importing this module doesn't spawn processes
+        with self._executor_lock:
+            if self._executor is None:
+                # Forking would copy the threads and open connections of the server
+                start_method = (
+                    "forkserver"
+                    if "forkserver" in multiprocessing.get_all_start_methods()
+                    else "spawn"
+                )
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(start_method),
+                )
+            return self._executor
+
+    def _replace_broken_executor(self, executor: ProcessPoolExecutor) -> None:
+        with self._executor_lock:
+            # Concurrent hashes fail together, the pool is only replaced by the first
+            if self._executor is executor:
+                log.warning("Hashing process pool is broken, restarting it")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    async def hash_rom_files(
+        self, file_paths: list[Path]
+    ) -> tuple[list[FileHash], FileHash]:
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            return await loop.run_in_executor(
+                executor, calculate_rom_files_hashes, file_paths
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by the OOM killer), start a new pool and retry once
+            self._replace_broken_executor(executor)
+            return await loop.run_in_executor(
+                self._get_executor(), calculate_rom_files_hashes, file_paths
+            )
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+rom_hashing_engine = RomHashingEngine(max_workers=SCAN_HASHING_WORKERS)
+
+
 class FSRomsHandler(FSHandler):
     def __init__(self) -> None:
         super().__init__(base_path=LIBRARY_BASE_PATH)
@@ -326,14 +588,114 @@ class FSRomsHandler(FSHandler):
             sha1_hash=file_hash["sha1_hash"],
         )
 
-    async def get_rom_files(self, rom: Rom) -> tuple[list[RomFile], str, str, str, str]:
+    async def _get_cached_rom_hashes(
+        self, rom_path: str, fingerprint: dict[str, list[int]]
+    ) -> RomHashesCacheEntry | None:
+        cached_entry = await async_cache.hget(ROM_HASHES_CACHE_KEY, rom_path)
+        if not cached_entry:
+            return None
+
+        try:
+            entry: RomHashesCacheEntry = json.loads(cached_entry)
+        except json.JSONDecodeError:
+            return None
+
+        # Any added, removed or modified file invalidates the whole entry, as the
+        # rom hashes are calculated over the content of all files
+        if entry.get("fingerprint") != fingerprint:
+            return None
+
+        return entry
+
+    async def _set_cached_rom_hashes(
+        self, rom_path: str, entry: RomHashesCacheEntry
+    ) -> None:
+        await async_cache.hset(ROM_HASHES_CACHE_KEY, rom_path, json.dumps(entry))
+
+    async def prune_hashes_cache(self) -> None:
+        """Remove the cached hashes of roms no longer in the library."""
+        removed_entries = 0
+        for cache_key in (ROM_HASHES_CACHE_KEY, RA_HASHES_CACHE_KEY):
+            rom_paths = [
+                rom_path
+                async for rom_path, _ in async_cache.hscan_iter(
+                    cache_key, count=HASHES_CACHE_PRUNE_BATCH_SIZE
+                )
+            ]
+            missing_rom_paths = await asyncio.to_thread(_get_missing_paths, rom_paths)
+            for rom_paths_batch in batched(
+                missing_rom_paths, HASHES_CACHE_PRUNE_BATCH_SIZE, strict=False
+            ):
+                await async_cache.hdel(cache_key, *rom_paths_batch)
+            removed_entries += len(missing_rom_paths)
+
+        if removed_entries:
+            log.info(f"Removed {removed_entries} cached hashes of removed roms")
+
+    async def _calculate_ra_hash(
+        self,
+        rom: Rom,
+        abs_rom_path: str,
+        is_multi: bool,
+        fingerprint: dict[str, list[int]],
+    ) -> str:
         from handler.metadata.ra_handler import RA_PLATFORM_LIST
 
+        # Calculate the RA hash if the platform has a slug that matches a known RA slug
+        if rom.platform_slug not in RA_PLATFORM_LIST.keys():
+            return ""
+
+        platform_id = RA_PLATFORM_LIST[rom.platform_slug]["id"]
+
+        # Unchanged files never need to run RAHasher again
+        cached_entry = await async_cache.hget(RA_HASHES_CACHE_KEY, abs_rom_path)
+        if cached_entry:
+            try:
+                entry: RAHashCacheEntry = json.loads(cached_entry)
+                if (
+                    entry.get("fingerprint") == fingerprint
+                    and entry.get("platform_id") == platform_id
+                ):
+                    return entry["ra_hash"]
+            except json.JSONDecodeError:
+                pass
+
+        ra_hash = await RAHasherService().calculate_hash(
+            platform_id,
+            f"{abs_rom_path}/*" if is_multi else abs_rom_path,
+        )
+
+        # Failures are not cached, as they may be caused by a missing RAHasher binary
+        if ra_hash:
+            await async_cache.hset(
+                RA_HASHES_CACHE_KEY,
+                abs_rom_path,
+                json.dumps(
+                    RAHashCacheEntry(
+                        fingerprint=fingerprint,
+                        platform_id=platform_id,
+                        ra_hash=ra_hash,
+                    )
+                ),
+            )
+
+        return ra_hash
+
+    async def get_rom_files(
+        self, rom: Rom, fast_identify: bool = False
+    ) -> FSRomFiles:
+        """Get the files of a rom with their hashes
+
+        Args:
+            rom: rom to get the files from
+            fast_identify: for single file zip/7z roms, read the CRC from the archive
+                headers instead of decompressing it, leaving the MD5 and SHA1 empty
+        """
         rel_roms_path = self.get_roms_fs_structure(
             rom.platform.fs_slug
         )  # Relative path to roms
         abs_fs_path = f"{self.base_path}/{rel_roms_path}"  # Absolute path to roms
-        rom_files: list[RomFile] = []
+        abs_rom_path = f"{abs_fs_path}/{rom.fs_name}"
 
         # Skip hashing games for platforms that don't have a hash database
         hashable_platform = rom.platform_slug not in NON_HASHABLE_PLATFORMS
@@ -341,23 +703,11 @@ class FSRomsHandler(FSHandler):
         excluded_file_names = cm.get_config().EXCLUDED_MULTI_PARTS_FILES
         excluded_file_exts = cm.get_config().EXCLUDED_MULTI_PARTS_EXT
 
-        rom_crc_c = 0
-        rom_md5_h = hashlib.md5(usedforsecurity=False)
-        rom_sha1_h = hashlib.sha1(usedforsecurity=False)
-        rom_ra_h = ""
-
         # Check if rom is a multi-part rom
-        if os.path.isdir(f"{abs_fs_path}/{rom.fs_name}"):
-            # Calculate the RA hash if the platform has a slug that matches a known RA slug
-            if rom.platform_slug in RA_PLATFORM_LIST.keys():
-                rom_ra_h = await RAHasherService().calculate_hash(
-                    RA_PLATFORM_LIST[rom.platform_slug]["id"],
-                    f"{abs_fs_path}/{rom.fs_name}/*",
-                )
-
-            for f_path, file_name in iter_files(
-                f"{abs_fs_path}/{rom.fs_name}", recursive=True
-            ):
+        is_multi = os.path.isdir(abs_rom_path)
+        file_paths: list[Path] = []
+        if is_multi:
+            for f_path, file_name in iter_files(abs_rom_path, recursive=True):
                 # Check if file is excluded
                 ext = self.parse_file_extension(file_name)
                 if not ext or ext in excluded_file_exts:
@@ -369,169 +719,120 @@ class FSRomsHandler(FSHandler):
                 ):
                     continue
 
-                if hashable_platform:
-                    try:
-                        crc_c, rom_crc_c, md5_h, rom_md5_h, sha1_h, rom_sha1_h = (
-                            self._calculate_rom_hashes(
-                                Path(f_path, file_name),
-                                rom_crc_c,
-                                rom_md5_h,
-                                rom_sha1_h,
-                            )
-                        )
-                    except zlib.error:
-                        crc_c = 0
-                        md5_h = hashlib.md5(usedforsecurity=False)
-                        sha1_h = hashlib.sha1(usedforsecurity=False)
-
-                    file_hash = FileHash(
-                        crc_hash=crc32_to_hex(crc_c) if crc_c != DEFAULT_CRC_C else "",
-                        md5_hash=(
-                            md5_h.hexdigest()
-                            if md5_h.digest() != DEFAULT_MD5_H_DIGEST
-                            else ""
-                        ),
-                        sha1_hash=(
-                            sha1_h.hexdigest()
-                            if sha1_h.digest() != DEFAULT_SHA1_H_DIGEST
-                            else ""
-                        ),
-                    )
-                else:
-                    file_hash = FileHash(
-                        crc_hash="",
-                        md5_hash="",
-                        sha1_hash="",
-                    )
+                file_paths.append(Path(f_path, file_name))
+        else:
+            file_paths.append(Path(abs_fs_path, rom.fs_name))
 
-                rom_files.append(
-                    self._build_rom_file(
-                        f_path.relative_to(self.base_path),
-                        file_name,
-                        file_hash,
-                    )
-                )
-        elif hashable_platform:
+        # Files are identified by their path, size and modification time, so unchanged
+        # files can reuse the hashes calculated in a previous scan
+        fingerprint: dict[str, list[int]] = {}
+        for file_path in file_paths:
             try:
-                crc_c, rom_crc_c, md5_h, rom_md5_h, sha1_h, rom_sha1_h = (
-                    self._calculate_rom_hashes(
-                        Path(abs_fs_path, rom.fs_name), rom_crc_c, rom_md5_h, rom_sha1_h
-                    )
-                )
-            except zlib.error:
-                crc_c = 0
-                md5_h = hashlib.md5(usedforsecurity=False)
-                sha1_h = hashlib.sha1(usedforsecurity=False)
-
-            # Calculate the RA hash if the platform has a slug that matches a known RA slug
-            if rom.platform_slug in RA_PLATFORM_LIST.keys():
-                rom_ra_h = await RAHasherService().calculate_hash(
-                    RA_PLATFORM_LIST[rom.platform_slug]["id"],
-                    f"{abs_fs_path}/{rom.fs_name}",
-                )
-
-            file_hash = FileHash(
-                crc_hash=crc32_to_hex(crc_c) if crc_c != DEFAULT_CRC_C else "",
-                md5_hash=(
-                    md5_h.hexdigest() if md5_h.digest() != DEFAULT_MD5_H_DIGEST else ""
-                ),
-                sha1_hash=(
-                    sha1_h.hexdigest()
-                    if sha1_h.digest() != DEFAULT_SHA1_H_DIGEST
-                    else ""
-                ),
-            )
-            rom_files.append(
-                self._build_rom_file(Path(rel_roms_path), rom.fs_name, file_hash)
+                file_stat = os.stat(file_path)
+                fingerprint[str(file_path)] = [
+                    file_stat.st_size,
+                    file_stat.st_mtime_ns,
+                ]
+            except (FileNotFoundError, PermissionError):
+                fingerprint[str(file_path)] = [0, 0]
+
+        if not hashable_platform:
+            # Platforms without a hash database may still be supported by RAHasher
+            rom_ra_h = await self._calculate_ra_hash(
+                rom, abs_rom_path, is_multi, fingerprint
             )
-        else:
-            file_hash = FileHash(
+            return FSRomFiles(
+                rom_files=[
+                    self._build_rom_file(
+                        file_path.parent.relative_to(self.base_path),
+                        file_path.name,
+                        EMPTY_FILE_HASH,
+                    )
+                    for file_path in file_paths
+                ],
                 crc_hash="",
                 md5_hash="",
                 sha1_hash="",
+                ra_hash=rom_ra_h,
+                hash_cache_hits=0,
+                hash_cache_misses=0,
+                hashes_deferred=False,
             )
-            rom_files.append(
-                self._build_rom_file(Path(rel_roms_path), rom.fs_name, file_hash)
-            )
-
-        return (
-            rom_files,
-            crc32_to_hex(rom_crc_c) if rom_crc_c != DEFAULT_CRC_C else "",
-            rom_md5_h.hexdigest() if rom_md5_h.digest() != DEFAULT_MD5_H_DIGEST else "",
-            (
-                rom_sha1_h.hexdigest()
-                if rom_sha1_h.digest() != DEFAULT_SHA1_H_DIGEST
-                else ""
-            ),
-            rom_ra_h,
-        )
-
-    def _calculate_rom_hashes(
-        self,
-        file_path: Path,
-        rom_crc_c: int,
-        rom_md5_h: Any,
-        rom_sha1_h: Any,
-    ) -> tuple[int, int, Any, Any, Any, Any]:
-        extension = Path(file_path).suffix.lower()
-        mime = magic.Magic(mime=True)
-        try:
-            file_type = mime.from_file(file_path)
-            file_type = None
 
-            crc_c = 0
-            md5_h = hashlib.md5(usedforsecurity=False)
-            sha1_h = hashlib.sha1(usedforsecurity=False)
-
-            def update_hashes(chunk: bytes | bytearray):
-                md5_h.update(chunk)
-                rom_md5_h.update(chunk)
-
-                sha1_h.update(chunk)
-                rom_sha1_h.update(chunk)
-
-                nonlocal crc_c
-                crc_c = binascii.crc32(chunk, crc_c)
-                nonlocal rom_crc_c
-                rom_crc_c = binascii.crc32(chunk, rom_crc_c)
-
-            if extension == ".zip" or file_type == "application/zip":
-                for chunk in read_zip_file(file_path):
-                    update_hashes(chunk)
-
-            elif extension == ".tar" or file_type == "application/x-tar":
-                for chunk in read_tar_file(file_path):
-                    update_hashes(chunk)
-
-            elif extension == ".gz" or file_type == "application/x-gzip":
-                for chunk in read_gz_file(file_path):
-                    update_hashes(chunk)
+        cached_entry = await self._get_cached_rom_hashes(abs_rom_path, fingerprint)
+
+        # Reading the CRC from the archive headers is enough for a quick identification
+        archive_hash = None
+        if fast_identify and not cached_entry and not is_multi:
+            archive_hash = read_archive_header_hash(file_paths[0])
+
+        if cached_entry:
+            file_hashes = [
+                cached_entry["files"].get(str(file_path), EMPTY_FILE_HASH)
+                for file_path in file_paths
+            ]
+            rom_hash = FileHash(
+                crc_hash=cached_entry["crc_hash"],
+                md5_hash=cached_entry["md5_hash"],
+                sha1_hash=cached_entry["sha1_hash"],
+            )
+            # RAHasher failures are retried, as they may be caused by a missing binary
+            rom_ra_h = cached_entry["ra_hash"] or await self._calculate_ra_hash(
+                rom, abs_rom_path, is_multi, fingerprint
+            )
+            hash_cache_hits, hash_cache_misses = len(file_paths), 0
+            hashes_deferred = False
+        elif archive_hash:
+            file_hashes, rom_hash = [archive_hash], archive_hash
+            rom_ra_h = await self._calculate_ra_hash(
+                rom, abs_rom_path, is_multi, fingerprint
+            )
 
-            elif extension == ".7z" or file_type == "application/x-7z-compressed":
-                process_7z_file(
-                    file_path=file_path,
-                    fn_hash_update=update_hashes,
-                    fn_hash_read=lambda size: sha1_h.digest(),
-                )
+            # Incomplete hashes are not cached, so they get calculated in full later
+            hash_cache_hits, hash_cache_misses = 0, 0
+            hashes_deferred = True
+        else:
+            file_hashes, rom_hash = await rom_hashing_engine.hash_rom_files(file_paths)
+            rom_ra_h = await self._calculate_ra_hash(
+                rom, abs_rom_path, is_multi, fingerprint
+            )
 
-            elif extension == ".bz2" or file_type == "application/x-bzip2":
-                for chunk in read_bz2_file(file_path):
-                    update_hashes(chunk)
-
-            else:
-                for chunk in read_basic_file(file_path):
-                    update_hashes(chunk)
-
-            return crc_c, rom_crc_c, md5_h, rom_md5_h, sha1_h, rom_sha1_h
-        except (FileNotFoundError, PermissionError):
-            return (
-                0,
-                rom_crc_c,
-                hashlib.md5(usedforsecurity=False),
-                rom_md5_h,
-                hashlib.sha1(usedforsecurity=False),
-                rom_sha1_h,
+            await self._set_cached_rom_hashes(
+                abs_rom_path,
+                RomHashesCacheEntry(
+                    fingerprint=fingerprint,
+                    files={
+                        str(file_path): file_hash
+                        for file_path, file_hash in zip(
+                            file_paths, file_hashes, strict=True
+                        )
+                    },
+                    crc_hash=rom_hash["crc_hash"],
+                    md5_hash=rom_hash["md5_hash"],
+                    sha1_hash=rom_hash["sha1_hash"],
+                    ra_hash=rom_ra_h,
+                ),
             )
+            hash_cache_hits, hash_cache_misses = 0, len(file_paths)
+            hashes_deferred = False
+
+        return FSRomFiles(
+            rom_files=[
+                self._build_rom_file(
+                    file_path.parent.relative_to(self.base_path),
+                    file_path.name,
+                    file_hash,
+                )
+                for file_path, file_hash in zip(file_paths, file_hashes, strict=True)
+            ],
+            crc_hash=rom_hash["crc_hash"],
+            md5_hash=rom_hash["md5_hash"],
+            sha1_hash=rom_hash["sha1_hash"],
+            ra_hash=rom_ra_h,
+            hash_cache_hits=hash_cache_hits,
+            hash_cache_misses=hash_cache_misses,
+            hashes_deferred=hashes_deferred,
+        )
 
     async def get_roms(self, platform: Platform) -> list[FSRom]:
         """Gets all filesystem roms for a platform
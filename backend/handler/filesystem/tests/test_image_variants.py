@@ -0,0 +1,103 @@
+import os
+from pathlib import Path
+
+import pytest
+from handler.filesystem.image_variants import (
+    MAX_VARIANT_WIDTH,
+    ImageVariantCache,
+    round_variant_width,
+)
+from PIL import Image
+
+
+@pytest.fixture
+def cover(tmp_path: Path) -> Path:
+    cover_path = tmp_path / "roms/1/1/cover/big.png"
+    cover_path.parent.mkdir(parents=True)
+    # Noise doesn't compress, so the size of the variants follows their dimensions
+    Image.effect_noise((600, 800), 64).convert("RGB").save(cover_path)
+    return cover_path
+
+
+@pytest.fixture
+def variant_cache(tmp_path: Path) -> ImageVariantCache:
+    return ImageVariantCache(
+        str(tmp_path / "image_variants"), max_size=1024 * 1024, max_workers=2
+    )
+
+
+def test_round_variant_width():
+    assert round_variant_width(1) == 32
+    assert round_variant_width(200) == 224
+    assert round_variant_width(224) == 224
+    assert round_variant_width(MAX_VARIANT_WIDTH + 1) == MAX_VARIANT_WIDTH
+
+
+async def test_get_generates_variant_once(
+    variant_cache: ImageVariantCache, cover: Path
+):
+    variant_path = await variant_cache.get(
+        cover, width=300, image_format="jpeg", quality=80
+    )
+
+    with Image.open(variant_path) as variant:
+        assert variant.format == "JPEG"
+        assert variant.size == (300, 400)
+
+    modified_at = variant_path.stat().st_mtime_ns
+    assert (
+        await variant_cache.get(cover, width=300, image_format="jpeg", quality=80)
+        == variant_path
+    )
+    assert variant_path.stat().st_mtime_ns == modified_at
+
+
+async def test_get_never_upscales(variant_cache: ImageVariantCache, cover: Path):
+    variant_path = await variant_cache.get(
+        cover, width=1024, image_format="png", quality=80
+    )
+
+    with Image.open(variant_path) as variant:
+        assert variant.size == (600, 800)
+
+
+async def test_get_new_variant_for_replaced_image(
+    variant_cache: ImageVariantCache, cover: Path
+):
+    variant_path = await variant_cache.get(
+        cover, width=300, image_format="png", quality=80
+    )
+
+    Image.new("RGB", (300, 300)).save(cover)
+    stat = cover.stat()
+    os.utime(cover, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    new_variant_path = await variant_cache.get(
+        cover, width=300, image_format="png", quality=80
+    )
+    assert new_variant_path != variant_path
+    with Image.open(new_variant_path) as variant:
+        assert variant.size == (300, 300)
+
+
+async def test_get_evicts_least_recently_used_variants(
+    variant_cache: ImageVariantCache, cover: Path
+):
+    first_variant_path = await variant_cache.get(
+        cover, width=64, image_format="png", quality=80
+    )
+    second_variant_path = await variant_cache.get(
+        cover, width=96, image_format="png", quality=80
+    )
+    os.utime(first_variant_path, (0, 0))
+    os.utime(second_variant_path, (1, 1))
+
+    variant_cache.max_size = second_variant_path.stat().st_size
+    third_variant_path = await variant_cache.get(
+        cover, width=128, image_format="png", quality=80
+    )
+
+    assert not first_variant_path.exists()
+    assert not second_variant_path.exists()
+    assert third_variant_path.exists()
+    assert variant_cache._size == third_variant_path.stat().st_size
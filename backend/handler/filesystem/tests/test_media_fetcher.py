@@ -0,0 +1,82 @@
+import asyncio
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+from anyio import open_file
+from handler.filesystem.media_fetcher import MediaFetcher
+
+
+def serve(respond):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+    return patch(
+        "handler.filesystem.media_fetcher.ctx_httpx_client", get=lambda: client
+    )
+
+
+async def test_download_retries_transient_errors(tmp_path: Path):
+    responses = iter(
+        [
+            httpx.Response(503),
+            httpx.Response(429, headers={"Retry-After": "0"}),
+            httpx.Response(200, content=b"badge"),
+        ]
+    )
+    file_path = tmp_path / "badge.png"
+
+    with serve(lambda _: next(responses)), patch("asyncio.sleep") as mock_sleep:
+        downloaded = await MediaFetcher().download(
+            "https://media.example.com/badge.png", lambda: open_file(file_path, "wb")
+        )
+
+    assert downloaded
+    assert file_path.read_bytes() == b"badge"
+    assert mock_sleep.call_count == 2
+
+
+async def test_download_does_not_retry_missing_files(tmp_path: Path):
+    requests: list[httpx.Request] = []
+
+    def respond(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(404)
+
+    with serve(respond):
+        downloaded = await MediaFetcher().download(
+            "https://media.example.com/missing.png",
+            lambda: open_file(tmp_path / "missing.png", "wb"),
+        )
+
+    assert not downloaded
+    assert len(requests) == 1
+    assert not (tmp_path / "missing.png").exists()
+
+
+async def test_download_limits_concurrency_per_host(tmp_path: Path):
+    media_fetcher = MediaFetcher(max_concurrency=8, max_concurrency_per_host=2)
+    in_flight: dict[str, int] = {}
+    max_in_flight: dict[str, int] = {}
+
+    async def respond(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        in_flight[host] = in_flight.get(host, 0) + 1
+        max_in_flight[host] = max(max_in_flight.get(host, 0), in_flight[host])
+        await asyncio.sleep(0.01)
+        in_flight[host] -= 1
+        return httpx.Response(200, content=b"media")
+
+    with serve(respond):
+        await asyncio.gather(
+            *(
+                media_fetcher.download(
+                    f"https://{host}/{idx}.png",
+                    lambda host=host, idx=idx: open_file(
+                        tmp_path / f"{host}-{idx}.png", "wb"
+                    ),
+                )
+                for host in ("a.example.com", "b.example.com")
+                for idx in range(6)
+            )
+        )
+
+    assert max_in_flight == {"a.example.com": 2, "b.example.com": 2}
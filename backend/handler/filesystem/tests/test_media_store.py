@@ -0,0 +1,214 @@
+import asyncio
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+import pytest
+from handler.filesystem.media_fetcher import MediaFetcher
+from handler.filesystem.media_store import FetchResult, MediaStore
+
+BADGE_URL = "https://media.example.com/Badge/12345.png"
+
+
+@pytest.fixture
+def requests():
+    return []
+
+
+@pytest.fixture
+def client(requests: list[httpx.Request]):
+    def respond(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path.endswith("missing.png"):
+            return httpx.Response(404)
+        return httpx.Response(200, content=b"badge")
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+    with patch(
+        "handler.filesystem.media_fetcher.ctx_httpx_client", get=lambda: client
+    ):
+        yield client
+
+
+@pytest.fixture
+def media_store(tmp_path: Path):
+    return MediaStore(
+        str(tmp_path / "media_store"), MediaFetcher(), blob_grace_period=0
+    )
+
+
+async def test_fetch_downloads_each_url_once(
+    media_store: MediaStore, client, requests: list[httpx.Request], tmp_path: Path
+):
+    first_badge = tmp_path / "roms/1/1/badges/12345.png"
+    second_badge = tmp_path / "roms/1/2/badges/12345.png"
+
+    assert await media_store.fetch(BADGE_URL, first_badge) == FetchResult.STORED
+    assert await media_store.fetch(BADGE_URL, second_badge) == FetchResult.STORED
+    assert await media_store.fetch(BADGE_URL, second_badge) == FetchResult.UNCHANGED
+
+    assert len(requests) == 1
+    assert second_badge.read_bytes() == b"badge"
+    # Both files are links to the same blob
+    assert first_badge.stat().st_ino == second_badge.stat().st_ino
+    assert first_badge.stat().st_nlink == 3
+
+
+async def test_fetch_stores_identical_content_once(
+    media_store: MediaStore, client, tmp_path: Path
+):
+    first_badge = tmp_path / "roms/1/1/badges/12345.png"
+    second_badge = tmp_path / "roms/1/2/badges/12345_lock.png"
+
+    await media_store.fetch(BADGE_URL, first_badge)
+    await media_store.fetch(
+        "https://media.example.com/Badge/12345_lock.png", second_badge
+    )
+
+    assert first_badge.stat().st_ino == second_badge.stat().st_ino
+    assert len(list(media_store.blobs_path.glob("*/*"))) == 1
+    assert not any(media_store.tmp_path.iterdir())
+
+
+async def test_fetch_missing_file(media_store: MediaStore, client, tmp_path: Path):
+    badge = tmp_path / "roms/1/1/badges/missing.png"
+
+    result = await media_store.fetch(
+        "https://media.example.com/Badge/missing.png", badge
+    )
+    assert result == FetchResult.NOT_FOUND
+    assert not badge.exists()
+
+
+async def test_remove_unreferenced(
+    media_store: MediaStore, client, requests: list[httpx.Request], tmp_path: Path
+):
+    first_badge = tmp_path / "roms/1/1/badges/12345.png"
+    second_badge = tmp_path / "roms/1/2/badges/12345.png"
+    await media_store.fetch(BADGE_URL, first_badge)
+    await media_store.fetch(BADGE_URL, second_badge)
+
+    first_badge.unlink()
+    await media_store.remove_unreferenced()
+    assert len(list(media_store.blobs_path.glob("*/*"))) == 1
+
+    second_badge.unlink()
+    await media_store.remove_unreferenced()
+    assert not list(media_store.blobs_path.glob("*/*"))
+    assert not list(media_store.urls_path.glob("*/*"))
+
+    # The URL is downloaded again once its blob is gone
+    await media_store.fetch(BADGE_URL, first_badge)
+    assert len(requests) == 2
+
+
+async def test_remove_unreferenced_keeps_recent_blobs(client, tmp_path: Path):
+    media_store = MediaStore(str(tmp_path / "media_store"), MediaFetcher())
+    badge = tmp_path / "roms/1/1/badges/12345.png"
+    await media_store.fetch(BADGE_URL, badge)
+
+    # The blob may be about to be linked by a fetch in another process
+    badge.unlink()
+    await media_store.remove_unreferenced()
+    assert len(list(media_store.blobs_path.glob("*/*"))) == 1
+
+    blob_path = next(media_store.blobs_path.glob("*/*"))
+    os.utime(blob_path, ns=(0, 0))
+    await media_store.remove_unreferenced()
+    assert not list(media_store.blobs_path.glob("*/*"))
+
+
+async def test_fetch_downloads_blob_removed_before_linking(
+    media_store: MediaStore, client, requests: list[httpx.Request], tmp_path: Path
+):
+    first_badge = tmp_path / "roms/1/1/badges/12345.png"
+    second_badge = tmp_path / "roms/1/2/badges/12345.png"
+    await media_store.fetch(BADGE_URL, first_badge)
+    first_badge.unlink()
+
+    get_record = media_store._get_record
+
+    def get_record_then_remove_unreferenced(url: str):
+        record = get_record(url)
+        media_store._remove_unreferenced()
+        return record
+
+    with patch.object(
+        media_store, "_get_record", side_effect=get_record_then_remove_unreferenced
+    ):
+        result = await media_store.fetch(BADGE_URL, second_badge)
+
+    assert result == FetchResult.STORED
+    assert len(requests) == 2
+    assert second_badge.read_bytes() == b"badge"
+
+
+async def test_fetch_coalesces_concurrent_downloads(
+    media_store: MediaStore, client, requests: list[httpx.Request], tmp_path: Path
+):
+    badges = [tmp_path / f"roms/1/{rom_id}/badges/12345.png" for rom_id in range(3)]
+
+    results = await asyncio.gather(
+        *(media_store.fetch(BADGE_URL, badge) for badge in badges)
+    )
+
+    assert results == [FetchResult.STORED] * 3
+    assert len(requests) == 1
+    assert all(badge.read_bytes() == b"badge" for badge in badges)
+
+
+async def test_fetch_copies_without_hard_links(
+    media_store: MediaStore, client, requests: list[httpx.Request], tmp_path: Path
+):
+    first_badge = tmp_path / "roms/1/1/badges/12345.png"
+    second_badge = tmp_path / "roms/1/2/badges/12345.png"
+
+    with patch("handler.filesystem.media_store.os.link", side_effect=OSError):
+        assert await media_store.fetch(BADGE_URL, first_badge) == FetchResult.STORED
+        assert await media_store.fetch(BADGE_URL, second_badge) == FetchResult.STORED
+        assert (
+            await media_store.fetch(BADGE_URL, first_badge) == FetchResult.UNCHANGED
+        )
+
+    assert len(requests) == 1
+    assert first_badge.read_bytes() == b"badge"
+    assert first_badge.stat().st_nlink == 1
+
+    # Copies keep their blob, until none of them is left unchanged
+    await media_store.remove_unreferenced()
+    assert len(list(media_store.blobs_path.glob("*/*"))) == 1
+
+    first_badge.unlink()
+    second_badge.write_bytes(b"edited badge")
+    os.utime(second_badge, ns=(0, 0))
+    await media_store.remove_unreferenced()
+    assert not list(media_store.blobs_path.glob("*/*"))
+    assert not list(media_store.urls_path.glob("*/*"))
+
+
+async def test_fetch_revalidates_changed_file(media_store: MediaStore, tmp_path: Path):
+    contents = iter([b"badge", b"new badge"])
+    requests: list[httpx.Request] = []
+
+    def respond(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(
+            200,
+            content=next(contents),
+            headers={"Last-Modified": "Wed, 21 Oct 2026 07:28:00 GMT"},
+        )
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+    badge = tmp_path / "roms/1/1/badges/12345.png"
+    with patch(
+        "handler.filesystem.media_fetcher.ctx_httpx_client", get=lambda: client
+    ):
+        await media_store.fetch(BADGE_URL, badge)
+        result = await media_store.fetch(BADGE_URL, badge, revalidate=True)
+
+    assert result == FetchResult.STORED
+    assert requests[1].headers["If-Modified-Since"] == (
+        "Wed, 21 Oct 2026 07:28:00 GMT"
+    )
+    assert badge.read_bytes() == b"new badge"
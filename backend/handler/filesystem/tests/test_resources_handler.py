@@ -1,13 +1,22 @@
 import os
+from io import BytesIO
 from pathlib import Path
 from unittest.mock import Mock, patch
 
+import httpx
 import pytest
 from config import RESOURCES_BASE_PATH
 from handler.filesystem.base_handler import CoverSize
-from handler.filesystem.resources_handler import FSResourcesHandler
+from handler.filesystem.media_fetcher import MediaFetcher
+from handler.filesystem.media_store import MediaStore
+from handler.filesystem.resources_handler import (
+    SMALL_COVER_REDUCING_GAP,
+    SMALL_COVER_RESAMPLING,
+    FSResourcesHandler,
+)
 from models.collection import Collection
 from models.rom import Rom
+from PIL import Image
 
 
 class TestFSResourcesHandler:
@@ -83,9 +92,13 @@ class TestFSResourcesHandler:
         handler.resize_cover_to_small(mock_image, save_path)
 
         # Should use 0.2 ratio for high resolution
-        expected_width = int(1000 * 0.2)
-        expected_height = int(1500 * 0.2)
-        mock_image.resize.assert_called_once_with((expected_width, expected_height))
+        expected_size = (int(1000 * 0.2), int(1500 * 0.2))
+        mock_image.draft.assert_called_once_with(None, expected_size)
+        mock_image.resize.assert_called_once_with(
+            expected_size,
+            SMALL_COVER_RESAMPLING,
+            reducing_gap=SMALL_COVER_REDUCING_GAP,
+        )
         mock_image.save.assert_called_once_with(save_path)
 
     def test_resize_cover_to_small_low_resolution(self, handler: FSResourcesHandler):
@@ -101,9 +114,13 @@ class TestFSResourcesHandler:
         handler.resize_cover_to_small(mock_image, save_path)
 
         # Should use 0.4 ratio for low resolution
-        expected_width = int(600 * 0.4)
-        expected_height = int(800 * 0.4)
-        mock_image.resize.assert_called_once_with((expected_width, expected_height))
+        expected_size = (int(600 * 0.4), int(800 * 0.4))
+        mock_image.draft.assert_called_once_with(None, expected_size)
+        mock_image.resize.assert_called_once_with(
+            expected_size,
+            SMALL_COVER_RESAMPLING,
+            reducing_gap=SMALL_COVER_REDUCING_GAP,
+        )
         mock_image.save.assert_called_once_with(save_path)
 
     def test_get_cover_path_no_cover(self, handler: FSResourcesHandler, rom: Rom):
@@ -160,10 +177,23 @@ class TestFSResourcesHandler:
 
                 await handler.get_cover(rom, False, url)
 
-                # Should call _store_cover for both sizes since covers don't exist
-                assert mock_store.call_count == 2
-                mock_store.assert_any_call(rom, url, CoverSize.SMALL)
-                mock_store.assert_any_call(rom, url, CoverSize.BIG)
+                # Should download the cover once for both sizes
+                mock_store.assert_called_once_with(rom, url, revalidate=False)
+
+    @pytest.mark.asyncio
+    async def test_get_cover_keeps_existing_cover(
+        self, handler: FSResourcesHandler, rom: Rom
+    ):
+        """Test get_cover without overwrite keeps covers not stored from the URL"""
+        url = "http://example.com/cover.png"
+
+        with patch.object(handler, "_store_cover") as mock_store:
+            with patch.object(handler, "cover_exists") as mock_exists:
+                mock_exists.return_value = True
+
+                await handler.get_cover(rom, False, url)
+
+                mock_store.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_get_cover_with_overwrite(
@@ -175,10 +205,84 @@ class TestFSResourcesHandler:
         with patch.object(handler, "_store_cover") as mock_store:
             await handler.get_cover(rom, True, url)
 
-            # Should call _store_cover for both sizes regardless of existence
-            assert mock_store.call_count == 2
-            mock_store.assert_any_call(rom, url, CoverSize.SMALL)
-            mock_store.assert_any_call(rom, url, CoverSize.BIG)
+            # Should check the cover for changes regardless of existence
+            mock_store.assert_called_once_with(rom, url, revalidate=True)
+
+    async def test_store_cover_downloads_once(
+        self, handler: FSResourcesHandler, rom: Rom, tmp_path: Path
+    ):
+        """Test that the small cover is derived from the downloaded big cover"""
+        cover = BytesIO()
+        Image.new("RGB", (600, 800)).save(cover, format="JPEG")
+        requests: list[httpx.Request] = []
+
+        def respond(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, content=cover.getvalue())
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+        handler.base_path = tmp_path
+        media_store = MediaStore(str(tmp_path / "media_store"), MediaFetcher())
+        with (
+            patch(
+                "handler.filesystem.media_fetcher.ctx_httpx_client",
+                get=lambda: client,
+            ),
+            patch("handler.filesystem.resources_handler.media_store", media_store),
+        ):
+            path_cover_s, path_cover_l = await handler.get_cover(
+                rom, False, "http://example.com/cover.jpg"
+            )
+
+        assert len(requests) == 1
+        assert path_cover_s == f"{rom.fs_resources_path}/cover/small.png"
+        assert path_cover_l == f"{rom.fs_resources_path}/cover/big.png"
+        with Image.open(tmp_path / path_cover_s) as small_cover:
+            assert small_cover.size == (240, 320)
+
+    async def test_get_cover_skips_unchanged_cover(
+        self, handler: FSResourcesHandler, rom: Rom, tmp_path: Path
+    ):
+        """Test that a cover from the same URL isn't stored again"""
+        cover = BytesIO()
+        Image.new("RGB", (600, 800)).save(cover, format="JPEG")
+        requests: list[httpx.Request] = []
+
+        def respond(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(
+                200, content=cover.getvalue(), headers={"ETag": '"v1"'}
+            )
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+        handler.base_path = tmp_path
+        media_store = MediaStore(str(tmp_path / "media_store"), MediaFetcher())
+        url = "http://example.com/cover.jpg"
+        with (
+            patch(
+                "handler.filesystem.media_fetcher.ctx_httpx_client",
+                get=lambda: client,
+            ),
+            patch("handler.filesystem.resources_handler.media_store", media_store),
+        ):
+            path_cover_s, _ = await handler.get_cover(rom, False, url)
+            small_cover_stat = (tmp_path / path_cover_s).stat()
+
+            # Rescans don't check the cover again
+            await handler.get_cover(rom, False, url)
+            assert len(requests) == 1
+
+            # Overwriting it sends a conditional request
+            await handler.get_cover(rom, True, url)
+            assert len(requests) == 2
+            assert requests[1].headers["If-None-Match"] == '"v1"'
+
+        # The small cover wasn't derived again
+        assert (tmp_path / path_cover_s).stat().st_mtime_ns == (
+            small_cover_stat.st_mtime_ns
+        )
 
     async def test_remove_cover_no_entity(self, handler: FSResourcesHandler):
         """Test remove_cover with no entity"""
@@ -331,7 +435,7 @@ class TestFSResourcesHandler:
                 await handler.get_manual(rom, False, url)
 
                 # Should call _store_manual since manual doesn't exist
-                mock_store.assert_called_once_with(rom, url)
+                mock_store.assert_called_once_with(rom, url, revalidate=False)
 
     @pytest.mark.asyncio
     async def test_get_manual_with_overwrite(
@@ -344,7 +448,7 @@ class TestFSResourcesHandler:
             await handler.get_manual(rom, True, url)
 
             # Should call _store_manual regardless of existence
-            mock_store.assert_called_once_with(rom, url)
+            mock_store.assert_called_once_with(rom, url, revalidate=True)
 
     def test_get_ra_resources_path(self, handler: FSResourcesHandler):
         """Test get_ra_resources_path method"""
@@ -1,12 +1,33 @@
+import asyncio
+import binascii
+import hashlib
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from unittest.mock import Mock
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 from config.config_manager import LIBRARY_BASE_PATH, Config
-from handler.filesystem.roms_handler import FileHash, FSRomsHandler
+from handler.filesystem.roms_handler import (
+    LARGE_FILE_READ_CHUNK_SIZE,
+    RA_HASHES_CACHE_KEY,
+    ROM_HASHES_CACHE_KEY,
+    FileHash,
+    FSRomsHandler,
+    RomHashingEngine,
+    calculate_file_hashes,
+    calculate_rom_files_hashes,
+    read_archive_header_hash,
+    read_basic_file,
+    rom_hashing_engine,
+)
+from handler.redis_handler import async_cache
 from models.platform import Platform
 from models.rom import Rom, RomFile, RomFileCategory
+from utils.hashing import crc32_to_hex
 
 
 class TestFSRomsHandler:
@@ -277,9 +298,8 @@ class TestFSRomsHandler:
             m.setattr("handler.filesystem.roms_handler.cm.get_config", lambda: config)
             m.setattr("os.path.exists", lambda x: False)  # Normal structure
 
-            rom_files, crc_hash, md5_hash, sha1_hash, ra_hash = (
-                await handler.get_rom_files(rom_single)
-            )
+            fs_rom_files = await handler.get_rom_files(rom_single)
+            rom_files = fs_rom_files["rom_files"]
 
             assert len(rom_files) == 1
             assert isinstance(rom_files[0], RomFile)
@@ -287,9 +307,11 @@ class TestFSRomsHandler:
             assert rom_files[0].file_path == "n64/roms"
             assert rom_files[0].file_size_bytes > 0
 
-            assert crc_hash == "efb5af2e"
-            assert md5_hash == "0f343b0931126a20f133d67c2b018a3b"
-            assert sha1_hash == "60cacbf3d72e1e7834203da608037b1bf83b40e8"
+            assert fs_rom_files["crc_hash"] == "efb5af2e"
+            assert fs_rom_files["md5_hash"] == "0f343b0931126a20f133d67c2b018a3b"
+            assert (
+                fs_rom_files["sha1_hash"] == "60cacbf3d72e1e7834203da608037b1bf83b40e8"
+            )
 
     @pytest.mark.asyncio
     async def test_get_rom_files_multi_rom(
@@ -300,9 +322,8 @@ class TestFSRomsHandler:
             m.setattr("handler.filesystem.roms_handler.cm.get_config", lambda: config)
             m.setattr("os.path.exists", lambda x: False)  # Normal structure
 
-            rom_files, crc_hash, md5_hash, sha1_hash, ra_hash = (
-                await handler.get_rom_files(rom_multi)
-            )
+            fs_rom_files = await handler.get_rom_files(rom_multi)
+            rom_files = fs_rom_files["rom_files"]
 
             assert len(rom_files) >= 2  # Should have multiple parts
 
@@ -315,6 +336,184 @@ class TestFSRomsHandler:
                 assert rom_file.file_size_bytes > 0
                 assert rom_file.last_modified is not None
 
+    @pytest.mark.asyncio
+    async def test_get_rom_files_uses_hash_cache(
+        self, handler: FSRomsHandler, rom_single, config
+    ):
+        """Test get_rom_files reuses hashes of unchanged files"""
+        with pytest.MonkeyPatch.context() as m:
+            m.setattr("handler.filesystem.roms_handler.cm.get_config", lambda: config)
+            m.setattr("os.path.exists", lambda x: False)  # Normal structure
+
+            await async_cache.delete(ROM_HASHES_CACHE_KEY)
+
+            first_scan = await handler.get_rom_files(rom_single)
+            assert first_scan["hash_cache_hits"] == 0
+            assert first_scan["hash_cache_misses"] == 1
+
+            with patch.object(rom_hashing_engine, "hash_rom_files") as mock_hashes:
+                second_scan = await handler.get_rom_files(rom_single)
+                mock_hashes.assert_not_called()
+
+            assert second_scan["hash_cache_hits"] == 1
+            assert second_scan["hash_cache_misses"] == 0
+            assert second_scan["crc_hash"] == first_scan["crc_hash"]
+            assert second_scan["md5_hash"] == first_scan["md5_hash"]
+            assert second_scan["sha1_hash"] == first_scan["sha1_hash"]
+            assert (
+                second_scan["rom_files"][0].md5_hash
+                == first_scan["rom_files"][0].md5_hash
+            )
+
+    @pytest.mark.asyncio
+    async def test_get_rom_files_retries_failed_ra_hash(
+        self, handler: FSRomsHandler, rom_single, config
+    ):
+        """Test get_rom_files runs RAHasher again when it failed on a cached rom"""
+        ra_hash = "0123456789abcdef0123456789abcdef"
+        with pytest.MonkeyPatch.context() as m:
+            m.setattr("handler.filesystem.roms_handler.cm.get_config", lambda: config)
+            m.setattr("os.path.exists", lambda x: False)  # Normal structure
+
+            await async_cache.delete(ROM_HASHES_CACHE_KEY, RA_HASHES_CACHE_KEY)
+
+            with patch(
+                "handler.filesystem.roms_handler.RAHasherService.calculate_hash",
+                new_callable=AsyncMock,
+                side_effect=["", ra_hash],
+            ):
+                first_scan = await handler.get_rom_files(rom_single)
+                second_scan = await handler.get_rom_files(rom_single)
+
+            assert first_scan["ra_hash"] == ""
+            assert second_scan["hash_cache_hits"] == 1
+            assert second_scan["ra_hash"] == ra_hash
+
+    @pytest.mark.asyncio
+    async def test_get_rom_files_rehashes_modified_files(
+        self, handler: FSRomsHandler, rom_single, config
+    ):
+        """Test get_rom_files ignores cached hashes when the file changed"""
+        with pytest.MonkeyPatch.context() as m:
+            m.setattr("handler.filesystem.roms_handler.cm.get_config", lambda: config)
+            m.setattr("os.path.exists", lambda x: False)  # Normal structure
+
+            await async_cache.delete(ROM_HASHES_CACHE_KEY)
+            await handler.get_rom_files(rom_single)
+
+            # Corrupt the stored fingerprint to simulate a modified file
+            rom_path = f"{handler.base_path}/n64/roms/{rom_single.fs_name}"
+            entry = json.loads(
+                await async_cache.hget(ROM_HASHES_CACHE_KEY, rom_path)  # type: ignore
+            )
+            for file_path in entry["fingerprint"]:
+                entry["fingerprint"][file_path][1] -= 1
+            await async_cache.hset(ROM_HASHES_CACHE_KEY, rom_path, json.dumps(entry))
+
+            fs_rom_files = await handler.get_rom_files(rom_single)
+            assert fs_rom_files["hash_cache_hits"] == 0
+            assert fs_rom_files["hash_cache_misses"] == 1
+            assert fs_rom_files["md5_hash"] == "0f343b0931126a20f133d67c2b018a3b"
+
+    async def test_prune_hashes_cache(self, handler: FSRomsHandler, rom_single):
+        """Test cached hashes are removed once their rom is gone"""
+        rom_path = f"{handler.base_path}/n64/roms/{rom_single.fs_name}"
+        removed_rom_path = f"{handler.base_path}/n64/roms/Removed (USA).z64"
+        for cache_key in (ROM_HASHES_CACHE_KEY, RA_HASHES_CACHE_KEY):
+            await async_cache.delete(cache_key)
+            await async_cache.hset(
+                cache_key, mapping={rom_path: "{}", removed_rom_path: "{}"}
+            )
+
+        await handler.prune_hashes_cache()
+
+        for cache_key in (ROM_HASHES_CACHE_KEY, RA_HASHES_CACHE_KEY):
+            assert await async_cache.hexists(cache_key, rom_path)
+            assert not await async_cache.hexists(cache_key, removed_rom_path)
+
+    async def test_ra_hash_is_cached_by_fingerprint(
+        self, handler: FSRomsHandler, rom_single
+    ):
+        """Test RAHasher only runs again once the rom files change"""
+        await async_cache.delete(RA_HASHES_CACHE_KEY)
+        rom_path = f"{handler.base_path}/n64/roms/{rom_single.fs_name}"
+        fingerprint = {rom_path: [100, 1]}
+        ra_hash = "0123456789abcdef0123456789abcdef"
+
+        with patch(
+            "handler.filesystem.roms_handler.RAHasherService.calculate_hash",
+            new_callable=AsyncMock,
+            return_value=ra_hash,
+        ) as mock_calculate_hash:
+            assert (
+                await handler._calculate_ra_hash(
+                    rom_single, rom_path, False, fingerprint
+                )
+                == ra_hash
+            )
+            assert (
+                await handler._calculate_ra_hash(
+                    rom_single, rom_path, False, fingerprint
+                )
+                == ra_hash
+            )
+            assert mock_calculate_hash.call_count == 1
+
+            await handler._calculate_ra_hash(
+                rom_single, rom_path, False, {rom_path: [100, 2]}
+            )
+            assert mock_calculate_hash.call_count == 2
+
+    async def test_hashing_engine_keeps_file_order(self, handler: FSRomsHandler):
+        """Test the hashing engine returns the same hashes as hashing in process"""
+        rom_dir = Path(handler.base_path, "n64/roms/Super Mario 64 (J) (Rev A)")
+        file_paths = [
+            rom_dir / "Super Mario 64 (J) (Rev A) [Part 1].z64",
+            rom_dir / "Super Mario 64 (J) (Rev A) [Part 2].z64",
+        ]
+
+        engine = RomHashingEngine(max_workers=2)
+        try:
+            results = await asyncio.gather(
+                engine.hash_rom_files(file_paths),
+                engine.hash_rom_files(file_paths[::-1]),
+            )
+        finally:
+            engine.shutdown()
+
+        assert results[0] == calculate_rom_files_hashes(file_paths)
+        assert results[1] == calculate_rom_files_hashes(file_paths[::-1])
+        assert len(results[0][0]) == 2
+
+    async def test_hashing_engine_replaces_broken_pool_once(
+        self, handler: FSRomsHandler
+    ):
+        """Test concurrent hashes on a broken pool only start one new pool"""
+        rom_dir = Path(handler.base_path, "n64/roms/Super Mario 64 (J) (Rev A)")
+        file_paths = [rom_dir / "Super Mario 64 (J) (Rev A) [Part 1].z64"]
+
+        engine = RomHashingEngine(max_workers=1)
+        try:
+            broken_executor = engine._get_executor()
+            with pytest.raises(BrokenProcessPool):
+                await asyncio.get_running_loop().run_in_executor(
+                    broken_executor, os._exit, 1
+                )
+
+            with patch(
+                "handler.filesystem.roms_handler.ProcessPoolExecutor",
+                wraps=ProcessPoolExecutor,
+            ) as mock_executor:
+                results = await asyncio.gather(
+                    engine.hash_rom_files(file_paths),
+                    engine.hash_rom_files(file_paths),
+                )
+        finally:
+            engine.shutdown()
+
+        assert mock_executor.call_count == 1
+        assert results[0] == results[1] == calculate_rom_files_hashes(file_paths)
+
     async def test_rename_fs_rom_same_name(self, handler: FSRomsHandler):
         """Test rename_fs_rom when old and new names are the same"""
         old_name = "test_rom.n64"
@@ -516,13 +715,11 @@ class TestFSRomsHandler:
             ).hexdigest()
 
             # Test the hash calculation method
-            crc_result, _, md5_result, _, sha1_result, _ = (
-                handler._calculate_rom_hashes(
-                    test_file,
-                    0,
-                    hashlib.md5(usedforsecurity=False),
-                    hashlib.sha1(usedforsecurity=False),
-                )
+            crc_result, _, md5_result, _, sha1_result, _ = calculate_file_hashes(
+                test_file,
+                0,
+                hashlib.md5(usedforsecurity=False),
+                hashlib.sha1(usedforsecurity=False),
             )
 
             assert crc_result == expected_crc
@@ -534,6 +731,78 @@ class TestFSRomsHandler:
             if test_file.exists():
                 test_file.unlink()
 
+    def test_large_file_hash_calculation(self, handler: FSRomsHandler, tmp_path: Path):
+        """Benchmark the large read path against hashing in small chunks"""
+        # Not a multiple of the chunk size, to cover the last partial block
+        test_content = os.urandom(LARGE_FILE_READ_CHUNK_SIZE * 16 + 12345)
+        test_file = tmp_path / "large_hash_test.iso"
+        test_file.write_bytes(test_content)
+
+        start = time.perf_counter()
+        crc_result, _, md5_result, _, sha1_result, _ = calculate_file_hashes(
+            test_file,
+            0,
+            hashlib.md5(usedforsecurity=False),
+            hashlib.sha1(usedforsecurity=False),
+        )
+        large_read_time = time.perf_counter() - start
+
+        assert crc_result == binascii.crc32(test_content)
+        assert md5_result.hexdigest() == hashlib.md5(test_content).hexdigest()
+        assert sha1_result.hexdigest() == hashlib.sha1(test_content).hexdigest()
+
+        start = time.perf_counter()
+        crc_c = 0
+        md5_h, rom_md5_h = hashlib.md5(), hashlib.md5()
+        sha1_h, rom_sha1_h = hashlib.sha1(), hashlib.sha1()
+        for chunk in read_basic_file(test_file):
+            for h in (md5_h, rom_md5_h, sha1_h, rom_sha1_h):
+                h.update(chunk)
+            crc_c = binascii.crc32(chunk, binascii.crc32(chunk, crc_c))
+        small_read_time = time.perf_counter() - start
+
+        # Both paths do the same hashing work, the large reads only save the per-chunk
+        # overhead, so allow some margin for noisy runners
+        assert large_read_time < small_read_time * 1.5
+
+    def test_rom_hashes_from_file_hashes(self, tmp_path: Path):
+        """Test rom hashes are copied for single files and combined for multiple files"""
+        contents = [b"", b"First part content", b"Second part content"]
+        file_paths = []
+        for i, content in enumerate(contents):
+            file_path = tmp_path / f"part_{i}.bin"
+            file_path.write_bytes(content)
+            file_paths.append(file_path)
+
+        file_hashes, rom_hash = calculate_rom_files_hashes(file_paths[1:2])
+        assert rom_hash == file_hashes[0]
+        assert rom_hash["md5_hash"] == hashlib.md5(contents[1]).hexdigest()
+
+        file_hashes, rom_hash = calculate_rom_files_hashes(file_paths)
+        combined_content = b"".join(contents)
+        assert file_hashes[2]["sha1_hash"] == hashlib.sha1(contents[2]).hexdigest()
+        assert rom_hash["crc_hash"] == crc32_to_hex(binascii.crc32(combined_content))
+        assert rom_hash["md5_hash"] == hashlib.md5(combined_content).hexdigest()
+        assert rom_hash["sha1_hash"] == hashlib.sha1(combined_content).hexdigest()
+
+    def test_read_archive_header_hash(self, handler: FSRomsHandler):
+        """Test the CRC read from the zip headers matches the decompressed content"""
+        zip_file = handler.base_path / "psx/roms/PaRappa the Rapper.zip"
+
+        header_hash = read_archive_header_hash(zip_file)
+        assert header_hash is not None
+        assert header_hash["md5_hash"] == ""
+        assert header_hash["sha1_hash"] == ""
+
+        file_hashes, _ = calculate_rom_files_hashes([zip_file])
+        assert header_hash["crc_hash"] == file_hashes[0]["crc_hash"]
+
+        # Uncompressed files need to be hashed in full
+        assert (
+            read_archive_header_hash(handler.base_path / "n64/roms/Paper Mario (USA).z64")
+            is None
+        )
+
     async def test_compressed_file_handling(self, handler: FSRomsHandler):
         """Test handling of compressed ROM files"""
         # Test with the ZIP file
@@ -1,10 +1,13 @@
+import asyncio
+import functools
 import json
 import os
 import re
 import unicodedata
+from collections.abc import Awaitable, Callable, Hashable
 from functools import lru_cache
 from itertools import batched
-from typing import Final, NotRequired, TypedDict
+from typing import Any, Final, NotRequired, ParamSpec, TypedDict, TypeVar
 
 from handler.redis_handler import async_cache, sync_cache
 from logger.logger import log
@@ -57,6 +60,10 @@ NON_WORD_SPACE_PATTERN = re.compile(r"[^\w\s]")
 MULTIPLE_SPACE_PATTERN = re.compile(r"\s+")
 
 
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
 class BaseRom(TypedDict):
     name: NotRequired[str]
     summary: NotRequired[str]
@@ -91,6 +98,47 @@ def _normalize_search_term(
     return name.strip()
 
 
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, list | tuple):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def single_flight(
+    func: Callable[P, Awaitable[T]],
+) -> Callable[P, Awaitable[T]]:
+    """Share a single call between concurrent calls made with the same arguments.
+
+    Scanning sibling dumps and regional variants of a game sends identical searches
+    to the metadata providers at the same time. Calls arriving while an identical one
+    is in flight await its result instead of sending their own request.
+    """
+    calls: dict[Hashable, asyncio.Task] = {}
+
+    def forget(key: Hashable, task: asyncio.Task) -> None:
+        if calls.get(key) is task:
+            del calls[key]
+        # Errors are raised to every caller, don't report them again
+        if not task.cancelled():
+            task.exception()
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        key = (_freeze(args), _freeze(kwargs))
+        task = calls.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            calls[key] = task
+            task.add_done_callback(functools.partial(forget, key))
+
+        # A caller going away must not cancel the call shared with the others
+        return await asyncio.shield(task)
+
+    return wrapper
+
+
 class MetadataHandler:
     def __init__(self):
         # Initialize cache data lazily when the handler is first instantiated
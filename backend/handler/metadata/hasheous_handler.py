@@ -1,9 +1,14 @@
 import json
 from datetime import datetime
-from typing import Any, NotRequired, TypedDict
+from typing import Any, NotRequired, TypedDict, cast
 
 import httpx
 import pydash
+from adapters.services.rate_limiter import rate_limiters
+from adapters.services.response_cache import (
+    mark_response_uncacheable,
+    provider_response_cache,
+)
 from config import DEV_MODE, HASHEOUS_API_ENABLED
 from fastapi import HTTPException, status
 from logger.logger import log
@@ -53,6 +58,18 @@ class HasheousRom(BaseRom):
 
 ACCEPTABLE_FILE_EXTENSIONS_BY_PLATFORM_SLUG = {"dc": ["cue"]}
 
+# Hasheous signature sources, mapped to their metadata match fields
+HASHEOUS_SIGNATURE_MATCH_FIELDS = {
+    "TOSEC": "tosec_match",
+    "MAMEArcade": "mame_arcade_match",
+    "MAMEMess": "mame_mess_match",
+    "NoIntros": "nointro_match",
+    "Redump": "redump_match",
+    "WHDLoad": "whdload_match",
+    "RetroAchievements": "ra_match",
+    "FBNeo": "fbneo_match",
+}
+
 
 def extract_metadata_from_igdb_rom(rom: dict[str, Any]) -> IGDBMetadata:
     return IGDBMetadata(
@@ -116,6 +133,7 @@ class HasheousHandler(MetadataHandler):
         self.proxy_igdb_game_endpoint = f"{self.BASE_URL}/MetadataProxy/IGDB/Game"
         self.proxy_igdb_cover_endpoint = f"{self.BASE_URL}/MetadataProxy/IGDB/Cover"
         self.proxy_ra_game_endpoint = f"{self.BASE_URL}/MetadataProxy/RA/Game"
+        self.rate_limiter = rate_limiters["hasheous"]
         self.app_api_key = (
             "UUvh9ef_CddMM4xXO1iqxl9FqEt764v33LU-UiGFc0P34odXjMP9M6MTeE4JZRxZ"
             if DEV_MODE
@@ -128,6 +146,19 @@ class HasheousHandler(MetadataHandler):
         method: str = "POST",
         params: dict | None = None,
         data: dict | None = None,
+    ) -> dict:
+        return await provider_response_cache.get_or_fetch(
+            "hasheous",
+            {"method": method.upper(), "url": url, "params": params, "data": data},
+            lambda: self._fetch(url, method, params, data),
+        )
+
+    async def _fetch(
+        self,
+        url: str,
+        method: str = "POST",
+        params: dict | None = None,
+        data: dict | None = None,
     ) -> dict:
         httpx_client = ctx_httpx_client.get()
 
@@ -162,7 +193,9 @@ class HasheousHandler(MetadataHandler):
                 request_kwargs["json"] = data
 
             # Make the request
-            res = await httpx_client.request(method, **request_kwargs)
+            async with self.rate_limiter.acquire():
+                res = await httpx_client.request(method, **request_kwargs)
+            self.rate_limiter.record_response(res.status_code, res.headers)
 
             res.raise_for_status()
             return res.json()
@@ -177,7 +210,7 @@ class HasheousHandler(MetadataHandler):
                 exc.response.status_code,
                 exc.response.text,
             )
-            pass
+            mark_response_uncacheable()
         except httpx.NetworkError as exc:
             log.critical("Connection error: can't connect to Hasheous")
             raise HTTPException(
@@ -187,9 +220,10 @@ class HasheousHandler(MetadataHandler):
         except json.decoder.JSONDecodeError as exc:
             # Log the error and return an empty dict if the response is not valid JSON
             log.error(exc)
+            mark_response_uncacheable()
             return {}
         except httpx.TimeoutException:
-            pass
+            mark_response_uncacheable()
 
         return {}
 
@@ -208,15 +242,10 @@ class HasheousHandler(MetadataHandler):
             ra_id=platform["ra_id"],
         )
 
-    async def lookup_rom(self, platform_slug: str, files: list[RomFile]) -> HasheousRom:
-        fallback_rom = HasheousRom(
-            hasheous_id=None, igdb_id=None, tgdb_id=None, ra_id=None
-        )
-
-        if not HASHEOUS_API_ENABLED:
-            return fallback_rom
-
-        first_file = next(
+    @staticmethod
+    def get_lookup_file(platform_slug: str, files: list[RomFile]) -> RomFile | None:
+        """Return the file whose hashes identify the ROM in Hasheous."""
+        return next(
             (
                 file
                 for file in files
@@ -231,6 +260,53 @@ class HasheousHandler(MetadataHandler):
             ),
             None,
         )
+
+    @staticmethod
+    def build_rom(
+        *,
+        hasheous_id: int,
+        name: str,
+        url_cover: str,
+        igdb_id: int | None,
+        tgdb_id: int | None,
+        ra_id: int | None,
+        signatures: list[str],
+    ) -> HasheousRom:
+        return HasheousRom(
+            hasheous_id=hasheous_id,
+            name=name,
+            igdb_id=igdb_id,
+            tgdb_id=tgdb_id,
+            ra_id=ra_id,
+            url_cover=url_cover,
+            hasheous_metadata=cast(
+                HasheousMetadata,
+                {
+                    field: source in signatures
+                    for source, field in HASHEOUS_SIGNATURE_MATCH_FIELDS.items()
+                },
+            ),
+        )
+
+    @staticmethod
+    def get_signatures(hasheous_rom: HasheousRom) -> list[str]:
+        """Return the signature sources matched by a ROM identified by Hasheous."""
+        hasheous_metadata = hasheous_rom.get("hasheous_metadata") or {}
+        return [
+            source
+            for source, field in HASHEOUS_SIGNATURE_MATCH_FIELDS.items()
+            if hasheous_metadata.get(field)
+        ]
+
+    async def lookup_rom(self, platform_slug: str, files: list[RomFile]) -> HasheousRom:
+        fallback_rom = HasheousRom(
+            hasheous_id=None, igdb_id=None, tgdb_id=None, ra_id=None
+        )
+
+        if not HASHEOUS_API_ENABLED:
+            return fallback_rom
+
+        first_file = self.get_lookup_file(platform_slug, files)
         if first_file is None:
             return fallback_rom
 
@@ -267,7 +343,7 @@ class HasheousHandler(MetadataHandler):
 
         metadata = hasheous_game.get("metadata", [])
         attributes = hasheous_game.get("attributes", [])
-        signatures = hasheous_game.get("signatures", {}).keys()
+        signatures = list(hasheous_game.get("signatures", {}).keys())
 
         igdb_id = None
         tgdb_id = None
@@ -294,23 +370,14 @@ class HasheousHandler(MetadataHandler):
                 url_cover = f"https://hasheous.org{attr['link']}"
                 break
 
-        return HasheousRom(
+        return self.build_rom(
             hasheous_id=hasheous_game["id"],
             name=hasheous_game.get("name", ""),
             igdb_id=int(igdb_id) if igdb_id else None,
             tgdb_id=int(tgdb_id) if tgdb_id else None,
             ra_id=int(ra_id) if ra_id else None,
             url_cover=url_cover,
-            hasheous_metadata=HasheousMetadata(
-                tosec_match="TOSEC" in signatures,
-                mame_arcade_match="MAMEArcade" in signatures,
-                mame_mess_match="MAMEMess" in signatures,
-                nointro_match="NoIntros" in signatures,
-                redump_match="Redump" in signatures,
-                whdload_match="WHDLoad" in signatures,
-                ra_match="RetroAchievements" in signatures,
-                fbneo_match="FBNeo" in signatures,
-            ),
+            signatures=signatures,
         )
 
     async def get_igdb_game(self, hasheous_rom: HasheousRom) -> HasheousRom:
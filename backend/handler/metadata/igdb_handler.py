@@ -6,6 +6,11 @@ from typing import Final, NotRequired, TypedDict
 import httpx
 import pydash
 from adapters.services.igdb_types import GameType
+from adapters.services.rate_limiter import rate_limiters
+from adapters.services.response_cache import (
+    mark_response_uncacheable,
+    provider_response_cache,
+)
 from config import IGDB_CLIENT_ID, IGDB_CLIENT_SECRET, IS_PYTEST_RUN
 from fastapi import HTTPException, status
 from handler.redis_handler import async_cache
@@ -20,6 +25,7 @@ from .base_hander import (
     SWITCH_TITLEDB_REGEX,
     BaseRom,
     MetadataHandler,
+    single_flight,
 )
 
 # Used to display the IGDB API status in the frontend
@@ -218,6 +224,7 @@ class IGDBHandler(MetadataHandler):
         self.search_fields = SEARCH_FIELDS
         self.pagination_limit = 200
         self.twitch_auth = TwitchAuth()
+        self.rate_limiter = rate_limiters["igdb"]
         self.headers = {
             "Client-ID": IGDB_CLIENT_ID,
             "Accept": "application/json",
@@ -234,6 +241,13 @@ class IGDBHandler(MetadataHandler):
         return wrapper
 
     async def _request(self, url: str, data: str) -> list:
+        return await provider_response_cache.get_or_fetch(
+            "igdb",
+            {"url": url, "data": f"{data} limit {self.pagination_limit};"},
+            lambda: self._fetch(url, data),
+        )
+
+    async def _fetch(self, url: str, data: str) -> list:
         httpx_client = ctx_httpx_client.get()
         masked_headers = {}
 
@@ -246,12 +260,14 @@ class IGDBHandler(MetadataHandler):
                 f"{data} limit {self.pagination_limit};",
                 120,
             )
-            res = await httpx_client.post(
-                url,
-                content=f"{data} limit {self.pagination_limit};",
-                headers=self.headers,
-                timeout=120,
-            )
+            async with self.rate_limiter.acquire():
+                res = await httpx_client.post(
+                    url,
+                    content=f"{data} limit {self.pagination_limit};",
+                    headers=self.headers,
+                    timeout=120,
+                )
+            self.rate_limiter.record_response(res.status_code, res.headers)
 
             res.raise_for_status()
             return res.json()
@@ -275,18 +291,23 @@ class IGDBHandler(MetadataHandler):
                 detail="Can't connect to IGDB, check your internet connection",
             ) from exc
         except httpx.HTTPStatusError as exc:
+            # Retry once if rate limited, after the wait requested by IGDB
+            if exc.response.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+                pass
             # Retry once if the auth token is invalid
-            if exc.response.status_code != 401:
+            elif exc.response.status_code != 401:
                 log.error(exc)
+                mark_response_uncacheable()
                 return []  # All requests to the IGDB API return a list
-
-            # Attempt to force a token refresh if the token is invalid
-            log.info("Twitch token invalid: fetching a new one...")
-            token = await self.twitch_auth._update_twitch_token()
-            self.headers["Authorization"] = f"Bearer {token}"
+            else:
+                # Attempt to force a token refresh if the token is invalid
+                log.info("Twitch token invalid: fetching a new one...")
+                token = await self.twitch_auth._update_twitch_token()
+                self.headers["Authorization"] = f"Bearer {token}"
         except json.decoder.JSONDecodeError as exc:
             # Log the error and return an empty list if the response is not valid JSON
             log.error(exc)
+            mark_response_uncacheable()
             return []
         except httpx.TimeoutException:
             pass
@@ -300,19 +321,23 @@ class IGDBHandler(MetadataHandler):
                 f"{data} limit {self.pagination_limit};",
                 120,
             )
-            res = await httpx_client.post(
-                url,
-                content=f"{data} limit {self.pagination_limit};",
-                headers=self.headers,
-                timeout=120,
-            )
+            async with self.rate_limiter.acquire():
+                res = await httpx_client.post(
+                    url,
+                    content=f"{data} limit {self.pagination_limit};",
+                    headers=self.headers,
+                    timeout=120,
+                )
+            self.rate_limiter.record_response(res.status_code, res.headers)
             res.raise_for_status()
             return res.json()
         except (httpx.HTTPError, json.decoder.JSONDecodeError) as exc:
             # Log the error and return an empty list if the request fails again
             log.error(exc)
+            mark_response_uncacheable()
             return []
 
+    @single_flight
     async def _search_rom(
         self, search_term: str, platform_igdb_id: int, with_game_type: bool = False
     ) -> dict | None:
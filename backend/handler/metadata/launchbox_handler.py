@@ -1,9 +1,8 @@
-import json
 from datetime import datetime
 from typing import NotRequired, TypedDict
 
 import pydash
-from config import LAUNCHBOX_API_ENABLED, str_to_bool
+from config import LAUNCHBOX_API_ENABLED, SCAN_LOCAL_METADATA_FIRST, str_to_bool
 from handler.redis_handler import async_cache
 from logger.logger import log
 from tasks.update_launchbox_metadata import (  # LAUNCHBOX_MAME_KEY,
@@ -11,10 +10,19 @@ from tasks.update_launchbox_metadata import (  # LAUNCHBOX_MAME_KEY,
     LAUNCHBOX_METADATA_DATABASE_ID_KEY,
     LAUNCHBOX_METADATA_IMAGE_KEY,
     LAUNCHBOX_METADATA_NAME_KEY,
+    decode_launchbox_game,
+    decode_launchbox_images,
+    get_launchbox_name_key,
+    normalize_launchbox_name,
     update_launchbox_metadata_task,
 )
 
 from .base_hander import BaseRom, MetadataHandler
+from .local_index import (
+    CONFIDENT_MATCH_SCORE,
+    has_same_numbering,
+    local_metadata_index,
+)
 
 
 class LaunchboxPlatform(TypedDict):
@@ -130,24 +138,38 @@ class LaunchboxHandler(MetadataHandler):
         if not platform_name:
             return None
 
-        metadata_name_index_entry = await async_cache.hget(
-            LAUNCHBOX_METADATA_NAME_KEY, f"{file_name}:{platform_name}"
-        )
-
-        if metadata_name_index_entry:
-            return json.loads(metadata_name_index_entry)
-
-        metadata_alternate_name_index_entry = await async_cache.hget(
-            LAUNCHBOX_METADATA_ALTERNATE_NAME_KEY, file_name
+        database_id = await async_cache.hget(
+            LAUNCHBOX_METADATA_NAME_KEY,
+            get_launchbox_name_key(file_name, platform_name),
         )
 
-        if not metadata_alternate_name_index_entry:
+        if not database_id:
+            database_id = await async_cache.hget(
+                LAUNCHBOX_METADATA_ALTERNATE_NAME_KEY,
+                normalize_launchbox_name(file_name),
+            )
+
+        if not database_id and SCAN_LOCAL_METADATA_FIRST:
+            # File names often differ slightly from the LaunchBox names, but never
+            # by their numbering, or they'd match sequels
+            matches = await local_metadata_index.search(
+                "launchbox",
+                file_name,
+                platform=platform_name,
+                min_score=CONFIDENT_MATCH_SCORE,
+            )
+            database_id = next(
+                (
+                    match["key"]
+                    for match in matches
+                    if has_same_numbering(file_name, match["name"])
+                ),
+                None,
+            )
+
+        if not database_id:
             return None
 
-        metadata_alternate_name_index_entry = json.loads(
-            metadata_alternate_name_index_entry
-        )
-        database_id = metadata_alternate_name_index_entry["DatabaseID"]
         metadata_database_index_entry = await async_cache.hget(
             LAUNCHBOX_METADATA_DATABASE_ID_KEY, database_id
         )
@@ -155,7 +177,7 @@ class LaunchboxHandler(MetadataHandler):
         if not metadata_database_index_entry:
             return None
 
-        return json.loads(metadata_database_index_entry)
+        return decode_launchbox_game(metadata_database_index_entry)
 
     async def _get_game_images(self, database_id: str) -> list[dict] | None:
         metadata_image_index_entry = await async_cache.hget(
@@ -165,7 +187,7 @@ class LaunchboxHandler(MetadataHandler):
         if not metadata_image_index_entry:
             return None
 
-        return json.loads(metadata_image_index_entry)
+        return decode_launchbox_images(metadata_image_index_entry)
 
     def _get_best_cover_image(self, game_images: list[dict]) -> dict | None:
         """
@@ -217,10 +239,8 @@ class LaunchboxHandler(MetadataHandler):
         if not LAUNCHBOX_API_ENABLED:
             return fallback_rom
 
-        # We replace " - " with ": " to match Launchbox's naming convention
-        search_term = fs_rom_handler.get_file_name_with_no_tags(fs_name).replace(
-            " - ", ": "
-        )
+        # Names are normalized, so " - " matches Launchbox's ": " naming convention
+        search_term = fs_rom_handler.get_file_name_with_no_tags(fs_name)
         index_entry = await self._get_rom_from_metadata(search_term, platform_slug)
 
         if not index_entry:
@@ -263,6 +283,10 @@ class LaunchboxHandler(MetadataHandler):
         if not metadata_database_index_entry:
             return LaunchboxRom(launchbox_id=None)
 
+        metadata_database_index_entry = decode_launchbox_game(
+            metadata_database_index_entry
+        )
+
         game_images = await self._get_game_images(
             metadata_database_index_entry["DatabaseID"]
         )
@@ -0,0 +1,206 @@
+import asyncio
+import heapq
+import re
+from collections import Counter
+from collections.abc import Iterable
+from typing import Final, Literal, TypedDict
+
+from handler.redis_handler import async_cache
+from Levenshtein import ratio as levenshtein_ratio
+from logger.logger import log
+from tasks.update_launchbox_metadata import (
+    LAUNCHBOX_METADATA_NAME_KEY,
+    normalize_launchbox_name,
+    update_launchbox_metadata_task,
+)
+
+from .base_hander import single_flight
+
+# Score above which a fuzzy match is trusted to identify a game on its own
+CONFIDENT_MATCH_SCORE: Final = 0.9
+# Candidates picked by shared trigrams for each result, then ranked by edit distance
+CANDIDATES_PER_RESULT: Final = 10
+HSCAN_COUNT: Final = 5000
+
+REDIS_GLOB_PATTERN: Final = re.compile(r"([*?\[\]\\])")
+# Numbers, years and roman numerals up to 39, which tell sequels and remakes apart
+NUMBERING_TOKEN_PATTERN: Final = re.compile(r"^(\d+|x{0,3}(ix|iv|v?i{0,3}))$")
+
+LocalDataset = Literal["launchbox"]
+
+
+class FuzzyMatch(TypedDict):
+    # Key of the entry in its dataset, e.g. a LaunchBox database ID
+    key: str
+    name: str
+    score: float
+
+
+def get_trigrams(name: str) -> set[str]:
+    padded = f"  {name} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def get_numbering_tokens(name: str) -> set[str]:
+    return {
+        token
+        for token in normalize_launchbox_name(name).split()
+        if NUMBERING_TOKEN_PATTERN.match(token)
+    }
+
+
+def has_same_numbering(query: str, name: str) -> bool:
+    """Return whether two names have the same numbers, years and roman numerals.
+
+    Names of sequels differ by a single character, and are too close to be told
+    apart by their similarity alone.
+    """
+    return get_numbering_tokens(query) == get_numbering_tokens(name)
+
+
+def _to_str(value: str | bytes) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class TrigramIndex:
+    """In-memory index of names, for ranked fuzzy searches.
+
+    The names sharing the most trigrams with the query are picked as candidates, and
+    ranked by their edit distance to it. Names are normalized the same way as the
+    LaunchBox name keys, ignoring case, accents and punctuation.
+    """
+
+    def __init__(self, entries: Iterable[tuple[str, str]]) -> None:
+        self._keys: list[str] = []
+        self._names: list[str] = []
+        self._trigram_counts: list[int] = []
+        self._postings: dict[str, list[int]] = {}
+
+        for key, name in entries:
+            normalized_name = normalize_launchbox_name(name)
+            if not normalized_name:
+                continue
+
+            entry_id = len(self._keys)
+            trigrams = get_trigrams(normalized_name)
+            self._keys.append(key)
+            self._names.append(normalized_name)
+            self._trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                self._postings.setdefault(trigram, []).append(entry_id)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def search(
+        self, query: str, limit: int = 5, min_score: float = 0.0
+    ) -> list[FuzzyMatch]:
+        """Return the entries closest to the query, best match first.
+
+        :param query: Name to search for.
+        :param limit: Maximum number of matches returned.
+        :param min_score: Similarity, from 0 to 1, below which entries don't match.
+        """
+        query = normalize_launchbox_name(query)
+        if not query:
+            return []
+
+        query_trigrams = get_trigrams(query)
+        shared_trigrams: Counter[int] = Counter()
+        for trigram in query_trigrams:
+            shared_trigrams.update(self._postings.get(trigram, ()))
+
+        # Dice coefficient of the trigram sets
+        candidates = heapq.nlargest(
+            limit * CANDIDATES_PER_RESULT,
+            shared_trigrams.items(),
+            key=lambda item: item[1]
+            / (len(query_trigrams) + self._trigram_counts[item[0]]),
+        )
+
+        matches = [
+            FuzzyMatch(
+                key=self._keys[entry_id],
+                name=self._names[entry_id],
+                score=levenshtein_ratio(query, self._names[entry_id]),
+            )
+            for entry_id, _ in candidates
+        ]
+        matches = [match for match in matches if match["score"] >= min_score]
+        matches.sort(key=lambda match: match["score"], reverse=True)
+        return matches[:limit]
+
+
+class LocalMetadataIndex:
+    """Fuzzy name search over the offline LaunchBox metadata stored in Redis.
+
+    The metadata is only indexed by exact keys in Redis. The trigram indexes are
+    built in memory on first use, one per platform, and rebuilt once the metadata is
+    imported again.
+    """
+
+    def __init__(self) -> None:
+        self._indexes: dict[
+            tuple[LocalDataset, str | None], tuple[float | None, TrigramIndex]
+        ] = {}
+
+    async def search(
+        self,
+        dataset: LocalDataset,
+        query: str,
+        *,
+        platform: str | None = None,
+        limit: int = 5,
+        min_score: float = 0.0,
+    ) -> list[FuzzyMatch]:
+        """Search a dataset for the entries closest to a name, best match first.
+
+        :param dataset: Dataset to search.
+        :param query: Name to search for.
+        :param platform: LaunchBox platform name, required to search LaunchBox games.
+        :param limit: Maximum number of matches returned.
+        :param min_score: Similarity, from 0 to 1, below which entries don't match.
+        """
+        index = await self._get_index(dataset, platform)
+        return index.search(query, limit=limit, min_score=min_score)
+
+    async def _get_version(self, dataset: LocalDataset) -> float | None:
+        return await update_launchbox_metadata_task.get_imported_at()
+
+    @single_flight
+    async def _get_index(
+        self, dataset: LocalDataset, platform: str | None
+    ) -> TrigramIndex:
+        version = await self._get_version(dataset)
+        cached_index = self._indexes.get((dataset, platform))
+        if cached_index and cached_index[0] == version:
+            return cached_index[1]
+
+        entries = await self._load_entries(dataset, platform)
+        index = await asyncio.to_thread(TrigramIndex, entries)
+        log.debug(f"Built local {dataset} index with {len(index)} names")
+
+        # The dataset may not be loaded yet, an empty index is built again next time
+        if len(index):
+            self._indexes[(dataset, platform)] = (version, index)
+
+        return index
+
+    async def _load_entries(
+        self, dataset: LocalDataset, platform: str | None
+    ) -> list[tuple[str, str]]:
+        if not platform:
+            return []
+
+        # Fields are the normalized names, suffixed with the platform name
+        suffix = f":{platform}"
+        match = "*" + REDIS_GLOB_PATTERN.sub(r"\\\1", suffix)
+        return [
+            (_to_str(database_id), _to_str(name_key)[: -len(suffix)])
+            async for name_key, database_id in async_cache.hscan_iter(
+                LAUNCHBOX_METADATA_NAME_KEY, match=match, count=HSCAN_COUNT
+            )
+        ]
+
+
+local_metadata_index = LocalMetadataIndex()
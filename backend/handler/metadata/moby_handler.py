@@ -15,6 +15,7 @@ from .base_hander import (
     SWITCH_TITLEDB_REGEX,
     BaseRom,
     MetadataHandler,
+    single_flight,
 )
 
 # Used to display the Mobygames API status in the frontend
@@ -73,6 +74,7 @@ class MobyGamesHandler(MetadataHandler):
     def __init__(self) -> None:
         self.moby_service = MobyGamesService()
 
+    @single_flight
     async def _search_rom(
         self, search_term: str, platform_moby_id: int
     ) -> MobyGame | None:
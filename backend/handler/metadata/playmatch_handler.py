@@ -4,6 +4,11 @@ from typing import NotRequired, TypedDict
 
 import httpx
 import yarl
+from adapters.services.rate_limiter import rate_limiters
+from adapters.services.response_cache import (
+    mark_response_uncacheable,
+    provider_response_cache,
+)
 from config import PLAYMATCH_API_ENABLED
 from fastapi import HTTPException, status
 from logger.logger import log
@@ -46,6 +51,7 @@ class PlaymatchHandler:
     def __init__(self):
         self.base_url = "https://playmatch.retrorealm.dev/api"
         self.identify_url = f"{self.base_url}/identify/ids"
+        self.rate_limiter = rate_limiters["playmatch"]
 
     async def _request(self, url: str, query: dict) -> dict:
         """
@@ -56,6 +62,13 @@ class PlaymatchHandler:
         :return: A dictionary with the json result.
         :raises HTTPException: If the request fails or the service is unavailable.
         """
+        return await provider_response_cache.get_or_fetch(
+            "playmatch",
+            {"url": url, "query": query},
+            lambda: self._fetch(url, query),
+        )
+
+    async def _fetch(self, url: str, query: dict) -> dict:
         httpx_client = ctx_httpx_client.get()
 
         filtered_query = {
@@ -77,9 +90,11 @@ class PlaymatchHandler:
         }
 
         try:
-            res = await httpx_client.get(
-                str(url_with_query), headers=headers, timeout=60
-            )
+            async with self.rate_limiter.acquire():
+                res = await httpx_client.get(
+                    str(url_with_query), headers=headers, timeout=60
+                )
+            self.rate_limiter.record_response(res.status_code, res.headers)
             res.raise_for_status()
             return res.json()
         except httpx.HTTPStatusError as exc:
@@ -90,8 +105,30 @@ class PlaymatchHandler:
             ) from exc
         except json.JSONDecodeError as exc:
             log.error("Error decoding JSON response from ScreenScraper: %s", exc)
+            mark_response_uncacheable()
             return {}
 
+    @staticmethod
+    def get_lookup_file(files: list[RomFile]) -> RomFile | None:
+        """Return the file whose hashes identify the ROM in Playmatch."""
+        first_file = next(
+            (
+                file
+                for file in files
+                if file.file_size_bytes is not None and file.file_size_bytes > 0
+            ),
+            None,
+        )
+        if first_file is None:
+            return None
+
+        # Playmatch can't match on CRC alone, which is all we have for archives
+        # identified from their headers until their full hashes are calculated
+        if not (first_file.md5_hash or first_file.sha1_hash):
+            return None
+
+        return first_file
+
     async def lookup_rom(self, files: list[RomFile]) -> PlaymatchRomMatch:
         """
         Identify a ROM file using Playmatch API.
@@ -103,14 +140,7 @@ class PlaymatchHandler:
         if not PLAYMATCH_API_ENABLED:
             return PlaymatchRomMatch(igdb_id=None)
 
-        first_file = next(
-            (
-                file
-                for file in files
-                if file.file_size_bytes is not None and file.file_size_bytes > 0
-            ),
-            None,
-        )
+        first_file = self.get_lookup_file(files)
         if first_file is None:
             return PlaymatchRomMatch(igdb_id=None)
 
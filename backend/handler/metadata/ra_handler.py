@@ -17,12 +17,18 @@ from config import (
 from handler.filesystem import fs_resource_handler
 from models.rom import Rom
 
-from .base_hander import BaseRom, MetadataHandler
+from .base_hander import BaseRom, MetadataHandler, single_flight
 
 # Used to display the Retroachievements API status in the frontend
 RA_API_ENABLED: Final = bool(RETROACHIEVEMENTS_API_KEY)
 
 
+class RAHashIndex(TypedDict):
+    # Modification time of the hashes file the index was built from
+    mtime: float
+    games: dict[str, RAGameListItem]
+
+
 class RAGamesPlatform(TypedDict):
     slug: str
     ra_id: int | None
@@ -122,6 +128,7 @@ class RAHandler(MetadataHandler):
     def __init__(self) -> None:
         self.ra_service = RetroAchievementsService()
         self.HASHES_FILE_NAME = "ra_hashes.json"
+        self._hash_indexes: dict[int, RAHashIndex] = {}
 
     def _get_hashes_file_path(self, platform_id: int) -> str:
         platform_resources_path = fs_resource_handler.get_platform_resources_path(
@@ -142,26 +149,30 @@ class RAHandler(MetadataHandler):
         full_path = fs_resource_handler.validate_path(file_path)
         return int((time.time() - os.path.getmtime(full_path)) / (24 * 3600))
 
-    async def _search_rom(self, rom: Rom, ra_hash: str) -> RAGameListItem | None:
-        if not rom.platform.ra_id:
-            return None
+    @single_flight
+    async def _get_hash_index(
+        self, platform_id: int, platform_ra_id: int
+    ) -> dict[str, RAGameListItem]:
+        """Return the games of a platform, indexed by the hashes of their ROMs.
 
+        The hashes file is parsed once, and indexed again only when it changes.
+        """
         # Fetch all hashes for specific platform
-        roms: list[RAGameListItem]
+        roms: list[RAGameListItem] | None = None
         if (
             REFRESH_RETROACHIEVEMENTS_CACHE_DAYS
-            <= await self._days_since_last_cache_file_update(rom.platform.id)
-            or not await self._exists_cache_file(rom.platform.id)
+            <= await self._days_since_last_cache_file_update(platform_id)
+            or not await self._exists_cache_file(platform_id)
         ):
             # Write the roms result to a JSON file if older than REFRESH_RETROACHIEVEMENTS_CACHE_DAYS days
             roms = await self.ra_service.get_game_list(
-                system_id=rom.platform.ra_id,
+                system_id=platform_ra_id,
                 only_games_with_achievements=True,
                 include_hashes=True,
             )
 
             platform_resources_path = fs_resource_handler.get_platform_resources_path(
-                rom.platform.id
+                platform_id
             )
 
             json_file = json.dumps(roms, indent=4)
@@ -170,18 +181,33 @@ class RAHandler(MetadataHandler):
                 platform_resources_path,
                 self.HASHES_FILE_NAME,
             )
-        else:
+
+        file_path = self._get_hashes_file_path(platform_id)
+        mtime = os.path.getmtime(fs_resource_handler.validate_path(file_path))
+        hash_index = self._hash_indexes.get(platform_id)
+        if hash_index and hash_index["mtime"] == mtime:
+            return hash_index["games"]
+
+        if roms is None:
             # Read the roms result from the JSON file
-            json_file_bytes = await fs_resource_handler.read_file(
-                self._get_hashes_file_path(rom.platform.id)
-            )
+            json_file_bytes = await fs_resource_handler.read_file(file_path)
             roms = json.loads(json_file_bytes.decode("utf-8"))
 
+        games: dict[str, RAGameListItem] = {}
         for r in roms:
-            if ra_hash in r.get("Hashes", ()):
-                return r
+            for game_hash in r.get("Hashes", ()):
+                # Keep the first game listing a hash, as the linear search did
+                games.setdefault(game_hash, r)
+
+        self._hash_indexes[platform_id] = RAHashIndex(mtime=mtime, games=games)
+        return games
+
+    async def _search_rom(self, rom: Rom, ra_hash: str) -> RAGameListItem | None:
+        if not rom.platform.ra_id:
+            return None
 
-        return None
+        hash_index = await self._get_hash_index(rom.platform.id, rom.platform.ra_id)
+        return hash_index.get(ra_hash)
 
     def get_platform(self, slug: str) -> RAGamesPlatform:
         platform = RA_PLATFORM_LIST.get(slug.lower(), None)
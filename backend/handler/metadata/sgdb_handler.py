@@ -7,7 +7,7 @@ from config import STEAMGRIDDB_API_KEY
 from Levenshtein import distance as levenshtein_distance
 from logger.logger import log
 
-from .base_hander import MetadataHandler
+from .base_hander import MetadataHandler, single_flight
 
 # Used to display the Mobygames API status in the frontend
 STEAMGRIDDB_API_ENABLED: Final = bool(STEAMGRIDDB_API_KEY)
@@ -51,6 +51,7 @@ class SGDBBaseHandler(MetadataHandler):
 
         return list(filter(None, results))
 
+    @single_flight
     async def get_details_by_names(self, game_names: list[str]) -> SGDBRom:
         if not STEAMGRIDDB_API_ENABLED:
             return SGDBRom(sgdb_id=None)
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from handler.metadata.base_hander import single_flight
+
+
+class Provider:
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+        self.release = asyncio.Event()
+
+    @single_flight
+    async def search(self, search_term: str, platforms: list[int]) -> str:
+        self.calls.append(search_term)
+        await self.release.wait()
+        if search_term == "missing":
+            raise LookupError(search_term)
+        return search_term.upper()
+
+
+async def test_single_flight_coalesces_identical_calls():
+    provider = Provider()
+    searches = asyncio.gather(
+        provider.search("mario", [1, 2]),
+        provider.search("mario", [1, 2]),
+        provider.search("mario", [1, 2]),
+    )
+    await asyncio.sleep(0)
+    provider.release.set()
+
+    assert await searches == ["MARIO", "MARIO", "MARIO"]
+    assert provider.calls == ["mario"]
+
+
+async def test_single_flight_runs_distinct_calls():
+    provider = Provider()
+    searches = asyncio.gather(
+        provider.search("mario", [1]),
+        provider.search("mario", [2]),
+        provider.search("zelda", [1]),
+    )
+    await asyncio.sleep(0)
+    provider.release.set()
+
+    assert await searches == ["MARIO", "MARIO", "ZELDA"]
+    assert len(provider.calls) == 3
+
+
+async def test_single_flight_raises_error_to_every_caller():
+    provider = Provider()
+    searches = asyncio.gather(
+        provider.search("missing", [1]),
+        provider.search("missing", [1]),
+        return_exceptions=True,
+    )
+    await asyncio.sleep(0)
+    provider.release.set()
+
+    errors = await searches
+    assert all(isinstance(error, LookupError) for error in errors)
+    assert provider.calls == ["missing"]
+
+    # Failed calls aren't remembered
+    with pytest.raises(LookupError):
+        await provider.search("missing", [1])
+    assert len(provider.calls) == 2
+
+
+async def test_single_flight_cancelled_caller_keeps_shared_call():
+    provider = Provider()
+    cancelled_search = asyncio.create_task(provider.search("mario", [1]))
+    search = asyncio.create_task(provider.search("mario", [1]))
+    await asyncio.sleep(0)
+
+    cancelled_search.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled_search
+
+    provider.release.set()
+    assert await search == "MARIO"
+    assert provider.calls == ["mario"]
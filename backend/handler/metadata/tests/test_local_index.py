@@ -0,0 +1,90 @@
+from typing import Final
+from unittest.mock import patch
+
+from handler.metadata.local_index import (
+    LocalMetadataIndex,
+    TrigramIndex,
+    has_same_numbering,
+)
+from handler.redis_handler import async_cache
+from tasks.update_launchbox_metadata import (
+    LAUNCHBOX_METADATA_NAME_KEY,
+    get_launchbox_name_key,
+    update_launchbox_metadata_task,
+)
+
+NES: Final = "Nintendo Entertainment System"
+GBA: Final = "Nintendo Game Boy Advance"
+
+
+def test_trigram_index_ranks_closest_names_first():
+    index = TrigramIndex(
+        [
+            ("1", "The Legend of Zelda: A Link to the Past"),
+            ("2", "The Legend of Zelda"),
+            ("3", "Zelda II: The Adventure of Link"),
+            ("4", "Super Mario World"),
+        ]
+    )
+
+    matches = index.search("Legend of Zelda - A Link to the Past", limit=2)
+    assert [match["key"] for match in matches] == ["1", "2"]
+    assert matches[0]["score"] > matches[1]["score"]
+
+    assert index.search("super mario world")[0]["score"] == 1
+    assert index.search("Sonic the Hedgehog", min_score=0.9) == []
+    assert index.search("") == []
+
+
+def test_has_same_numbering():
+    assert has_same_numbering("Mega Man 2 (USA)", "Mega Man 2")
+    assert has_same_numbering("Final Fantasy VI", "Final Fantasy - VI")
+    assert has_same_numbering("Super Mario World", "Super Mario World")
+
+    # Sequels are too close to be told apart by their similarity
+    assert not has_same_numbering("Mega Man 2", "Mega Man 3")
+    assert not has_same_numbering("Super Mario Bros 2", "Super Mario Bros 3")
+    assert not has_same_numbering("Final Fantasy IV", "Final Fantasy VI")
+    assert not has_same_numbering("FIFA 98", "FIFA 99")
+    assert not has_same_numbering("Mega Man", "Mega Man X")
+
+
+async def test_local_index_searches_launchbox_platform():
+    await async_cache.hset(
+        LAUNCHBOX_METADATA_NAME_KEY,
+        mapping={
+            get_launchbox_name_key("Super Mario Bros. 3", NES): "1",
+            get_launchbox_name_key("Super Mario Bros. 3", GBA): "2",
+        },
+    )
+    local_index = LocalMetadataIndex()
+
+    try:
+        with patch.object(
+            update_launchbox_metadata_task, "get_imported_at", return_value=1.0
+        ):
+            matches = await local_index.search(
+                "launchbox", "Super Mario Bros 3 (USA)", platform=GBA
+            )
+            assert [match["key"] for match in matches] == ["2"]
+
+            # Indexes are only built again once the dataset is imported again
+            await async_cache.hset(
+                LAUNCHBOX_METADATA_NAME_KEY,
+                get_launchbox_name_key("Super Mario Advance 4", GBA),
+                "3",
+            )
+            matches = await local_index.search(
+                "launchbox", "Super Mario Advance 4", platform=GBA
+            )
+            assert matches[0]["key"] == "2"
+
+        with patch.object(
+            update_launchbox_metadata_task, "get_imported_at", return_value=2.0
+        ):
+            matches = await local_index.search(
+                "launchbox", "Super Mario Advance 4", platform=GBA
+            )
+            assert matches[0]["key"] == "3"
+    finally:
+        await async_cache.delete(LAUNCHBOX_METADATA_NAME_KEY)
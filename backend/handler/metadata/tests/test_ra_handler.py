@@ -0,0 +1,60 @@
+import json
+import os
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from handler.filesystem import fs_resource_handler
+from handler.metadata.ra_handler import RAHandler
+
+
+def write_hashes_file(base_path: Path, platform_id: int, games: list[dict]) -> Path:
+    hashes_path = base_path / "roms" / str(platform_id) / "ra_hashes.json"
+    hashes_path.parent.mkdir(parents=True, exist_ok=True)
+    hashes_path.write_text(json.dumps(games))
+    return hashes_path
+
+
+@pytest.fixture
+def ra_handler(tmp_path: Path):
+    with patch.object(fs_resource_handler, "base_path", str(tmp_path)):
+        ra_handler = RAHandler()
+        ra_handler.ra_service.get_game_list = AsyncMock()
+        yield ra_handler
+
+
+async def test_get_hash_index_is_built_once(ra_handler: RAHandler, tmp_path: Path):
+    write_hashes_file(tmp_path, 1, [{"ID": 1, "Hashes": ["a1", "a2"]}])
+    write_hashes_file(tmp_path, 2, [{"ID": 2, "Hashes": ["b1"]}])
+
+    with patch.object(
+        fs_resource_handler, "read_file", wraps=fs_resource_handler.read_file
+    ) as mock_read_file:
+        hash_index = await ra_handler._get_hash_index(1, 4)
+        assert await ra_handler._get_hash_index(1, 4) is hash_index
+        assert mock_read_file.call_count == 1
+
+        # Each platform has its own index
+        other_hash_index = await ra_handler._get_hash_index(2, 5)
+        assert mock_read_file.call_count == 2
+
+    assert hash_index["a1"]["ID"] == hash_index["a2"]["ID"] == 1
+    assert "b1" not in hash_index
+    assert other_hash_index["b1"]["ID"] == 2
+    ra_handler.ra_service.get_game_list.assert_not_called()
+
+
+async def test_get_hash_index_is_rebuilt_when_file_changes(
+    ra_handler: RAHandler, tmp_path: Path
+):
+    hashes_path = write_hashes_file(tmp_path, 1, [{"ID": 1, "Hashes": ["a1"]}])
+    hash_index = await ra_handler._get_hash_index(1, 4)
+
+    write_hashes_file(tmp_path, 1, [{"ID": 3, "Hashes": ["c1"]}])
+    mtime = hashes_path.stat().st_mtime
+    os.utime(hashes_path, (mtime + 10, mtime + 10))
+
+    new_hash_index = await ra_handler._get_hash_index(1, 4)
+    assert new_hash_index is not hash_index
+    assert new_hash_index["c1"]["ID"] == 3
+    assert "a1" not in new_hash_index
@@ -1,10 +1,20 @@
 import asyncio
+import time
+from collections.abc import Awaitable
 from enum import Enum
-from typing import Any
+from typing import Any, Final, TypedDict, TypeVar
 
 import emoji
+from adapters.services.response_cache import track_response_cacheability
+from config import (
+    HASHEOUS_API_ENABLED,
+    PLAYMATCH_API_ENABLED,
+    REFRESH_HASH_IDENTIFICATIONS_DAYS,
+    REFRESH_UNMATCHED_HASH_IDENTIFICATIONS_DAYS,
+    SCAN_LOCAL_METADATA_FIRST,
+)
 from config.config_manager import config_manager as cm
-from handler.database import db_platform_handler
+from handler.database import db_hash_identification_handler, db_platform_handler
 from handler.filesystem import fs_asset_handler, fs_firmware_handler
 from handler.filesystem.roms_handler import FSRom
 from handler.metadata import (
@@ -31,12 +41,19 @@ from logger.formatter import highlight as hl
 from logger.logger import log
 from models.assets import Save, Screenshot, State
 from models.firmware import Firmware
+from models.hash_identification import HashIdentification, HashIdentificationProvider
 from models.platform import Platform
-from models.rom import Rom
+from models.rom import Rom, RomFile
 from models.user import User
+from sqlalchemy.exc import IntegrityError
 
 LOGGER_MODULE_NAME = {"module_name": "scan"}
 
+# Maximum number of concurrent hash lookups sent to Playmatch and Hasheous by a scan
+HASH_LOOKUP_CONCURRENCY: Final = 8
+
+T = TypeVar("T")
+
 
 class ScanType(Enum):
     NEW_PLATFORMS = "new_platforms"
@@ -76,6 +93,286 @@ async def _get_main_platform_igdb_id(platform: Platform):
     return main_platform_igdb_id
 
 
+class HashMatches(TypedDict):
+    playmatch_rom: PlaymatchRomMatch
+    # Result of the Hasheous hash lookup, and the same result with the IGDB and
+    # RetroAchievements metadata proxied by Hasheous
+    hasheous_hash_match: HasheousRom
+    hasheous_rom: HasheousRom
+
+
+def _should_lookup_playmatch(
+    scan_type: ScanType,
+    platform: Platform,
+    rom: Rom,
+    metadata_sources: list[str],
+    newly_added: bool,
+) -> bool:
+    return bool(
+        MetadataSource.IGDB in metadata_sources
+        and platform.igdb_id
+        and (
+            newly_added
+            or scan_type == ScanType.COMPLETE
+            or (scan_type == ScanType.PARTIAL and not rom.igdb_id)
+            or (scan_type == ScanType.UNIDENTIFIED and rom.is_unidentified)
+        )
+    )
+
+
+def _should_lookup_hasheous(
+    scan_type: ScanType,
+    platform: Platform,
+    rom: Rom,
+    metadata_sources: list[str],
+    newly_added: bool,
+) -> bool:
+    return bool(
+        MetadataSource.HASHEOUS in metadata_sources
+        and platform.hasheous_id
+        and (
+            newly_added
+            or scan_type == ScanType.COMPLETE
+            or (scan_type == ScanType.PARTIAL and not rom.hasheous_id)
+            or (scan_type == ScanType.UNIDENTIFIED and rom.is_unidentified)
+        )
+    )
+
+
+def _hash_identification_key(file: RomFile) -> tuple[str, str, str]:
+    return (file.crc_hash or "", file.md5_hash or "", file.sha1_hash or "")
+
+
+def _is_hash_identification_fresh(identification: HashIdentification) -> bool:
+    refresh_days = (
+        REFRESH_HASH_IDENTIFICATIONS_DAYS
+        if identification.matched
+        else REFRESH_UNMATCHED_HASH_IDENTIFICATIONS_DAYS
+    )
+    return time.time() - identification.identified_at <= refresh_days * 24 * 60 * 60
+
+
+def _store_hash_identification(identification: HashIdentification) -> None:
+    identification.identified_at = int(time.time())
+    try:
+        db_hash_identification_handler.upsert_identification(identification)
+    except IntegrityError:
+        # Another worker identified the same file concurrently, e.g. a duplicate ROM
+        pass
+
+
+async def _lookup_playmatch_hash_match(
+    file: RomFile, identification: HashIdentification | None
+) -> PlaymatchRomMatch:
+    if identification and _is_hash_identification_fresh(identification):
+        return PlaymatchRomMatch(igdb_id=identification.igdb_id)
+
+    with track_response_cacheability() as cacheability:
+        playmatch_rom = await meta_playmatch_handler.lookup_rom([file])
+    # A failed lookup says nothing about the file, so it isn't stored
+    if not cacheability.cacheable:
+        return playmatch_rom
+
+    _store_hash_identification(
+        HashIdentification(
+            provider=HashIdentificationProvider.PLAYMATCH,
+            crc_hash=file.crc_hash,
+            md5_hash=file.md5_hash,
+            sha1_hash=file.sha1_hash,
+            matched=playmatch_rom["igdb_id"] is not None,
+            igdb_id=playmatch_rom["igdb_id"],
+        )
+    )
+    return playmatch_rom
+
+
+async def _lookup_hasheous_hash_match(
+    platform_slug: str, file: RomFile, identification: HashIdentification | None
+) -> HasheousRom:
+    if identification and _is_hash_identification_fresh(identification):
+        if identification.hasheous_id is None:
+            return HasheousRom(hasheous_id=None, igdb_id=None, tgdb_id=None, ra_id=None)
+
+        return meta_hasheous_handler.build_rom(
+            hasheous_id=identification.hasheous_id,
+            name=identification.name or "",
+            url_cover=identification.url_cover or "",
+            igdb_id=identification.igdb_id,
+            tgdb_id=identification.tgdb_id,
+            ra_id=identification.ra_id,
+            signatures=identification.signatures or [],
+        )
+
+    with track_response_cacheability() as cacheability:
+        hasheous_rom = await meta_hasheous_handler.lookup_rom(platform_slug, [file])
+    if not cacheability.cacheable:
+        return hasheous_rom
+
+    _store_hash_identification(
+        HashIdentification(
+            provider=HashIdentificationProvider.HASHEOUS,
+            crc_hash=file.crc_hash,
+            md5_hash=file.md5_hash,
+            sha1_hash=file.sha1_hash,
+            matched=hasheous_rom["hasheous_id"] is not None,
+            hasheous_id=hasheous_rom["hasheous_id"],
+            igdb_id=hasheous_rom.get("igdb_id"),
+            ra_id=hasheous_rom.get("ra_id"),
+            tgdb_id=hasheous_rom.get("tgdb_id"),
+            name=hasheous_rom.get("name"),
+            url_cover=hasheous_rom.get("url_cover", ""),
+            signatures=meta_hasheous_handler.get_signatures(hasheous_rom),
+        )
+    )
+    return hasheous_rom
+
+
+async def _fetch_hasheous_rom(
+    platform_slug: str, file: RomFile, identification: HashIdentification | None
+) -> tuple[HasheousRom, HasheousRom]:
+    hasheous_hash_match = await _lookup_hasheous_hash_match(
+        platform_slug, file, identification
+    )
+    if not hasheous_hash_match["hasheous_id"]:
+        return hasheous_hash_match, hasheous_hash_match
+
+    (
+        igdb_game,
+        ra_game,
+    ) = await asyncio.gather(
+        meta_hasheous_handler.get_igdb_game(hasheous_hash_match),
+        meta_hasheous_handler.get_ra_game(hasheous_hash_match),
+    )
+
+    return hasheous_hash_match, HasheousRom(
+        {
+            **hasheous_hash_match,
+            **ra_game,
+            **igdb_game,
+        }
+    )
+
+
+async def fetch_hash_matches(
+    scan_type: ScanType,
+    platform: Platform,
+    roms: list[tuple[Rom, FSRom, bool]],
+    metadata_sources: list[str],
+) -> list[HashMatches]:
+    """Identify a batch of roms by their hashes with Playmatch and Hasheous
+
+    Stored identifications are loaded with a single query per provider, and files
+    sharing the same hashes (e.g. duplicate dumps) are looked up only once. The
+    remaining lookups are sent concurrently, at most HASH_LOOKUP_CONCURRENCY at a time.
+
+    Args:
+        roms: (rom, fs_rom, newly_added) tuples, with the files of fs_rom hashed
+    Returns
+        The hash matches of each rom, in the same order
+    """
+    # Complete rescans ignore the stored identifications, so they get refreshed
+    refresh = scan_type == ScanType.COMPLETE
+    semaphore = asyncio.Semaphore(HASH_LOOKUP_CONCURRENCY)
+
+    async def bounded(coro: Awaitable[T]) -> T:
+        async with semaphore:
+            return await coro
+
+    playmatch_files: list[RomFile | None] = [
+        (
+            meta_playmatch_handler.get_lookup_file(fs_rom["files"])
+            if PLAYMATCH_API_ENABLED
+            and _should_lookup_playmatch(
+                scan_type, platform, rom, metadata_sources, newly_added
+            )
+            else None
+        )
+        for rom, fs_rom, newly_added in roms
+    ]
+    hasheous_files: list[RomFile | None] = [
+        (
+            meta_hasheous_handler.get_lookup_file(platform.slug, fs_rom["files"])
+            if HASHEOUS_API_ENABLED
+            and _should_lookup_hasheous(
+                scan_type, platform, rom, metadata_sources, newly_added
+            )
+            else None
+        )
+        for rom, fs_rom, newly_added in roms
+    ]
+    # Hasheous needs at least one hash to identify a file
+    hasheous_files = [
+        file if file and any(_hash_identification_key(file)) else None
+        for file in hasheous_files
+    ]
+
+    playmatch_keys = {_hash_identification_key(f) for f in playmatch_files if f}
+    hasheous_keys = {_hash_identification_key(f) for f in hasheous_files if f}
+    stored_playmatch = (
+        {}
+        if refresh
+        else db_hash_identification_handler.get_identifications(
+            HashIdentificationProvider.PLAYMATCH, playmatch_keys
+        )
+    )
+    stored_hasheous = (
+        {}
+        if refresh
+        else db_hash_identification_handler.get_identifications(
+            HashIdentificationProvider.HASHEOUS, hasheous_keys
+        )
+    )
+
+    playmatch_tasks: dict[tuple[str, str, str], asyncio.Task[PlaymatchRomMatch]] = {}
+    hasheous_tasks: dict[
+        tuple[str, str, str], asyncio.Task[tuple[HasheousRom, HasheousRom]]
+    ] = {}
+    async with asyncio.TaskGroup() as tg:
+        for file in playmatch_files:
+            if file and (key := _hash_identification_key(file)) not in playmatch_tasks:
+                playmatch_tasks[key] = tg.create_task(
+                    bounded(
+                        _lookup_playmatch_hash_match(file, stored_playmatch.get(key))
+                    )
+                )
+        for file in hasheous_files:
+            if file and (key := _hash_identification_key(file)) not in hasheous_tasks:
+                hasheous_tasks[key] = tg.create_task(
+                    bounded(
+                        _fetch_hasheous_rom(
+                            platform.slug, file, stored_hasheous.get(key)
+                        )
+                    )
+                )
+
+    hash_matches: list[HashMatches] = []
+    for playmatch_file, hasheous_file in zip(
+        playmatch_files, hasheous_files, strict=True
+    ):
+        playmatch_rom = (
+            playmatch_tasks[_hash_identification_key(playmatch_file)].result()
+            if playmatch_file
+            else PlaymatchRomMatch(igdb_id=None)
+        )
+        hasheous_hash_match, hasheous_rom = (
+            hasheous_tasks[_hash_identification_key(hasheous_file)].result()
+            if hasheous_file
+            else (
+                HasheousRom(hasheous_id=None, igdb_id=None, tgdb_id=None, ra_id=None),
+                HasheousRom(hasheous_id=None, igdb_id=None, tgdb_id=None, ra_id=None),
+            )
+        )
+        hash_matches.append(
+            HashMatches(
+                playmatch_rom=playmatch_rom,
+                hasheous_hash_match=hasheous_hash_match,
+                hasheous_rom=hasheous_rom,
+            )
+        )
+
+    return hash_matches
+
+
 async def scan_platform(
     fs_slug: str,
     fs_platforms: list[str],
@@ -233,6 +530,7 @@ async def scan_rom(
     fs_rom: FSRom,
     metadata_sources: list[str],
     newly_added: bool,
+    hash_matches: HashMatches | None = None,
 ) -> Rom:
     if not metadata_sources:
         log.error("No metadata sources provided")
@@ -300,46 +598,14 @@ async def scan_rom(
             }
         )
 
-    async def fetch_playmatch_hash_match() -> PlaymatchRomMatch:
-        if (
-            MetadataSource.IGDB in metadata_sources
-            and platform.igdb_id
-            and (
-                newly_added
-                or scan_type == ScanType.COMPLETE
-                or (scan_type == ScanType.PARTIAL and not rom.igdb_id)
-                or (scan_type == ScanType.UNIDENTIFIED and rom.is_unidentified)
-            )
-        ):
-            return await meta_playmatch_handler.lookup_rom(fs_rom["files"])
-
-        return PlaymatchRomMatch(igdb_id=None)
-
-    async def fetch_hasheous_hash_match() -> HasheousRom:
-        if (
-            MetadataSource.HASHEOUS in metadata_sources
-            and platform.hasheous_id
-            and (
-                newly_added
-                or scan_type == ScanType.COMPLETE
-                or (scan_type == ScanType.PARTIAL and not rom.hasheous_id)
-                or (scan_type == ScanType.UNIDENTIFIED and rom.is_unidentified)
-            )
-        ):
-            return await meta_hasheous_handler.lookup_rom(
-                platform.slug, fs_rom["files"]
-            )
-
-        return HasheousRom(hasheous_id=None, igdb_id=None, tgdb_id=None, ra_id=None)
+    # Roms scanned in batches are identified by their hashes beforehand
+    if hash_matches is None:
+        (hash_matches,) = await fetch_hash_matches(
+            scan_type, platform, [(rom, fs_rom, newly_added)], metadata_sources
+        )
 
-    # Run hash fetches concurrently
-    (
-        playmatch_hash_match,
-        hasheous_hash_match,
-    ) = await asyncio.gather(
-        fetch_playmatch_hash_match(),
-        fetch_hasheous_hash_match(),
-    )
+    # Set once the rom is matched in the offline metadata, which needs no network
+    resolved_locally = False
 
     async def fetch_igdb_rom(
         playmatch_rom: PlaymatchRomMatch, hasheous_rom: HasheousRom
@@ -378,6 +644,9 @@ async def scan_rom(
 
                 return await meta_igdb_handler.get_rom_by_id(playmatch_rom["igdb_id"])
 
+            if resolved_locally:
+                return IGDBRom(igdb_id=None)
+
             # If no matches found, use the file name to get the IGDB ID
             main_platform_igdb_id = await _get_main_platform_igdb_id(platform)
             return await meta_igdb_handler.get_rom(
@@ -390,6 +659,7 @@ async def scan_rom(
         if (
             MetadataSource.MOBY in metadata_sources
             and platform.moby_id
+            and not resolved_locally
             and (
                 newly_added
                 or scan_type == ScanType.COMPLETE
@@ -407,6 +677,7 @@ async def scan_rom(
         if (
             MetadataSource.SS in metadata_sources
             and platform.ss_id
+            and not resolved_locally
             and (
                 newly_added
                 or scan_type == ScanType.COMPLETE
@@ -461,34 +732,17 @@ async def scan_rom(
 
         return RAGameRom(ra_id=None)
 
-    async def fetch_hasheous_rom(hasheous_rom: HasheousRom) -> HasheousRom:
-        if (
-            MetadataSource.HASHEOUS in metadata_sources
-            and platform.hasheous_id
-            and (
-                newly_added
-                or scan_type == ScanType.COMPLETE
-                or (scan_type == ScanType.PARTIAL and not rom.hasheous_id)
-                or (scan_type == ScanType.UNIDENTIFIED and rom.is_unidentified)
-            )
-        ):
-            (
-                igdb_game,
-                ra_game,
-            ) = await asyncio.gather(
-                meta_hasheous_handler.get_igdb_game(hasheous_rom),
-                meta_hasheous_handler.get_ra_game(hasheous_rom),
-            )
+    # Offline metadata can be looked up first, remote name searches are then only
+    # needed when it has no match for the rom
+    local_launchbox_rom: LaunchboxRom | None = None
+    if SCAN_LOCAL_METADATA_FIRST:
+        local_launchbox_rom = await fetch_launchbox_rom(platform.slug)
+        resolved_locally = bool(local_launchbox_rom.get("launchbox_id"))
 
-            return HasheousRom(
-                {
-                    **hasheous_rom,
-                    **ra_game,
-                    **igdb_game,
-                }
-            )
-
-        return HasheousRom(hasheous_id=None, igdb_id=None, tgdb_id=None, ra_id=None)
+    async def fetch_launchbox_rom_concurrently() -> LaunchboxRom:
+        if local_launchbox_rom is not None:
+            return local_launchbox_rom
+        return await fetch_launchbox_rom(platform.slug)
 
     # Run metadata fetches concurrently
     (
@@ -497,15 +751,16 @@ async def scan_rom(
         ss_handler_rom,
         ra_handler_rom,
         launchbox_handler_rom,
-        hasheous_handler_rom,
     ) = await asyncio.gather(
-        fetch_igdb_rom(playmatch_hash_match, hasheous_hash_match),
+        fetch_igdb_rom(
+            hash_matches["playmatch_rom"], hash_matches["hasheous_hash_match"]
+        ),
         fetch_moby_rom(),
         fetch_ss_rom(),
-        fetch_ra_rom(hasheous_hash_match),
-        fetch_launchbox_rom(platform.slug),
-        fetch_hasheous_rom(hasheous_hash_match),
+        fetch_ra_rom(hash_matches["hasheous_hash_match"]),
+        fetch_launchbox_rom_concurrently(),
     )
+    hasheous_handler_rom = hash_matches["hasheous_rom"]
 
     # Only update fields if match is found
     if launchbox_handler_rom.get("launchbox_id"):
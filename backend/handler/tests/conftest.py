@@ -11,6 +11,7 @@ from handler.database import (
     db_user_handler,
 )
 from models.assets import Save, Screenshot, State
+from models.hash_identification import HashIdentification
 from models.platform import Platform
 from models.rom import Rom
 from models.user import Role, User
@@ -35,6 +36,7 @@ def clear_database():
         s.query(Rom).delete(synchronize_session="evaluate")
         s.query(Platform).delete(synchronize_session="evaluate")
         s.query(User).delete(synchronize_session="evaluate")
+        s.query(HashIdentification).delete(synchronize_session="evaluate")
 
 
 @pytest.fixture
@@ -1,15 +1,18 @@
 from handler.auth import auth_handler
 from handler.database import (
+    db_hash_identification_handler,
     db_platform_handler,
     db_rom_handler,
     db_save_handler,
     db_screenshot_handler,
     db_state_handler,
+    db_stats_handler,
     db_user_handler,
 )
 from models.assets import Save, Screenshot, State
+from models.hash_identification import HashIdentification, HashIdentificationProvider
 from models.platform import Platform
-from models.rom import Rom
+from models.rom import Rom, RomFile
 from models.user import Role, User
 from sqlalchemy.exc import IntegrityError
 
@@ -69,6 +72,112 @@ def test_roms(rom: Rom, platform: Platform):
     assert len(roms) == 1
 
 
+def test_bulk_update_scanned_roms(rom: Rom, platform: Platform):
+    old_rom_file = db_rom_handler.add_rom_file(
+        RomFile(
+            rom_id=rom.id,
+            file_name="old_file.bin",
+            file_path=f"{platform.slug}/roms",
+            file_size_bytes=10,
+        )
+    )
+
+    scanned_rom = Rom(id=rom.id, name="test_rom_scanned", md5_hash="abc")
+    updated_roms = db_rom_handler.bulk_update_scanned_roms(
+        [scanned_rom],
+        [
+            RomFile(
+                rom_id=rom.id,
+                file_name="test_rom.zip",
+                file_path=f"{platform.slug}/roms",
+                file_size_bytes=100,
+            )
+        ],
+    )
+
+    assert len(updated_roms) == 1
+    assert updated_roms[0].name == "test_rom_scanned"
+    assert updated_roms[0].md5_hash == "abc"
+    # Attributes not set on the scanned rom are kept
+    assert updated_roms[0].fs_name == "test_rom.zip"
+    assert [f.file_name for f in updated_roms[0].files] == ["test_rom.zip"]
+    rom_file_id = updated_roms[0].files[0].id
+
+    # Files no longer on the filesystem are kept, but marked as missing, and left
+    # out of lookups and sizes
+    assert db_rom_handler.get_rom_file_by_id(old_rom_file.id) is None
+    assert db_stats_handler.get_total_filesize() == 100
+    assert db_stats_handler.get_platform_filesize(platform.id) == 100
+
+    # Rescanning keeps the ids of existing files, and updates changed fields
+    updated_roms = db_rom_handler.bulk_update_scanned_roms(
+        [Rom(id=rom.id, name="test_rom_scanned", md5_hash="abc")],
+        [
+            RomFile(
+                rom_id=rom.id,
+                file_name="test_rom.zip",
+                file_path=f"{platform.slug}/roms",
+                file_size_bytes=200,
+            )
+        ],
+    )
+    assert [f.id for f in updated_roms[0].files] == [rom_file_id]
+    assert updated_roms[0].files[0].file_size_bytes == 200
+
+
+def test_hash_identifications():
+    provider = HashIdentificationProvider.HASHEOUS
+    db_hash_identification_handler.upsert_identification(
+        HashIdentification(
+            provider=provider,
+            crc_hash="1234abcd",
+            md5_hash=None,
+            sha1_hash=None,
+            matched=False,
+            identified_at=1,
+        )
+    )
+
+    identification = db_hash_identification_handler.get_identification(
+        provider, crc_hash="1234abcd", md5_hash=None, sha1_hash=None
+    )
+    assert identification is not None
+    assert not identification.matched
+
+    db_hash_identification_handler.upsert_identification(
+        HashIdentification(
+            provider=provider,
+            crc_hash="1234abcd",
+            md5_hash="",
+            sha1_hash="",
+            matched=True,
+            hasheous_id=10,
+            igdb_id=20,
+            signatures=["NoIntros"],
+            identified_at=2,
+        )
+    )
+
+    updated_identification = db_hash_identification_handler.get_identification(
+        provider, crc_hash="1234abcd", md5_hash="", sha1_hash=""
+    )
+    assert updated_identification is not None
+    assert updated_identification.id == identification.id
+    assert updated_identification.matched
+    assert updated_identification.igdb_id == 20
+    assert updated_identification.signatures == ["NoIntros"]
+
+    assert (
+        db_hash_identification_handler.get_identification(
+            HashIdentificationProvider.PLAYMATCH,
+            crc_hash="1234abcd",
+            md5_hash=None,
+            sha1_hash=None,
+        )
+        is None
+    )
+
+
 def test_users(admin_user):
     db_user_handler.add_user(
         User(
@@ -24,6 +24,7 @@ from endpoints import (
     heartbeat,
     platform,
     raw,
+    resources,
     rom,
     saves,
     screenshots,
@@ -126,6 +127,7 @@ app.include_router(raw.router, prefix="/api")
 app.include_router(screenshots.router, prefix="/api")
 app.include_router(firmware.router, prefix="/api")
 app.include_router(collections.router, prefix="/api")
+app.include_router(resources.router, prefix="/api")
 
 app.mount("/ws", socket_handler.socket_app)
 
@@ -0,0 +1,52 @@
+import enum
+
+from models.base import BaseModel
+from sqlalchemy import BigInteger, Index, String, Text, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from utils.database import CustomJSON
+
+
+class HashIdentificationProvider(enum.StrEnum):
+    HASHEOUS = "hasheous"
+    PLAYMATCH = "playmatch"
+
+
+class HashIdentification(BaseModel):
+    """Result of identifying a file by its hashes with a hash matching service.
+
+    Unmatched lookups are stored too, so files the service doesn't know about aren't
+    looked up again until they're due for a refresh.
+    """
+
+    __tablename__ = "hash_identifications"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    provider: Mapped[str] = mapped_column(String(length=50))
+
+    # Empty strings instead of NULLs, so the unique constraint applies to all lookups
+    crc_hash: Mapped[str] = mapped_column(String(length=100), default="")
+    md5_hash: Mapped[str] = mapped_column(String(length=100), default="")
+    sha1_hash: Mapped[str] = mapped_column(String(length=100), default="")
+
+    matched: Mapped[bool] = mapped_column(default=False, nullable=False)
+    hasheous_id: Mapped[int | None]
+    igdb_id: Mapped[int | None]
+    ra_id: Mapped[int | None]
+    tgdb_id: Mapped[int | None]
+    name: Mapped[str | None] = mapped_column(String(length=350))
+    url_cover: Mapped[str | None] = mapped_column(Text, default="")
+    signatures: Mapped[list[str] | None] = mapped_column(CustomJSON(), default=list)
+
+    # Unix timestamp of the last lookup, used to decide when to look it up again
+    identified_at: Mapped[int] = mapped_column(BigInteger(), default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "provider",
+            "crc_hash",
+            "md5_hash",
+            "sha1_hash",
+            name="uq_hash_identifications_hashes",
+        ),
+        Index("idx_hash_identifications_igdb_id", "igdb_id"),
+    )
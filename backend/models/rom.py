@@ -204,7 +204,12 @@ class Rom(BaseModel):
         secondaryjoin="Rom.id == SiblingRom.sibling_rom_id",
         lazy="select",
     )
-    files: Mapped[list[RomFile]] = relationship(lazy="select", back_populates="rom")
+    # Files removed from the filesystem are kept in the database, marked as missing
+    files: Mapped[list[RomFile]] = relationship(
+        lazy="select",
+        back_populates="rom",
+        primaryjoin="and_(Rom.id == RomFile.rom_id, RomFile.missing_from_fs.is_(False))",
+    )
     saves: Mapped[list[Save]] = relationship(lazy="select", back_populates="rom")
     states: Mapped[list[State]] = relationship(lazy="select", back_populates="rom")
     screenshots: Mapped[list[Screenshot]] = relationship(
@@ -1,11 +1,13 @@
 import sentry_sdk
 from config import (
+    ENABLE_SCHEDULED_CLEAN_MEDIA_STORE,
     ENABLE_SCHEDULED_RESCAN,
     ENABLE_SCHEDULED_UPDATE_LAUNCHBOX_METADATA,
     ENABLE_SCHEDULED_UPDATE_SWITCH_TITLEDB,
     SENTRY_DSN,
 )
 from logger.logger import log
+from tasks.clean_media_store import clean_media_store_task
 from tasks.scan_library import scan_library_task
 from tasks.tasks import tasks_scheduler
 from tasks.update_launchbox_metadata import update_launchbox_metadata_task
@@ -29,5 +31,9 @@ if __name__ == "__main__":
         log.info("Starting scheduled update launchbox metadata")
         update_launchbox_metadata_task.init()
 
+    if ENABLE_SCHEDULED_CLEAN_MEDIA_STORE:
+        log.info("Starting scheduled clean media store")
+        clean_media_store_task.init()
+
     # Start the scheduler
     tasks_scheduler.run()
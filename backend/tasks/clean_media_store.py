@@ -0,0 +1,31 @@
+from config import (
+    ENABLE_SCHEDULED_CLEAN_MEDIA_STORE,
+    SCHEDULED_CLEAN_MEDIA_STORE_CRON,
+)
+from handler.filesystem.media_store import media_store
+from logger.logger import log
+from tasks.tasks import PeriodicTask
+
+
+class CleanMediaStoreTask(PeriodicTask):
+    def __init__(self):
+        super().__init__(
+            func="tasks.clean_media_store.clean_media_store_task.run",
+            description="media store cleanup",
+            enabled=ENABLE_SCHEDULED_CLEAN_MEDIA_STORE,
+            cron_string=SCHEDULED_CLEAN_MEDIA_STORE_CRON,
+        )
+
+    async def run(self):
+        if not ENABLE_SCHEDULED_CLEAN_MEDIA_STORE:
+            log.info("Scheduled media store cleanup not enabled, unscheduling...")
+            self.unschedule()
+            return
+
+        log.info("Scheduled media store cleanup started...")
+        # Media of removed roms, or replaced by a scan, is no longer linked
+        await media_store.remove_unreferenced()
+        log.info("Scheduled media store cleanup done")
+
+
+clean_media_store_task = CleanMediaStoreTask()
@@ -1,16 +1,51 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
 from abc import ABC, abstractmethod
-from typing import Any
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+from typing import Any, Final, NotRequired, TypedDict
 
 import httpx
 from exceptions.task_exceptions import SchedulerException
-from handler.redis_handler import low_prio_queue
+from handler.redis_handler import async_cache, low_prio_queue
 from logger.logger import log
+from redis.exceptions import WatchError
 from rq.job import Job
 from rq_scheduler import Scheduler
 from utils.context import ctx_httpx_client
 
 tasks_scheduler = Scheduler(queue=low_prio_queue, connection=low_prio_queue.connection)
 
+# Remote files are kept on disk until imported, so interrupted downloads can resume
+REMOTE_FILES_DOWNLOAD_PATH: Final = os.path.join(
+    tempfile.gettempdir(), "romm", "remote_files"
+)
+REMOTE_FILES_STATE_KEY: Final = "romm:remote_files_state"
+DOWNLOAD_CHUNK_SIZE: Final = 1024 * 1024
+# Pulls of a remote file are serialised across workers, a lock left behind by a
+# crashed worker expires on its own
+REMOTE_FILES_LOCK_EXPIRATION: Final = 60 * 60
+REMOTE_FILES_LOCK_POLL_INTERVAL: Final = 1.0
+
+
+def get_remote_file_lock_key(func: str) -> str:
+    return f"romm:remote_files_lock:{func}"
+
+
+class RemoteFileState(TypedDict):
+    url: str
+    # Validators of the last imported version of the remote file
+    etag: NotRequired[str]
+    last_modified: NotRequired[str]
+    imported_at: NotRequired[float]
+    # Validators of the version being downloaded, used to resume the download
+    download_etag: NotRequired[str]
+    download_last_modified: NotRequired[str]
+
 
 class PeriodicTask(ABC):
     def __init__(
@@ -77,20 +112,209 @@ class RemoteFilePullTask(PeriodicTask):
         super().__init__(*args, **kwargs)
         self.url = url
 
-    async def run(self, force: bool = False) -> bytes | None:
+        self._lock: asyncio.Lock | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _should_run(self, force: bool) -> bool:
         if not self.enabled and not force:
             log.info(f"Scheduled {self.description} not enabled, unscheduling...")
             self.unschedule()
-            return None
+            return False
 
         log.info(f"Scheduled {self.description} started...")
+        return True
+
+    @property
+    def download_path(self) -> str:
+        return os.path.join(REMOTE_FILES_DOWNLOAD_PATH, self.func)
+
+    async def _get_state(self) -> RemoteFileState:
+        state = await async_cache.hget(REMOTE_FILES_STATE_KEY, self.func)
+        if state:
+            state = json.loads(state)
+            # Validators of a previous URL don't apply to the current one
+            if state.get("url") == self.url:
+                return state
+
+        return RemoteFileState(url=self.url)
+
+    async def _set_state(self, state: RemoteFileState) -> None:
+        await async_cache.hset(REMOTE_FILES_STATE_KEY, self.func, json.dumps(state))
+
+    def _get_imported_state(self, state: RemoteFileState) -> RemoteFileState:
+        imported_state = RemoteFileState(url=self.url)
+        if "etag" in state:
+            imported_state["etag"] = state["etag"]
+        if "last_modified" in state:
+            imported_state["last_modified"] = state["last_modified"]
+        if "imported_at" in state:
+            imported_state["imported_at"] = state["imported_at"]
+        return imported_state
+
+    async def get_imported_at(self) -> float | None:
+        """Return when the remote file was last imported, if it ever was."""
+        return (await self._get_state()).get("imported_at")
+
+    def _get_lock(self) -> asyncio.Lock:
+        # Asyncio primitives are bound to the event loop they're first used in
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    @asynccontextmanager
+    async def _lock_pulls(self) -> AsyncIterator[None]:
+        """Hold the lock on pulls of the remote file, in this worker and in Redis."""
+        lock_key = get_remote_file_lock_key(self.func)
+        token = uuid.uuid4().hex
+
+        async with self._get_lock():
+            while not await async_cache.set(
+                lock_key, token, nx=True, ex=REMOTE_FILES_LOCK_EXPIRATION
+            ):
+                await asyncio.sleep(REMOTE_FILES_LOCK_POLL_INTERVAL)
+
+            try:
+                yield
+            finally:
+                # The lock is only released if it didn't expire and go to another pull
+                async with async_cache.pipeline() as pipe:
+                    with suppress(WatchError):
+                        await pipe.watch(lock_key)
+                        lock_token = await pipe.get(lock_key)
+                        if lock_token in (token, token.encode()):
+                            pipe.multi()
+                            await pipe.delete(lock_key)
+                            await pipe.execute()
+
+    @asynccontextmanager
+    async def pull(self, force: bool = False) -> AsyncIterator[str | None]:
+        """Download the remote file to disk, and yield its path.
+
+        The file is streamed to disk in chunks. An interrupted download is resumed with
+        a range request on the next run, as long as the remote file didn't change.
+        Unless forced, the file is requested conditionally, and None is yielded when it
+        didn't change since it was last imported.
+
+        The file counts as imported once the block exits without raising, and is then
+        deleted.
+
+        Pulls of the same remote file are run one at a time, across workers. A pull
+        waiting for another one to import the file yields None once it's imported.
+        """
+        if not self._should_run(force):
+            yield None
+            return
+
+        requested_at = time.time()
+        async with self._lock_pulls():
+            state = await self._get_state()
+            if state.get("imported_at", 0) >= requested_at:
+                log.info(f"Scheduled {self.description} skipped, imported meanwhile")
+                yield None
+                return
+
+            # Each pull imports its own copy of the file
+            download_path = f"{self.download_path}.{uuid.uuid4().hex}"
+            try:
+                downloaded_state = await self._download(
+                    state, conditional=not force, download_path=download_path
+                )
+            except (httpx.HTTPError, OSError) as e:
+                log.error(f"Scheduled {self.description} failed", exc_info=True)
+                log.error(e)
+                yield None
+                return
+
+            if downloaded_state is None:
+                log.info(
+                    f"Scheduled {self.description} skipped, remote file unchanged"
+                )
+                yield None
+                return
+
+            try:
+                yield download_path
+
+                imported_state = RemoteFileState(
+                    url=self.url, imported_at=time.time()
+                )
+                if "download_etag" in downloaded_state:
+                    imported_state["etag"] = downloaded_state["download_etag"]
+                if "download_last_modified" in downloaded_state:
+                    imported_state["last_modified"] = downloaded_state[
+                        "download_last_modified"
+                    ]
+                await self._set_state(imported_state)
+            finally:
+                with suppress(FileNotFoundError):
+                    os.remove(download_path)
+
+    async def _download(
+        self, state: RemoteFileState, conditional: bool, download_path: str
+    ) -> RemoteFileState | None:
+        """Download the remote file, and return the state of the downloaded version.
+
+        Returns None if the remote file didn't change since it was last imported.
+        The partial download is kept under a fixed name to be resumed, which only a
+        pull holding the lock writes to.
+        """
+        os.makedirs(REMOTE_FILES_DOWNLOAD_PATH, exist_ok=True)
+        partial_path = f"{self.download_path}.part"
+
+        headers: dict[str, str] = {}
+        if conditional and "etag" in state:
+            headers["If-None-Match"] = state["etag"]
+        if conditional and "last_modified" in state:
+            headers["If-Modified-Since"] = state["last_modified"]
+
+        # Weak ETags can't be used to resume a download
+        download_etag = state.get("download_etag", "")
+        resume_validator = (
+            download_etag
+            if download_etag and not download_etag.startswith("W/")
+            else state.get("download_last_modified")
+        )
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        if offset and resume_validator:
+            headers["Range"] = f"bytes={offset}-"
+            # The whole file is sent instead if it changed since the partial download
+            headers["If-Range"] = resume_validator
 
         httpx_client = ctx_httpx_client.get()
-        try:
-            response = await httpx_client.get(self.url, timeout=120)
-            response.raise_for_status()
-            return response.content
-        except httpx.HTTPError as e:
-            log.error(f"Scheduled {self.description} failed", exc_info=True)
-            log.error(e)
-            return None
+        async with httpx_client.stream(
+            "GET", self.url, headers=headers, timeout=120
+        ) as response:
+            if response.status_code == httpx.codes.NOT_MODIFIED:
+                return None
+
+            if response.status_code == httpx.codes.REQUESTED_RANGE_NOT_SATISFIABLE:
+                restart = True
+            else:
+                restart = False
+                response.raise_for_status()
+
+                download_state = self._get_imported_state(state)
+                if "ETag" in response.headers:
+                    download_state["download_etag"] = response.headers["ETag"]
+                if "Last-Modified" in response.headers:
+                    download_state["download_last_modified"] = response.headers[
+                        "Last-Modified"
+                    ]
+                await self._set_state(download_state)
+
+                resumed = response.status_code == httpx.codes.PARTIAL_CONTENT
+                with open(partial_path, "ab" if resumed else "wb") as f:
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+
+        if restart:
+            # The partial download is unusable, start over
+            os.remove(partial_path)
+            return await self._download(
+                self._get_imported_state(state), conditional, download_path
+            )
+
+        os.replace(partial_path, download_path)
+        return download_state
@@ -0,0 +1,32 @@
+from collections.abc import AsyncIterator, Callable
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from pathlib import Path
+
+import pytest
+
+PullFactory = Callable[
+    [bytes | None], Callable[[bool], AbstractAsyncContextManager[str | None]]
+]
+
+
+@pytest.fixture
+def pull_content(tmp_path: Path) -> PullFactory:
+    """Build a replacement for RemoteFilePullTask.pull, yielding a file with the
+    given content, or None when there is no content"""
+
+    def factory(
+        content: bytes | None,
+    ) -> Callable[[bool], AbstractAsyncContextManager[str | None]]:
+        @asynccontextmanager
+        async def pull(force: bool = False) -> AsyncIterator[str | None]:
+            if content is None:
+                yield None
+                return
+
+            remote_file = tmp_path / "remote_file"
+            remote_file.write_bytes(content)
+            yield str(remote_file)
+
+        return pull
+
+    return factory
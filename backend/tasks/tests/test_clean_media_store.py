@@ -0,0 +1,37 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from tasks.clean_media_store import CleanMediaStoreTask
+
+
+class TestCleanMediaStoreTask:
+    @pytest.fixture
+    def task(self):
+        return CleanMediaStoreTask()
+
+    def test_init(self, task):
+        """Test task initialization"""
+        assert task.func == "tasks.clean_media_store.clean_media_store_task.run"
+        assert task.description == "media store cleanup"
+
+    @patch("tasks.clean_media_store.ENABLE_SCHEDULED_CLEAN_MEDIA_STORE", True)
+    @patch("tasks.clean_media_store.media_store")
+    async def test_run_enabled(self, mock_media_store, task):
+        """Test run when the scheduled cleanup is enabled"""
+        mock_media_store.remove_unreferenced = AsyncMock()
+
+        await task.run()
+
+        mock_media_store.remove_unreferenced.assert_awaited_once()
+
+    @patch("tasks.clean_media_store.ENABLE_SCHEDULED_CLEAN_MEDIA_STORE", False)
+    @patch("tasks.clean_media_store.media_store")
+    async def test_run_disabled(self, mock_media_store, task):
+        """Test run when the scheduled cleanup is disabled"""
+        mock_media_store.remove_unreferenced = AsyncMock()
+        task.unschedule = MagicMock()
+
+        await task.run()
+
+        task.unschedule.assert_called_once()
+        mock_media_store.remove_unreferenced.assert_not_awaited()
@@ -1,10 +1,19 @@
-from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+import json
+from unittest.mock import MagicMock, patch
 
 import httpx
 import pytest
 from exceptions.task_exceptions import SchedulerException
+from handler.redis_handler import async_cache
 from rq.job import Job
-from tasks.tasks import PeriodicTask, RemoteFilePullTask, tasks_scheduler
+from tasks.tasks import (
+    REMOTE_FILES_STATE_KEY,
+    PeriodicTask,
+    RemoteFilePullTask,
+    get_remote_file_lock_key,
+    tasks_scheduler,
+)
 
 
 class ConcretePeriodicTask(PeriodicTask):
@@ -14,6 +23,17 @@ class ConcretePeriodicTask(PeriodicTask):
         return "test_result"
 
 
+class ConcreteRemoteFilePullTask(RemoteFilePullTask):
+    """Remote file task returning the content of the pulled file"""
+
+    async def run(self, force: bool = False) -> bytes | None:
+        async with self.pull(force) as path:
+            if path is None:
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+
+
 class TestPeriodicTask:
     @pytest.fixture
     def task(self):
@@ -192,7 +212,7 @@ class TestPeriodicTask:
 class TestRemoteFilePullTask:
     @pytest.fixture
     def task(self):
-        return RemoteFilePullTask(
+        return ConcreteRemoteFilePullTask(
             func="test.remote.function",
             description="remote test task",
             enabled=True,
@@ -202,7 +222,7 @@ class TestRemoteFilePullTask:
 
     @pytest.fixture
     def disabled_task(self):
-        return RemoteFilePullTask(
+        return ConcreteRemoteFilePullTask(
             func="test.remote.disabled.function",
             description="disabled remote task",
             enabled=False,
@@ -216,62 +236,6 @@ class TestRemoteFilePullTask:
         assert task.enabled is True
         assert task.url == "https://example.com/data.json"
 
-    @patch("tasks.tasks.ctx_httpx_client")
-    @patch("tasks.tasks.log")
-    async def test_run_success(self, mock_log, mock_ctx_httpx_client, task):
-        """Test successful remote file pull"""
-        mock_client = AsyncMock()
-        mock_response = AsyncMock()
-        mock_response.content = b"test content"
-        mock_client.get.return_value = mock_response
-        mock_ctx_httpx_client.get.return_value = mock_client
-
-        result = await task.run(force=True)
-
-        mock_client.get.assert_called_once_with(
-            "https://example.com/data.json", timeout=120
-        )
-        mock_response.raise_for_status.assert_called_once()
-        mock_log.info.assert_called_once_with("Scheduled remote test task started...")
-        assert result == b"test content"
-
-    @patch("tasks.tasks.ctx_httpx_client")
-    @patch("tasks.tasks.log")
-    async def test_run_http_error(self, mock_log, mock_ctx_httpx_client, task):
-        """Test handling of HTTP errors"""
-        mock_client = AsyncMock()
-        mock_client.get.side_effect = httpx.HTTPError("Connection failed")
-        mock_ctx_httpx_client.get.return_value = mock_client
-
-        result = await task.run(force=True)
-
-        mock_log.error.assert_called()
-        assert result is None
-
-    @patch("tasks.tasks.ctx_httpx_client")
-    @patch("tasks.tasks.log")
-    async def test_run_response_error(self, mock_log, mock_ctx_httpx_client, task):
-        """Test handling of response status errors"""
-        mock_client = AsyncMock()
-        mock_response = MagicMock()
-
-        # Create a proper HTTPStatusError
-        http_error = httpx.HTTPStatusError(
-            "404 Not Found", request=MagicMock(), response=MagicMock()
-        )
-        mock_response.raise_for_status.side_effect = http_error
-        mock_client.get.return_value = mock_response
-        mock_ctx_httpx_client.get.return_value = mock_client
-
-        result = await task.run(force=True)
-
-        # Verify the specific error logging calls
-        mock_log.error.assert_any_call(
-            "Scheduled remote test task failed", exc_info=True
-        )
-        mock_log.error.assert_any_call(http_error)
-        assert result is None
-
     @patch.object(RemoteFilePullTask, "unschedule")
     @patch("tasks.tasks.log")
     async def test_run_disabled_not_forced(
@@ -286,15 +250,111 @@ class TestRemoteFilePullTask:
         mock_unschedule.assert_called_once()
         assert result is None
 
-    @patch("tasks.tasks.ctx_httpx_client")
-    async def test_run_disabled_but_forced(self, mock_ctx_httpx_client, disabled_task):
-        """Test run when task is disabled but forced"""
-        mock_client = AsyncMock()
-        mock_response = AsyncMock()
-        mock_response.content = b"forced content"
-        mock_client.get.return_value = mock_response
-        mock_ctx_httpx_client.get.return_value = mock_client
 
-        result = await disabled_task.run(force=True)
+class TestRemoteFilePullTaskPull:
+    @pytest.fixture
+    def task(self):
+        return ConcreteRemoteFilePullTask(
+            func="test.remote.function",
+            description="remote test task",
+            enabled=True,
+            url="https://example.com/data.json",
+        )
+
+    @pytest.fixture(autouse=True)
+    async def download_path(self, tmp_path):
+        with patch("tasks.tasks.REMOTE_FILES_DOWNLOAD_PATH", str(tmp_path)):
+            yield tmp_path
+        await async_cache.delete(REMOTE_FILES_STATE_KEY)
+
+    @pytest.fixture
+    def requests(self):
+        return []
+
+    @pytest.fixture
+    def serve(self, requests):
+        """Serve the remote file through a mocked HTTP transport"""
+
+        def serve_responses(respond):
+            def handler(request: httpx.Request) -> httpx.Response:
+                requests.append(request)
+                return respond(request)
+
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            return patch("tasks.tasks.ctx_httpx_client", get=lambda: client)
+
+        return serve_responses
+
+    async def test_pull_skips_unchanged_file(self, task, serve, requests):
+        def respond(request: httpx.Request) -> httpx.Response:
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, content=b"content", headers={"ETag": '"v1"'})
+
+        with serve(respond):
+            async with task.pull() as path:
+                assert path is not None
+                with open(path, "rb") as f:
+                    assert f.read() == b"content"
+
+            async with task.pull() as path:
+                assert path is None
+
+            # Forced pulls always download the file
+            async with task.pull(force=True) as path:
+                assert path is not None
+
+        assert requests[1].headers["If-None-Match"] == '"v1"'
+        assert "If-None-Match" not in requests[2].headers
+
+    async def test_pull_resumes_partial_download(
+        self, task, serve, requests, download_path
+    ):
+        await async_cache.hset(
+            REMOTE_FILES_STATE_KEY,
+            task.func,
+            json.dumps({"url": task.url, "download_etag": '"v1"'}),
+        )
+        (download_path / f"{task.func}.part").write_bytes(b"partial ")
+
+        def respond(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(206, content=b"content", headers={"ETag": '"v1"'})
+
+        with serve(respond):
+            async with task.pull() as path:
+                assert path is not None
+                with open(path, "rb") as f:
+                    assert f.read() == b"partial content"
+
+        assert requests[0].headers["Range"] == "bytes=8-"
+        assert requests[0].headers["If-Range"] == '"v1"'
+
+    async def test_pull_failed_import_not_recorded(self, task, serve, requests):
+        def respond(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=b"content", headers={"ETag": '"v1"'})
+
+        with serve(respond):
+            with pytest.raises(ValueError):
+                async with task.pull():
+                    raise ValueError("Import failed")
+            assert await task.get_imported_at() is None
+
+            async with task.pull() as path:
+                assert path is not None
+            assert await task.get_imported_at() is not None
+
+        assert "If-None-Match" not in requests[1].headers
+
+    async def test_concurrent_pulls_download_once(self, task, serve, requests):
+        def respond(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=b"content", headers={"ETag": '"v1"'})
+
+        with serve(respond):
+            contents = await asyncio.gather(
+                task.run(force=True), task.run(force=True), task.run(force=True)
+            )
 
-        assert result == b"forced content"
+        # The pulls waiting for the first one find the file imported meanwhile
+        assert sorted(contents, key=bool) == [None, None, b"content"]
+        assert len(requests) == 1
+        assert not await async_cache.exists(get_remote_file_lock_key(task.func))
@@ -1,8 +1,14 @@
+import io
+import json
 import os
+import time
+import zipfile
 from unittest.mock import AsyncMock, patch
 
 import anyio
 import pytest
+from handler.metadata.launchbox_handler import LaunchboxHandler
+from handler.redis_handler import async_cache
 from tasks.tasks import RemoteFilePullTask
 from tasks.update_launchbox_metadata import (
     LAUNCHBOX_FILES_KEY,
@@ -16,6 +22,13 @@ from tasks.update_launchbox_metadata import (
     update_launchbox_metadata_task,
 )
 
+LAUNCHBOX_METADATA_KEYS = (
+    LAUNCHBOX_METADATA_DATABASE_ID_KEY,
+    LAUNCHBOX_METADATA_NAME_KEY,
+    LAUNCHBOX_METADATA_ALTERNATE_NAME_KEY,
+    LAUNCHBOX_METADATA_IMAGE_KEY,
+)
+
 
 @pytest.fixture
 def task() -> UpdateLaunchboxMetadataTask:
@@ -50,16 +63,16 @@ class TestUpdateLaunchboxMetadataTask:
         assert task.description == "launchbox metadata update"
         assert task.url == "https://gamesdb.launchbox-app.com/Metadata.zip"
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     async def test_run_when_launchbox_api_enabled(
-        self, mock_super_run, task, sample_zip_content
+        self, mock_pull, task, sample_zip_content, pull_content
     ):
         """Test run method when Launchbox API is enabled"""
-        mock_super_run.return_value = sample_zip_content
+        mock_pull.side_effect = pull_content(sample_zip_content)
 
         await task.run(force=True)
 
-        mock_super_run.assert_called_once_with(True)
+        mock_pull.assert_called_once_with(True)
 
     @patch("tasks.update_launchbox_metadata.LAUNCHBOX_API_ENABLED", False)
     @patch("tasks.update_launchbox_metadata.log")
@@ -71,27 +84,29 @@ class TestUpdateLaunchboxMetadataTask:
             "Launchbox API is not enabled, skipping metadata update"
         )
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     @patch("tasks.update_launchbox_metadata.log")
-    async def test_run_when_content_is_none(self, mock_log, mock_super_run, task):
-        """Test run method when super().run() returns None"""
-        mock_super_run.return_value = None
+    async def test_run_when_content_is_none(
+        self, mock_log, mock_pull, task, pull_content
+    ):
+        """Test run method when no remote file is pulled"""
+        mock_pull.side_effect = pull_content(None)
 
         await task.run(force=True)
 
-        mock_super_run.assert_called_once()
+        mock_pull.assert_called_once()
 
         mock_log.warning.assert_called_once_with(
             "No content received from launchbox metadata update"
         )
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     @patch("tasks.update_launchbox_metadata.log")
     async def test_run_with_corrupt_zip_file(
-        self, mock_log, mock_super_run, task, corrupt_zip_content
+        self, mock_log, mock_pull, task, corrupt_zip_content, pull_content
     ):
         """Test run method with corrupt ZIP file"""
-        mock_super_run.return_value = corrupt_zip_content
+        mock_pull.side_effect = pull_content(corrupt_zip_content)
 
         await task.run(force=True)
 
@@ -99,13 +114,13 @@ class TestUpdateLaunchboxMetadataTask:
             "Bad zip file in launchbox metadata update"
         )
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     @patch("tasks.update_launchbox_metadata.log")
     async def test_run_successful_completion(
-        self, mock_log, mock_super_run, task, sample_zip_content
+        self, mock_log, mock_pull, task, sample_zip_content, pull_content
     ):
         """Test successful completion of the task"""
-        mock_super_run.return_value = sample_zip_content
+        mock_pull.side_effect = pull_content(sample_zip_content)
 
         await task.run(force=True)
 
@@ -113,17 +128,18 @@ class TestUpdateLaunchboxMetadataTask:
             "Scheduled launchbox metadata update completed!"
         )
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     @patch("tasks.update_launchbox_metadata.async_cache.pipeline")
     async def test_xml_parsing(
         self,
         mock_async_cache_pipeline,
-        mock_super_run,
+        mock_pull,
         task,
         sample_zip_content,
+        pull_content,
     ):
         """Test parsing of Platforms.xml file"""
-        mock_super_run.return_value = sample_zip_content
+        mock_pull.side_effect = pull_content(sample_zip_content)
 
         # Create a mock pipeline with async context manager support
         mock_pipe = AsyncMock()
@@ -177,13 +193,14 @@ class TestUpdateLaunchboxMetadataTask:
         files_calls = [call for call in hset_calls if call[0][0] == LAUNCHBOX_FILES_KEY]
         assert len(files_calls) == 2
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     @patch("tasks.update_launchbox_metadata.async_cache.pipeline")
     async def test_empty_xml_elements_handling(
         self,
         mock_async_cache_pipeline,
-        mock_super_run,
+        mock_pull,
         task,
+        pull_content,
     ):
         """Test handling of XML elements with empty or missing text"""
         test_dir = os.path.dirname(__file__)
@@ -192,7 +209,7 @@ class TestUpdateLaunchboxMetadataTask:
         )
 
         async with await anyio.open_file(sample_path, "rb") as f:
-            mock_super_run.return_value = await f.read()
+            mock_pull.side_effect = pull_content(await f.read())
 
         # Create a mock pipeline with async context manager support
         mock_pipe = AsyncMock()
@@ -216,13 +233,14 @@ class TestUpdateLaunchboxMetadataTask:
         # Only one valid platform should be processed
         assert len(platform_calls) == 1
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     @patch("tasks.update_launchbox_metadata.async_cache.pipeline")
     async def test_missing_xml_files_handling(
         self,
         mock_async_cache_pipeline,
-        mock_super_run,
+        mock_pull,
         task,
+        pull_content,
     ):
         """Test handling when some XML files are missing from the ZIP"""
         test_dir = os.path.dirname(__file__)
@@ -231,7 +249,7 @@ class TestUpdateLaunchboxMetadataTask:
         )
 
         async with await anyio.open_file(sample_path, "rb") as f:
-            mock_super_run.return_value = await f.read()
+            mock_pull.side_effect = pull_content(await f.read())
 
         # Create a mock pipeline with async context manager support
         mock_pipe = AsyncMock()
@@ -252,15 +270,13 @@ class TestUpdateLaunchboxMetadataTask:
     def test_redis_keys_are_defined(self):
         """Test that all Redis keys are properly defined"""
         assert LAUNCHBOX_PLATFORMS_KEY == "romm:launchbox_platforms"
-        assert (
-            LAUNCHBOX_METADATA_DATABASE_ID_KEY == "romm:launchbox_metadata_database_id"
-        )
-        assert LAUNCHBOX_METADATA_NAME_KEY == "romm:launchbox_metadata_name"
+        assert LAUNCHBOX_METADATA_DATABASE_ID_KEY == "romm:launchbox_games"
+        assert LAUNCHBOX_METADATA_NAME_KEY == "romm:launchbox_game_names"
         assert (
             LAUNCHBOX_METADATA_ALTERNATE_NAME_KEY
-            == "romm:launchbox_metadata_alternate_name"
+            == "romm:launchbox_game_alternate_names"
         )
-        assert LAUNCHBOX_METADATA_IMAGE_KEY == "romm:launchbox_metadata_image"
+        assert LAUNCHBOX_METADATA_IMAGE_KEY == "romm:launchbox_game_images"
         assert LAUNCHBOX_MAME_KEY == "romm:launchbox_mame"
         assert LAUNCHBOX_FILES_KEY == "romm:launchbox_files"
 
@@ -276,13 +292,18 @@ class TestUpdateLaunchboxMetadataTaskIntegration:
     def task(self):
         return UpdateLaunchboxMetadataTask()
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     @patch("tasks.update_launchbox_metadata.async_cache.pipeline")
     async def test_full_workflow_integration(
-        self, mock_async_cache_pipeline, mock_super_run, task, sample_zip_content
+        self,
+        mock_async_cache_pipeline,
+        mock_pull,
+        task,
+        sample_zip_content,
+        pull_content,
     ):
         """Test the complete workflow from ZIP download to Redis storage"""
-        mock_super_run.return_value = sample_zip_content
+        mock_pull.side_effect = pull_content(sample_zip_content)
 
         # Create a mock pipeline with async context manager support
         mock_pipe = AsyncMock()
@@ -314,3 +335,131 @@ class TestUpdateLaunchboxMetadataTaskIntegration:
             assert (
                 expected_key in redis_keys_used
             ), f"Expected key {expected_key} not found in Redis operations"
+
+
+def build_metadata_zip(games: list[dict], images: list[dict]) -> bytes:
+    def to_xml(tag: str, entry: dict) -> str:
+        children = "".join(f"<{key}>{value}</{key}>" for key, value in entry.items())
+        return f"<{tag}>{children}</{tag}>"
+
+    metadata = "".join(
+        [to_xml("Game", game) for game in games]
+        + [to_xml("GameImage", image) for image in images]
+    )
+
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, "w") as z:
+        z.writestr("Metadata.xml", f"<LaunchBox>{metadata}</LaunchBox>")
+    return content.getvalue()
+
+
+class TestLaunchboxMetadataStore:
+    """Tests for the metadata stored by UpdateLaunchboxMetadataTask"""
+
+    @pytest.fixture(autouse=True)
+    async def clear_metadata(self):
+        yield
+        await async_cache.delete(*LAUNCHBOX_METADATA_KEYS)
+
+    @patch.object(RemoteFilePullTask, "pull")
+    async def test_lookup_by_normalized_name(
+        self, mock_pull, task, sample_zip_content, pull_content
+    ):
+        mock_pull.side_effect = pull_content(sample_zip_content)
+
+        await task.run(force=True)
+
+        handler = LaunchboxHandler()
+        entry = await handler._get_rom_from_metadata("super mario 64", "n64")
+        assert entry == {
+            "DatabaseID": "12345",
+            "Name": "Super Mario 64",
+            "ReleaseDate": "1996-06-23",
+        }
+
+        entry = await handler._get_rom_from_metadata("Super Mario 64 USA", "n64")
+        assert entry is not None
+        assert entry["DatabaseID"] == "12345"
+
+        assert await handler._get_game_images("12345") == [
+            {"FileName": "super_mario_64.jpg", "Type": "Cover"},
+            {"FileName": "super_mario_64_screenshot.jpg", "Type": "Screenshot"},
+        ]
+
+    @patch.object(RemoteFilePullTask, "pull")
+    async def test_memory_and_lookup_latency(self, mock_pull, task, pull_content):
+        """Benchmark the stored metadata size against the previous full JSON
+        documents, and the time taken to look a game up"""
+        game_count = 2000
+        games = [
+            {
+                "Name": f"Game {i}: The Sequel",
+                "ReleaseYear": "1999",
+                "ReleaseDate": "1999-01-01T00:00:00-08:00",
+                "Overview": "A game about games. " * 30,
+                "MaxPlayers": "2",
+                "ReleaseType": "Released",
+                "Cooperative": "false",
+                "VideoURL": f"https://www.youtube.com/watch?v={i}",
+                "DatabaseID": str(i),
+                "CommunityRating": "3.5",
+                "Platform": "Nintendo 64",
+                "ESRB": "E - Everyone",
+                "CommunityRatingCount": "10",
+                "Genres": "Platform",
+                "Developer": "Developer",
+                "Publisher": "Publisher",
+                "WikipediaURL": f"https://en.wikipedia.org/wiki/Game_{i}",
+                "DOS": "false",
+                "StartupFile": "",
+                "StartupMD5": "",
+                "SetupFile": "",
+                "SetupMD5": "",
+                "StartupParameters": "",
+            }
+            for i in range(game_count)
+        ]
+        images = [
+            {
+                "DatabaseID": str(i),
+                "FileName": f"{i}-{image_type}.jpg",
+                "Type": image_type,
+                "Region": "North America",
+                "CRC32": "12345678",
+            }
+            for i in range(game_count)
+            for image_type in ("Box - Front", "Screenshot - Gameplay")
+        ]
+        mock_pull.side_effect = pull_content(build_metadata_zip(games, images))
+
+        await task.run(force=True)
+
+        # Games used to be stored twice, by database ID and by name and platform
+        legacy_size = sum(
+            2 * len(json.dumps({key: value or None for key, value in game.items()}))
+            + len(game["DatabaseID"])
+            + len(f"{game['Name']}:{game['Platform']}")
+            for game in games
+        ) + sum(
+            len(str(i)) + len(json.dumps(images[i * 2 : i * 2 + 2]))
+            for i in range(game_count)
+        )
+        stored_size = 0
+        for key in LAUNCHBOX_METADATA_KEYS:
+            for field, value in (await async_cache.hgetall(key)).items():
+                stored_size += len(field) + len(value)
+
+        assert stored_size < legacy_size / 2, (stored_size, legacy_size)
+
+        handler = LaunchboxHandler()
+        lookups = 200
+        start = time.perf_counter()
+        for i in range(lookups):
+            entry = await handler._get_rom_from_metadata(
+                f"Game {i} - The Sequel", "n64"
+            )
+            assert entry is not None
+            assert entry["DatabaseID"] == str(i)
+        latency = (time.perf_counter() - start) / lookups
+
+        assert latency < 0.01, f"{latency * 1000:.2f}ms per lookup"
@@ -1,15 +1,28 @@
 import json
+from itertools import batched
 from unittest.mock import AsyncMock, patch
 
 import pytest
 from tasks.tasks import RemoteFilePullTask
+from handler.redis_handler import async_cache
 from tasks.update_switch_titledb import (
+    SWITCH_PRODUCT_ID_HASHES_KEY,
     SWITCH_PRODUCT_ID_KEY,
+    SWITCH_TITLEDB_HASHES_KEY,
     SWITCH_TITLEDB_INDEX_KEY,
     UpdateSwitchTitleDBTask,
+    _stage_index,
+    get_staging_key,
     update_switch_titledb_task,
 )
 
+SWITCH_TITLEDB_KEYS = (
+    SWITCH_TITLEDB_INDEX_KEY,
+    SWITCH_TITLEDB_HASHES_KEY,
+    SWITCH_PRODUCT_ID_KEY,
+    SWITCH_PRODUCT_ID_HASHES_KEY,
+)
+
 
 class TestUpdateSwitchTitleDBTask:
     @pytest.fixture
@@ -60,17 +73,18 @@ class TestUpdateSwitchTitleDBTask:
             == "https://raw.githubusercontent.com/blawar/titledb/master/US.en.json"
         )
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     @patch("tasks.update_switch_titledb.async_cache.pipeline")
     async def test_run_success(
         self,
         mock_async_cache_pipeline,
-        mock_super_run,
+        mock_pull,
         task,
         sample_json_content,
+        pull_content,
     ):
         """Test successful run with valid data"""
-        mock_super_run.return_value = sample_json_content
+        mock_pull.side_effect = pull_content(sample_json_content)
 
         # Create mock pipeline with async context manager support
         mock_pipe = AsyncMock()
@@ -80,8 +94,8 @@ class TestUpdateSwitchTitleDBTask:
 
         await task.run(force=True)
 
-        # Verify super().run was called
-        mock_super_run.assert_called_once_with(True)
+        # Verify the remote file was pulled
+        mock_pull.assert_called_once_with(True)
 
         # Verify pipeline was used
         assert mock_async_cache_pipeline.called
@@ -93,26 +107,31 @@ class TestUpdateSwitchTitleDBTask:
 
         # Should have calls for both SWITCH_TITLEDB_INDEX_KEY and SWITCH_PRODUCT_ID_KEY
         titledb_calls = [
-            call for call in hset_calls if call[0][0] == SWITCH_TITLEDB_INDEX_KEY
+            call
+            for call in hset_calls
+            if call[0][0].startswith(get_staging_key(SWITCH_TITLEDB_INDEX_KEY, ""))
         ]
         product_calls = [
-            call for call in hset_calls if call[0][0] == SWITCH_PRODUCT_ID_KEY
+            call
+            for call in hset_calls
+            if call[0][0].startswith(get_staging_key(SWITCH_PRODUCT_ID_KEY, ""))
         ]
 
         assert len(titledb_calls) > 0
         assert len(product_calls) > 0
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     @patch("tasks.update_switch_titledb.async_cache.pipeline")
     async def test_run_filters_empty_data(
         self,
         mock_async_cache_pipeline,
-        mock_super_run,
+        mock_pull,
         task,
         sample_json_content,
+        pull_content,
     ):
         """Test that empty keys and None values are filtered out"""
-        mock_super_run.return_value = sample_json_content
+        mock_pull.side_effect = pull_content(sample_json_content)
 
         mock_pipe = AsyncMock()
         mock_pipe.__aenter__ = AsyncMock(return_value=mock_pipe)
@@ -134,13 +153,14 @@ class TestUpdateSwitchTitleDBTask:
                 for key in mapping.keys():
                     assert key is not None and key != ""
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     @patch("tasks.update_switch_titledb.async_cache.pipeline")
     async def test_run_batches_data(
         self,
         mock_async_cache_pipeline,
-        mock_super_run,
+        mock_pull,
         task,
+        pull_content,
     ):
         """Test that data is properly batched"""
         # Create a large dataset to test batching
@@ -153,7 +173,7 @@ class TestUpdateSwitchTitleDBTask:
             }
 
         large_json_content = json.dumps(large_dataset).encode("utf-8")
-        mock_super_run.return_value = large_json_content
+        mock_pull.side_effect = pull_content(large_json_content)
 
         mock_pipe = AsyncMock()
         mock_pipe.__aenter__ = AsyncMock(return_value=mock_pipe)
@@ -166,40 +186,42 @@ class TestUpdateSwitchTitleDBTask:
         hset_calls = mock_pipe.hset.call_args_list
         assert len(hset_calls) > 2  # At least one batch for each key type
 
-    @patch.object(RemoteFilePullTask, "run")
-    async def test_run_no_content(self, mock_super_run, task):
-        """Test run when super().run returns None"""
-        mock_super_run.return_value = None
+    @patch.object(RemoteFilePullTask, "pull")
+    async def test_run_no_content(self, mock_pull, task, pull_content):
+        """Test run when no remote file is pulled"""
+        mock_pull.side_effect = pull_content(None)
 
         await task.run(force=True)
 
         # Should return early without doing anything
-        mock_super_run.assert_called_once_with(True)
+        mock_pull.assert_called_once_with(True)
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     @patch("tasks.update_switch_titledb.async_cache.pipeline")
     async def test_run_invalid_json(
         self,
         mock_async_cache_pipeline,
-        mock_super_run,
+        mock_pull,
         task,
+        pull_content,
     ):
         """Test run with invalid JSON content"""
-        mock_super_run.return_value = b"invalid json content"
+        mock_pull.side_effect = pull_content(b"invalid json content")
 
         with pytest.raises(json.JSONDecodeError):
             await task.run(force=True)
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     @patch("tasks.update_switch_titledb.async_cache.pipeline")
     async def test_run_empty_json(
         self,
         mock_async_cache_pipeline,
-        mock_super_run,
+        mock_pull,
         task,
+        pull_content,
     ):
         """Test run with empty JSON object"""
-        mock_super_run.return_value = json.dumps({}).encode("utf-8")
+        mock_pull.side_effect = pull_content(json.dumps({}).encode("utf-8"))
 
         mock_pipe = AsyncMock()
         mock_pipe.__aenter__ = AsyncMock(return_value=mock_pipe)
@@ -208,20 +230,22 @@ class TestUpdateSwitchTitleDBTask:
 
         await task.run(force=True)
 
-        # Should still call execute even with empty data
-        assert mock_pipe.execute.called
+        # Nothing changed, so nothing is written
+        assert not mock_pipe.hset.called
+        assert not mock_pipe.execute.called
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     @patch("tasks.update_switch_titledb.async_cache.pipeline")
     async def test_product_id_mapping(
         self,
         mock_async_cache_pipeline,
-        mock_super_run,
+        mock_pull,
         task,
         sample_json_content,
+        pull_content,
     ):
         """Test that product ID mapping works correctly"""
-        mock_super_run.return_value = sample_json_content
+        mock_pull.side_effect = pull_content(sample_json_content)
 
         mock_pipe = AsyncMock()
         mock_pipe.__aenter__ = AsyncMock(return_value=mock_pipe)
@@ -233,7 +257,9 @@ class TestUpdateSwitchTitleDBTask:
         # Find product ID calls
         hset_calls = mock_pipe.hset.call_args_list
         product_calls = [
-            call for call in hset_calls if call[0][0] == SWITCH_PRODUCT_ID_KEY
+            call
+            for call in hset_calls
+            if call[0][0].startswith(get_staging_key(SWITCH_PRODUCT_ID_KEY, ""))
         ]
 
         assert len(product_calls) > 0
@@ -247,19 +273,20 @@ class TestUpdateSwitchTitleDBTask:
                     data = json.loads(data_json)
                     assert data.get("id") == product_id
 
-    @patch.object(RemoteFilePullTask, "run")
+    @patch.object(RemoteFilePullTask, "pull")
     @patch("tasks.update_switch_titledb.async_cache.pipeline")
     @patch("tasks.update_switch_titledb.log")
     async def test_completion_log(
         self,
         mock_log,
         mock_async_cache_pipeline,
-        mock_super_run,
+        mock_pull,
         task,
         sample_json_content,
+        pull_content,
     ):
         """Test that completion is logged"""
-        mock_super_run.return_value = sample_json_content
+        mock_pull.side_effect = pull_content(sample_json_content)
 
         mock_pipe = AsyncMock()
         mock_pipe.__aenter__ = AsyncMock(return_value=mock_pipe)
@@ -270,6 +297,55 @@ class TestUpdateSwitchTitleDBTask:
 
         mock_log.info.assert_called_with("Scheduled switch titledb update completed!")
 
+    @patch.object(RemoteFilePullTask, "pull")
+    async def test_run_only_writes_changes(
+        self, mock_pull, task, sample_titledb_data, pull_content
+    ):
+        """Test that a new import only writes the entries that changed"""
+        await async_cache.delete(*SWITCH_TITLEDB_KEYS)
+
+        mock_pull.side_effect = pull_content(json.dumps(sample_titledb_data).encode())
+        await task.run(force=True)
+
+        updated_data = {
+            "0100000000010000": {
+                **sample_titledb_data["0100000000010000"],
+                "version": "1.4.0",
+            },
+            "0100000000020000": sample_titledb_data["0100000000020000"],
+        }
+        mock_pull.side_effect = pull_content(json.dumps(updated_data).encode())
+        with patch.object(
+            async_cache, "pipeline", wraps=async_cache.pipeline
+        ) as spy_pipeline:
+            await task.run(force=True)
+
+        # One pipeline per index to stage the changes, and one to swap them in
+        assert spy_pipeline.call_count == 3
+
+        titledb = await async_cache.hgetall(SWITCH_TITLEDB_INDEX_KEY)
+        assert {key.decode(): json.loads(value) for key, value in titledb.items()} == (
+            updated_data
+        )
+        assert await async_cache.hlen(SWITCH_TITLEDB_HASHES_KEY) == 2
+        assert sorted(await async_cache.hkeys(SWITCH_PRODUCT_ID_KEY)) == [
+            b"0100000000010000",
+            b"0100000000020000",
+        ]
+        assert not await async_cache.keys("romm:switch_*:staging:*")
+        assert await async_cache.ttl(SWITCH_TITLEDB_INDEX_KEY) == -1
+
+        # Importing the same data again doesn't write anything
+        mock_pull.side_effect = pull_content(json.dumps(updated_data).encode())
+        with patch.object(
+            async_cache, "pipeline", wraps=async_cache.pipeline
+        ) as spy_pipeline:
+            await task.run(force=True)
+
+        assert not spy_pipeline.called
+
+        await async_cache.delete(*SWITCH_TITLEDB_KEYS)
+
     def test_task_instance(self):
         """Test that the module-level task instance is created correctly"""
         assert isinstance(update_switch_titledb_task, UpdateSwitchTitleDBTask)
@@ -277,3 +353,34 @@ class TestUpdateSwitchTitleDBTask:
             update_switch_titledb_task.url
             == "https://raw.githubusercontent.com/blawar/titledb/master/US.en.json"
         )
+
+    async def test_stage_index_expires_staging_keys_of_failed_import(self):
+        """Test that staging keys written before a failure expire on their own"""
+        await async_cache.delete(*SWITCH_TITLEDB_KEYS)
+        staging_key = get_staging_key(SWITCH_TITLEDB_INDEX_KEY, "failed")
+        staging_hashes_key = get_staging_key(SWITCH_TITLEDB_HASHES_KEY, "failed")
+
+        def fail_after_first_batch(iterable, n, strict):
+            yield next(batched(iterable, n, strict=strict))
+            raise RuntimeError("Import failed")
+
+        with (
+            patch("tasks.update_switch_titledb.BATCH_SIZE", 1),
+            patch(
+                "tasks.update_switch_titledb.batched",
+                side_effect=fail_after_first_batch,
+            ),
+            pytest.raises(RuntimeError),
+        ):
+            await _stage_index(
+                SWITCH_TITLEDB_INDEX_KEY,
+                SWITCH_TITLEDB_HASHES_KEY,
+                {"0100000000010000": "{}", "0100000000020000": "{}"},
+                "failed",
+            )
+
+        assert await async_cache.hlen(staging_key) == 1
+        assert await async_cache.ttl(staging_key) > 0
+        assert await async_cache.ttl(staging_hashes_key) > 0
+
+        await async_cache.delete(staging_key, staging_hashes_key)
@@ -1,7 +1,9 @@
 import json
+import re
+import unicodedata
 import zipfile
-from io import BytesIO
-from typing import Any, Final
+from typing import IO, Final
+from xml.etree.ElementTree import Element
 
 from config import (
     ENABLE_SCHEDULED_UPDATE_LAUNCHBOX_METADATA,
@@ -11,17 +13,101 @@ from config import (
 from defusedxml import ElementTree as ET
 from handler.redis_handler import async_cache
 from logger.logger import log
+from redis.asyncio.client import Pipeline
 from tasks.tasks import RemoteFilePullTask
 from utils.context import initialize_context
 
 LAUNCHBOX_PLATFORMS_KEY: Final = "romm:launchbox_platforms"
-LAUNCHBOX_METADATA_DATABASE_ID_KEY: Final = "romm:launchbox_metadata_database_id"
-LAUNCHBOX_METADATA_NAME_KEY: Final = "romm:launchbox_metadata_name"
-LAUNCHBOX_METADATA_ALTERNATE_NAME_KEY: Final = "romm:launchbox_metadata_alternate_name"
-LAUNCHBOX_METADATA_IMAGE_KEY: Final = "romm:launchbox_metadata_image"
+LAUNCHBOX_METADATA_DATABASE_ID_KEY: Final = "romm:launchbox_games"
+LAUNCHBOX_METADATA_NAME_KEY: Final = "romm:launchbox_game_names"
+LAUNCHBOX_METADATA_ALTERNATE_NAME_KEY: Final = "romm:launchbox_game_alternate_names"
+LAUNCHBOX_METADATA_IMAGE_KEY: Final = "romm:launchbox_game_images"
 LAUNCHBOX_MAME_KEY: Final = "romm:launchbox_mame"
 LAUNCHBOX_FILES_KEY: Final = "romm:launchbox_files"
 
+# Keys of the metadata stored as full JSON documents by previous versions
+LEGACY_LAUNCHBOX_METADATA_KEYS: Final = (
+    "romm:launchbox_metadata_database_id",
+    "romm:launchbox_metadata_name",
+    "romm:launchbox_metadata_alternate_name",
+    "romm:launchbox_metadata_image",
+)
+
+# Fields read by the launchbox handler, stored as JSON arrays in this order
+LAUNCHBOX_GAME_FIELDS: Final = (
+    "DatabaseID",
+    "Name",
+    "Overview",
+    "ReleaseDate",
+    "MaxPlayers",
+    "ReleaseType",
+    "Cooperative",
+    "VideoURL",
+    "CommunityRating",
+    "CommunityRatingCount",
+    "WikipediaURL",
+    "ESRB",
+    "Genres",
+    "Publisher",
+    "Developer",
+)
+LAUNCHBOX_IMAGE_FIELDS: Final = ("FileName", "Type", "Region")
+
+# Number of commands sent to Redis at once while importing the metadata
+PIPELINE_BATCH_SIZE: Final = 5000
+
+NON_WORD_PATTERN: Final = re.compile(r"[^\w\s]")
+
+
+def normalize_launchbox_name(name: str) -> str:
+    """Normalize a game name, so names differing only in case, accents or
+    punctuation are stored and looked up under the same key."""
+    name = unicodedata.normalize("NFKD", name.casefold())
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    return " ".join(NON_WORD_PATTERN.sub(" ", name).split())
+
+
+def get_launchbox_name_key(name: str, platform_name: str) -> str:
+    return f"{normalize_launchbox_name(name)}:{platform_name}"
+
+
+def _encode_fields(elem: Element, fields: tuple[str, ...]) -> list[str | None]:
+    values = [elem.findtext(field) or None for field in fields]
+    # Missing trailing fields don't need to be stored
+    while values and values[-1] is None:
+        values.pop()
+    return values
+
+
+def _decode_fields(values: list[str | None], fields: tuple[str, ...]) -> dict:
+    return {
+        field: value
+        for field, value in zip(fields, values, strict=False)
+        if value is not None
+    }
+
+
+def encode_launchbox_game(elem: Element) -> str:
+    return json.dumps(
+        _encode_fields(elem, LAUNCHBOX_GAME_FIELDS), separators=(",", ":")
+    )
+
+
+def decode_launchbox_game(value: str | bytes) -> dict:
+    return _decode_fields(json.loads(value), LAUNCHBOX_GAME_FIELDS)
+
+
+def decode_launchbox_images(value: str | bytes) -> list[dict]:
+    return [
+        _decode_fields(image, LAUNCHBOX_IMAGE_FIELDS) for image in json.loads(value)
+    ]
+
+
+async def _execute_if_full(pipe: Pipeline) -> None:
+    # Avoid buffering the whole file worth of commands in memory
+    if len(pipe) >= PIPELINE_BATCH_SIZE:
+        await pipe.execute()
+
 
 class UpdateLaunchboxMetadataTask(RemoteFilePullTask):
     def __init__(self):
@@ -39,205 +125,175 @@ class UpdateLaunchboxMetadataTask(RemoteFilePullTask):
             log.warning("Launchbox API is not enabled, skipping metadata update")
             return
 
-        content = await super().run(force)
-        if content is None:
-            log.warning("No content received from launchbox metadata update")
-            return
-
         try:
-            zip_file_bytes = BytesIO(content)
-            with zipfile.ZipFile(zip_file_bytes) as z:
-                for file in z.namelist():
-                    if file == "Platforms.xml":
-                        with z.open(file, "r") as f:
-                            async with async_cache.pipeline() as pipe:
-                                ctx = ET.iterparse(f, events=("end",))
-
-                                for _, elem in ctx:
-                                    if elem.tag == "Platform":
-                                        name_elem = elem.find("Name")
-                                        if name_elem is not None and name_elem.text:
-                                            await pipe.hset(
-                                                LAUNCHBOX_PLATFORMS_KEY,
-                                                mapping={
-                                                    name_elem.text: json.dumps(
-                                                        {
-                                                            child.tag: child.text
-                                                            for child in elem
-                                                        }
-                                                    )
-                                                },
-                                            )
-
-                                        elem.clear()
-                                await pipe.execute()
-
-                    elif file == "Metadata.xml":
-                        with z.open(file, "r") as f:
-                            async with async_cache.pipeline() as pipe:
-                                ctx = ET.iterparse(f, events=("end",))
-
-                                current_game_image_db_id = None
-                                current_game_images: list[dict[str, Any]] = []
-
-                                for _, elem in ctx:
-                                    if elem.tag == "Game":
-                                        id_elem = elem.find("DatabaseID")
-                                        if id_elem is not None and id_elem.text:
-                                            await pipe.hset(
-                                                LAUNCHBOX_METADATA_DATABASE_ID_KEY,
-                                                mapping={
-                                                    id_elem.text: json.dumps(
-                                                        {
-                                                            child.tag: child.text
-                                                            for child in elem
-                                                        }
-                                                    )
-                                                },
-                                            )
-
-                                        name_elem = elem.find("Name")
-                                        platform_elem = elem.find("Platform")
-                                        if (
-                                            name_elem is not None
-                                            and name_elem.text
-                                            and platform_elem is not None
-                                            and platform_elem.text
-                                        ):
-                                            # Use a unique combination of name and platform as the key
-                                            await pipe.hset(
-                                                LAUNCHBOX_METADATA_NAME_KEY,
-                                                mapping={
-                                                    f"{name_elem.text}:{platform_elem.text}": json.dumps(
-                                                        {
-                                                            child.tag: child.text
-                                                            for child in elem
-                                                        }
-                                                    )
-                                                },
-                                            )
-                                        elem.clear()
-
-                                    elif elem.tag == "GameAlternateName":
-                                        alternate_name_elem = elem.find("AlternateName")
-                                        if (
-                                            alternate_name_elem is not None
-                                            and alternate_name_elem.text
-                                        ):
-                                            await pipe.hset(
-                                                LAUNCHBOX_METADATA_ALTERNATE_NAME_KEY,
-                                                mapping={
-                                                    alternate_name_elem.text: json.dumps(
-                                                        {
-                                                            child.tag: child.text
-                                                            for child in elem
-                                                        }
-                                                    )
-                                                },
-                                            )
-
-                                        elem.clear()
-
-                                    elif elem.tag == "GameImage":
-                                        id_elem = elem.find("DatabaseID")
-                                        if id_elem is not None and id_elem.text:
-                                            image_id = str(id_elem.text)
-
-                                            if (
-                                                current_game_image_db_id is not None
-                                                and image_id != current_game_image_db_id
-                                            ):
-                                                # Store the previous game's images
-                                                await pipe.hset(
-                                                    LAUNCHBOX_METADATA_IMAGE_KEY,
-                                                    mapping={
-                                                        current_game_image_db_id: json.dumps(
-                                                            current_game_images
-                                                        )
-                                                    },
-                                                )
-                                                current_game_images = []
-
-                                            current_game_image_db_id = image_id
-                                            current_game_images.append(
-                                                {
-                                                    child.tag: child.text
-                                                    for child in elem
-                                                }
-                                            )
-                                        elem.clear()
-
-                                # Store the last game's images
-                                if current_game_image_db_id is not None:
-                                    await pipe.hset(
-                                        LAUNCHBOX_METADATA_IMAGE_KEY,
-                                        mapping={
-                                            current_game_image_db_id: json.dumps(
-                                                current_game_images
-                                            )
-                                        },
-                                    )
-                                await pipe.execute()
+            # The archive weighs hundreds of MB, so it's read from disk
+            async with self.pull(force) as zip_path:
+                if zip_path is None:
+                    log.warning("No content received from launchbox metadata update")
+                    return
 
-                    elif file == "Mame.xml":
-                        with z.open(file, "r") as f:
-                            async with async_cache.pipeline() as pipe:
-                                ctx = ET.iterparse(f, events=("end",))
-
-                                for _, elem in ctx:
-                                    if elem.tag == "MameFile":
-                                        filename_elem = elem.find("FileName")
-                                        if (
-                                            filename_elem is not None
-                                            and filename_elem.text
-                                        ):
-                                            await pipe.hset(
-                                                LAUNCHBOX_MAME_KEY,
-                                                mapping={
-                                                    filename_elem.text: json.dumps(
-                                                        {
-                                                            child.tag: child.text
-                                                            for child in elem
-                                                        }
-                                                    )
-                                                },
-                                            )
-
-                                        elem.clear()
-                                await pipe.execute()
-
-                    elif file == "Files.xml":
+                with zipfile.ZipFile(zip_path) as z:
+                    for file in z.namelist():
                         with z.open(file, "r") as f:
-                            async with async_cache.pipeline() as pipe:
-                                ctx = ET.iterparse(f, events=("end",))
-
-                                for _, elem in ctx:
-                                    if elem.tag == "File":
-                                        filename_elem = elem.find("FileName")
-                                        if (
-                                            filename_elem is not None
-                                            and filename_elem.text
-                                        ):
-                                            await pipe.hset(
-                                                LAUNCHBOX_FILES_KEY,
-                                                mapping={
-                                                    filename_elem.text: json.dumps(
-                                                        {
-                                                            child.tag: child.text
-                                                            for child in elem
-                                                        }
-                                                    )
-                                                },
-                                            )
-
-                                        elem.clear()
-                                await pipe.execute()
+                            await self._import_file(file, f)
 
+                await async_cache.delete(*LEGACY_LAUNCHBOX_METADATA_KEYS)
         except zipfile.BadZipFile:
             log.error("Bad zip file in launchbox metadata update")
             return
 
         log.info("Scheduled launchbox metadata update completed!")
 
+    async def _import_file(self, file: str, f: IO[bytes]) -> None:
+        if file == "Platforms.xml":
+            async with async_cache.pipeline() as pipe:
+                ctx = ET.iterparse(f, events=("end",))
+
+                for _, elem in ctx:
+                    if elem.tag == "Platform":
+                        name_elem = elem.find("Name")
+                        if name_elem is not None and name_elem.text:
+                            await pipe.hset(
+                                LAUNCHBOX_PLATFORMS_KEY,
+                                mapping={
+                                    name_elem.text: json.dumps(
+                                        {child.tag: child.text for child in elem}
+                                    )
+                                },
+                            )
+
+                        elem.clear()
+                await pipe.execute()
+
+        elif file == "Metadata.xml":
+            async with async_cache.pipeline() as pipe:
+                ctx = ET.iterparse(f, events=("end",))
+
+                current_game_image_db_id = None
+                current_game_images: list[list[str | None]] = []
+
+                for _, elem in ctx:
+                    if elem.tag == "Game":
+                        database_id = elem.findtext("DatabaseID")
+                        if database_id:
+                            await pipe.hset(
+                                LAUNCHBOX_METADATA_DATABASE_ID_KEY,
+                                mapping={database_id: encode_launchbox_game(elem)},
+                            )
+
+                            # Name and platform index the database ID of the game
+                            name = elem.findtext("Name")
+                            platform = elem.findtext("Platform")
+                            if name and platform:
+                                await pipe.hset(
+                                    LAUNCHBOX_METADATA_NAME_KEY,
+                                    mapping={
+                                        get_launchbox_name_key(
+                                            name, platform
+                                        ): database_id
+                                    },
+                                )
+                        elem.clear()
+
+                    elif elem.tag == "GameAlternateName":
+                        alternate_name = elem.findtext("AlternateName")
+                        database_id = elem.findtext("DatabaseID")
+                        if alternate_name and database_id:
+                            await pipe.hset(
+                                LAUNCHBOX_METADATA_ALTERNATE_NAME_KEY,
+                                mapping={
+                                    normalize_launchbox_name(
+                                        alternate_name
+                                    ): database_id
+                                },
+                            )
+
+                        elem.clear()
+
+                    elif elem.tag == "GameImage":
+                        image_id = elem.findtext("DatabaseID")
+                        if image_id:
+                            if (
+                                current_game_image_db_id is not None
+                                and image_id != current_game_image_db_id
+                            ):
+                                # Store the previous game's images
+                                await pipe.hset(
+                                    LAUNCHBOX_METADATA_IMAGE_KEY,
+                                    mapping={
+                                        current_game_image_db_id: json.dumps(
+                                            current_game_images,
+                                            separators=(",", ":"),
+                                        )
+                                    },
+                                )
+                                current_game_images = []
+
+                            current_game_image_db_id = image_id
+                            if elem.findtext("FileName"):
+                                current_game_images.append(
+                                    _encode_fields(elem, LAUNCHBOX_IMAGE_FIELDS)
+                                )
+                        elem.clear()
+
+                    else:
+                        continue
+
+                    await _execute_if_full(pipe)
+
+                # Store the last game's images
+                if current_game_image_db_id is not None:
+                    await pipe.hset(
+                        LAUNCHBOX_METADATA_IMAGE_KEY,
+                        mapping={
+                            current_game_image_db_id: json.dumps(
+                                current_game_images, separators=(",", ":")
+                            )
+                        },
+                    )
+                await pipe.execute()
+
+        elif file == "Mame.xml":
+            async with async_cache.pipeline() as pipe:
+                ctx = ET.iterparse(f, events=("end",))
+
+                for _, elem in ctx:
+                    if elem.tag == "MameFile":
+                        filename_elem = elem.find("FileName")
+                        if filename_elem is not None and filename_elem.text:
+                            await pipe.hset(
+                                LAUNCHBOX_MAME_KEY,
+                                mapping={
+                                    filename_elem.text: json.dumps(
+                                        {child.tag: child.text for child in elem}
+                                    )
+                                },
+                            )
+
+                        elem.clear()
+                        await _execute_if_full(pipe)
+                await pipe.execute()
+
+        elif file == "Files.xml":
+            async with async_cache.pipeline() as pipe:
+                ctx = ET.iterparse(f, events=("end",))
+
+                for _, elem in ctx:
+                    if elem.tag == "File":
+                        filename_elem = elem.find("FileName")
+                        if filename_elem is not None and filename_elem.text:
+                            await pipe.hset(
+                                LAUNCHBOX_FILES_KEY,
+                                mapping={
+                                    filename_elem.text: json.dumps(
+                                        {child.tag: child.text for child in elem}
+                                    )
+                                },
+                            )
+
+                        elem.clear()
+                        await _execute_if_full(pipe)
+                await pipe.execute()
+
 
 update_launchbox_metadata_task = UpdateLaunchboxMetadataTask()
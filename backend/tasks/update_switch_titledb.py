@@ -1,4 +1,6 @@
+import hashlib
 import json
+import uuid
 from itertools import batched
 from typing import Final
 
@@ -14,6 +16,87 @@ from utils.context import initialize_context
 SWITCH_TITLEDB_INDEX_KEY: Final = "romm:switch_titledb"
 SWITCH_PRODUCT_ID_KEY: Final = "romm:switch_product_id"
 
+# Content hashes of the entries of each index, to only write the ones that changed
+SWITCH_TITLEDB_HASHES_KEY: Final = "romm:switch_titledb_hashes"
+SWITCH_PRODUCT_ID_HASHES_KEY: Final = "romm:switch_product_id_hashes"
+
+BATCH_SIZE: Final = 2000
+# Staging keys left behind by an interrupted import are eventually dropped by Redis
+STAGING_KEY_EXPIRATION: Final = 60 * 60
+
+
+def get_staging_key(key: str, import_id: str) -> str:
+    return f"{key}:staging:{import_id}"
+
+
+def _hash_entry(entry: str) -> str:
+    return hashlib.sha1(entry.encode(), usedforsecurity=False).hexdigest()
+
+
+def _to_str(value: str | bytes) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+async def _get_entry_hashes(key: str, hashes_key: str) -> dict[str, str]:
+    # Without the index itself, the stored hashes no longer describe anything
+    if await async_cache.exists(key, hashes_key) < 2:
+        return {}
+
+    entry_hashes = await async_cache.hgetall(hashes_key)
+    return {_to_str(k): _to_str(v) for k, v in entry_hashes.items()}
+
+
+async def _stage_index(
+    key: str, hashes_key: str, entries: dict[str, str], import_id: str
+) -> bool:
+    """Write the changes to an index into staging keys, returns whether it changed.
+
+    The staging keys start as a copy of the current index, made by Redis itself, so
+    only the entries added, changed or removed are sent to it.
+    """
+    stored_hashes = await _get_entry_hashes(key, hashes_key)
+    entry_hashes = {k: _hash_entry(v) for k, v in entries.items()}
+
+    changed = [k for k, h in entry_hashes.items() if stored_hashes.get(k) != h]
+    removed = [k for k in stored_hashes if k not in entry_hashes]
+    if not changed and not removed:
+        return False
+
+    staging_key = get_staging_key(key, import_id)
+    staging_hashes_key = get_staging_key(hashes_key, import_id)
+    async with async_cache.pipeline(transaction=False) as pipe:
+
+        async def execute_with_expiration() -> None:
+            # Staging keys of an import that dies midway expire on their own, the
+            # expiration is refreshed by each batch so a long import keeps them
+            await pipe.expire(staging_key, STAGING_KEY_EXPIRATION)
+            await pipe.expire(staging_hashes_key, STAGING_KEY_EXPIRATION)
+            await pipe.execute()
+
+        if stored_hashes:
+            await pipe.copy(key, staging_key)
+            await pipe.copy(hashes_key, staging_hashes_key)
+            await execute_with_expiration()
+
+        for keys_batch in batched(changed, BATCH_SIZE, strict=False):
+            await pipe.hset(staging_key, mapping={k: entries[k] for k in keys_batch})
+            await pipe.hset(
+                staging_hashes_key,
+                mapping={k: entry_hashes[k] for k in keys_batch},
+            )
+            await execute_with_expiration()
+
+        for keys_batch in batched(removed, BATCH_SIZE, strict=False):
+            await pipe.hdel(staging_key, *keys_batch)
+            await pipe.hdel(staging_hashes_key, *keys_batch)
+            await execute_with_expiration()
+
+    log.info(
+        f"Switch titledb index {key}: {len(changed)} entries added or changed, "
+        f"{len(removed)} removed"
+    )
+    return True
+
 
 class UpdateSwitchTitleDBTask(RemoteFilePullTask):
     def __init__(self):
@@ -27,26 +110,46 @@ class UpdateSwitchTitleDBTask(RemoteFilePullTask):
 
     @initialize_context()
     async def run(self, force: bool = False) -> None:
-        content = await super().run(force)
-        if content is None:
-            return
-
-        index_json = json.loads(content)
-        relevant_data = {k: v for k, v in index_json.items() if k and v}
-
-        async with async_cache.pipeline() as pipe:
-            for data_batch in batched(relevant_data.items(), 2000, strict=False):
-                titledb_map = {k: json.dumps(v) for k, v in dict(data_batch).items()}
-                await pipe.hset(SWITCH_TITLEDB_INDEX_KEY, mapping=titledb_map)
-            for data_batch in batched(relevant_data.items(), 2000, strict=False):
-                product_map = {
-                    v["id"]: json.dumps(v)
-                    for v in dict(data_batch).values()
-                    if v.get("id")
-                }
-                if product_map:
-                    await pipe.hset(SWITCH_PRODUCT_ID_KEY, mapping=product_map)
-            await pipe.execute()
+        async with self.pull(force) as titledb_path:
+            if titledb_path is None:
+                return
+
+            with open(titledb_path, "rb") as f:
+                index_json = json.load(f)
+            relevant_data = {k: v for k, v in index_json.items() if k and v}
+
+            titledb_entries = {k: json.dumps(v) for k, v in relevant_data.items()}
+            product_entries = {
+                v["id"]: json.dumps(v) for v in relevant_data.values() if v.get("id")
+            }
+
+            # Each import stages its changes apart, so concurrent imports don't mix
+            import_id = uuid.uuid4().hex
+            staged_keys: list[str] = []
+            if await _stage_index(
+                SWITCH_TITLEDB_INDEX_KEY,
+                SWITCH_TITLEDB_HASHES_KEY,
+                titledb_entries,
+                import_id,
+            ):
+                staged_keys += [SWITCH_TITLEDB_INDEX_KEY, SWITCH_TITLEDB_HASHES_KEY]
+            if await _stage_index(
+                SWITCH_PRODUCT_ID_KEY,
+                SWITCH_PRODUCT_ID_HASHES_KEY,
+                product_entries,
+                import_id,
+            ):
+                staged_keys += [SWITCH_PRODUCT_ID_KEY, SWITCH_PRODUCT_ID_HASHES_KEY]
+
+            if not staged_keys:
+                log.info("Switch titledb is up to date, nothing to import")
+            else:
+                # Lookups see either the previous or the new index, never a partial one
+                async with async_cache.pipeline() as pipe:
+                    for key in staged_keys:
+                        await pipe.rename(get_staging_key(key, import_id), key)
+                        await pipe.persist(key)
+                    await pipe.execute()
 
         log.info("Scheduled switch titledb update completed!")
 
@@ -41,6 +41,7 @@ export type { PlatformSchema } from './models/PlatformSchema';
 export type { RAGameRomAchievement } from './models/RAGameRomAchievement';
 export type { RAProgression } from './models/RAProgression';
 export type { RAUserGameProgression } from './models/RAUserGameProgression';
+export type { RateLimiterStatus } from './models/RateLimiterStatus';
 export type { Role } from './models/Role';
 export type { RomFileCategory } from './models/RomFileCategory';
 export type { RomFileSchema } from './models/RomFileSchema';
@@ -0,0 +1,16 @@
+/* generated using openapi-typescript-codegen -- do not edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+export type RateLimiterStatus = {
+    provider: 'hasheous' | 'igdb' | 'mobygames' | 'playmatch' | 'retroachievements' | 'screenscraper' | 'steamgriddb';
+    rate: number;
+    max_rate: number;
+    budget: number;
+    in_flight: number;
+    max_in_flight: number;
+    wait_time: number;
+    total_wait_time: number;
+    rate_limited_responses: number;
+};
+